@@ -2,13 +2,18 @@ import os
 import time
 from flask import json
 import pandas as pd
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
 from tabulate import tabulate # type: ignore
+from metrics import metrics
+from plots import analysis_charts
+from profiling import DEFAULT_CHUNK_SIZE, profile_file
 
-def analyze_uploaded_file(filepath, file_type='csv'):
-    """Analyse complète d'un fichier uploadé (CSV ou Parquet)"""
+def analyze_uploaded_file(filepath, file_type='csv', approximate=False, sample_rate=1.0,
+                          chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Analyse complète d'un fichier uploadé (CSV, Parquet ou Arrow), en une passe par morceaux
+
+    `progress(lignes_lues)` est appelé après chaque morceau ; une exception qu'il
+    lève interrompt l'analyse et est renvoyée comme les autres dans 'error'.
+    """
     start_time = time.time()
     results = {
         'file_info': {},
@@ -16,66 +21,72 @@ def analyze_uploaded_file(filepath, file_type='csv'):
         'column_stats': {},
         'issues': [],
         'execution_time': None,
-        'plots': []
+        'plots': [],
+        'charts': []
     }
 
-    try:
-        # 1. Lecture du fichier selon son type
-        if file_type == 'csv':
-            df = pd.read_csv(filepath)
-        elif file_type == 'parquet':
-            df = pd.read_parquet(filepath)
-        else:
-            raise ValueError("Type de fichier non supporté")
-
  # Conversion des types numpy/pandas en types natifs Python
-        def convert_to_native(val):
-            if pd.api.types.is_integer_dtype(val):
-                return int(val)
-            elif pd.api.types.is_float_dtype(val):
-                return float(val)
-            return val
+    def convert_to_native(val):
+        if pd.api.types.is_integer_dtype(val):
+            return int(val)
+        elif pd.api.types.is_float_dtype(val):
+            return float(val)
+        return val
+
+    try:
+        # 1. Profilage du fichier (lecture par morceaux)
+        with metrics.timer('file_profile', format=file_type):
+            profile = profile_file(filepath, file_type, approximate=approximate,
+                                   sample_rate=sample_rate, chunk_size=chunk_size, progress=progress)
+        rows, n_columns = profile.rows, len(profile.columns)
+        dtypes = profile.dtypes()
 
        # 2. Informations générales
         file_size = round(os.path.getsize(filepath) / (1024 * 1024), 2)
         results['file_info'] = {
-            'rows': int(len(df)),
-            'columns': int(len(df.columns)),
+            'rows': int(rows),
+            'columns': int(n_columns),
             'file_size_mb': float(file_size),
-            'dtypes': {k: str(v) for k, v in df.dtypes.to_dict().items()}
+            'dtypes': dtypes.to_dict(),
+            'profile_mode': 'approximate' if approximate else 'exact'
         }
+        error_bounds = profile.error_bounds()
+        if error_bounds:
+            results['error_bounds'] = error_bounds
 
         # 3. Analyse des valeurs manquantes
-        missing_values = df.isnull().sum()
-        missing_percent = (missing_values / len(df)) * 100
+        missing_values = profile.missing_counts()
+        missing_percent = profile.missing_percent()
 
         results['missing_analysis'] = {
             'total_missing': int(missing_values.sum()),
-            'missing_percent_total': float(round(missing_values.sum() / (len(df) * len(df.columns)) * 100, 2)),
+            'missing_percent_total': float(round(missing_values.sum() / (rows * n_columns) * 100, 2)) if rows * n_columns else 0.0,
             'columns_with_missing': {k: int(v) for k, v in missing_values[missing_values > 0].to_dict().items()},
             'missing_percent_by_column': {k: float(round(v, 2)) for k, v in missing_percent[missing_percent > 0].to_dict().items()}
         }
         # 4. Détection des problèmes
-        empty_cols = [col for col in df.columns if df[col].isnull().all()]
+        empty_cols = [col for col, c in profile.columns.items() if c.count == 0]
         if empty_cols:
             results['issues'].append(f"Colonnes vides: {', '.join(empty_cols)}")
 
         # 5. Analyse détaillée par colonne
-        for col in df.columns:
+        unique_counts = profile.unique_counts()
+        for col, column in profile.columns.items():
             col_stats = {
-                'type': str(df[col].dtype),
-                'unique': df[col].nunique(),
-                'manquants': missing_values[col],
-                '% manquants': round(missing_percent[col], 2)
+                'type': dtypes[col],
+                'unique': int(unique_counts[col]),
+                'manquants': int(missing_values[col]),
+                '% manquants': round(float(missing_percent[col]), 2)
             }
+            if profile.sampled:
+                col_stats['± % manquants'] = round(profile.missing_margin(col), 2)
             results['column_stats'][col] = col_stats
 
-            if df[col].nunique() == 1:
-                results['issues'].append(f"Colonne constante: {col} = {df[col].iloc[0]}")
+            if column.count and column.constant:
+                results['issues'].append(f"Colonne constante: {col} = {column.first}")
 
-        # 6. Génération des visualisations
-        plots = generate_plots(df, missing_percent)
-        results['plots'] = plots
+        # 6. Visualisations : données des graphiques, rendues à la demande (plots.py)
+        results['charts'] = analysis_charts(missing_percent, unique_counts, dtypes)
 
         # 7. Temps d'exécution
         results['execution_time'] = time.time() - start_time
@@ -86,55 +97,3 @@ def analyze_uploaded_file(filepath, file_type='csv'):
     except Exception as e:
         results['error'] = str(e)
         return json.loads(json.dumps(results, default=convert_to_native))
-
-def generate_plots(df, missing_percent):
-    """Génère les visualisations et les retourne en base64"""
-    plots = []
-    
-    # 1. Valeurs manquantes par colonne
-    plt.figure(figsize=(14, 7))
-    missing_percent_sorted = missing_percent.sort_values(ascending=False)
-    missing_percent_sorted.plot(kind='bar', color='salmon')
-    plt.title("Pourcentage de valeurs manquantes par colonne")
-    plt.xlabel("Colonne")
-    plt.ylabel("% de valeurs manquantes")
-    plt.xticks(rotation=90)
-    plt.tight_layout()
-    
-    img_buffer = BytesIO()
-    plt.savefig(img_buffer, format='png')
-    img_buffer.seek(0)
-    plots.append(base64.b64encode(img_buffer.read()).decode('utf-8'))
-    plt.close()
-
-    # 2. Nombre d'éléments uniques par colonne
-    plt.figure(figsize=(14, 7))
-    unique_counts = df.nunique()
-    unique_counts.plot(kind='bar', color='lightblue')
-    plt.title("Nombre d'éléments uniques par colonne")
-    plt.xlabel("Colonne")
-    plt.ylabel("Nombre d'éléments uniques")
-    plt.xticks(rotation=90)
-    plt.tight_layout()
-    
-    img_buffer = BytesIO()
-    plt.savefig(img_buffer, format='png')
-    img_buffer.seek(0)
-    plots.append(base64.b64encode(img_buffer.read()).decode('utf-8'))
-    plt.close()
-
-    # 3. Types de données par colonne
-    plt.figure(figsize=(14, 7))
-    dtype_counts = df.dtypes.value_counts()
-    dtype_counts.plot(kind='pie', autopct='%1.1f%%', colors=['lightgreen', 'lightblue', 'salmon'])
-    plt.title("Répartition des types de données")
-    plt.ylabel('')
-    plt.tight_layout()
-    
-    img_buffer = BytesIO()
-    plt.savefig(img_buffer, format='png')
-    img_buffer.seek(0)
-    plots.append(base64.b64encode(img_buffer.read()).decode('utf-8'))
-    plt.close()
-
-    return plots
\ No newline at end of file
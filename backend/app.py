@@ -1,15 +1,37 @@
+if __name__ == '__main__':
+    # `python app.py` : les pools 'spawn' réexécutent le script principal dans chaque
+    # processus ; on démarre donc par server.py, qui ne fait rien hors __main__
+    import os, runpy, sys
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py'), run_name='__main__')
+    sys.exit()
+
 import eventlet # type: ignore
+from eventlet import tpool # type: ignore
 # Ajoutez après les autres configurations
 eventlet.monkey_patch()
 
-from flask import Flask, Response, json, render_template, request, jsonify, send_from_directory
+from startup import profile, lazy_import, lazy_function, preload
+
+from flask import Flask, Response, g, json, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
-from matplotlib import pyplot as plt
-import pandas as pd
-import joblib
 import os
-from testm import  load_artifacts, process_file_m 
-from analyse import analyze_uploaded_file
+
+# Imports lourds différés au premier usage (voir startup.py)
+pd = lazy_import('pandas')
+process_file = lazy_function('testb', 'process_file')
+process_file_m = lazy_function('testm', 'process_file_m')
+analyze_uploaded_file = lazy_function('analyse', 'analyze_uploaded_file')
+stream_predict = lazy_function('streaming', 'stream_predict')
+stream_rows = lazy_function('streaming', 'stream_rows')
+ingest_pcap = lazy_function('pcap_ingest', 'ingest_pcap')
+from jobs import JOB_KINDS, JobManager
+from plots import CHART_FORMATS, PlotRenderer, prediction_charts
+from result_cache import ResultCache, save_upload
+from sources import LiveFeed, create_source
+from live_summary import SummaryWindow, alert_payload, model_payload
+from history import HistoryStore, parse_time
+from metrics import metrics
+from columnar import ARROW_EXTENSIONS
 
 # Ajoutez en haut du fichier
 
@@ -17,36 +39,27 @@ import threading
 import time
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+# Backend matplotlib sans affichage, sans importer matplotlib au démarrage
+os.environ.setdefault('MPLBACKEND', 'Agg')
 
 
 
 
     
 
-from flask import Flask, request, jsonify
-import matplotlib
-matplotlib.use('Agg')  # Doit être avant les autres imports matplotlib
-from testb import process_file
-import io
-import base64
-import numpy as np
 from werkzeug.utils import secure_filename
-from ydata_profiling import ProfileReport
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import datetime
 from functools import wraps
-from testb import process_file 
 
-from io import BytesIO
 from flask import abort
 
 
 
 from threading import Lock
 
-from flask_socketio import SocketIO # type: ignore
-from detection import PacketDetector  # Ajout pour la détection en temps réel
+from flask_socketio import SocketIO, join_room, leave_room # type: ignore
 
 
 
@@ -59,7 +72,65 @@ CORS(app)
 SECRET_KEY = 'votre_cle_secrete_super_securisee'
 UPLOAD_FOLDER = 'uploads'
 REPORTS_DIR = 'reports'
-ALLOWED_EXTENSIONS = {'csv', 'parquet'}
+# Formats Arrow IPC (columnar.ARROW_EXTENSIONS) : toujours lus en mappage mémoire par le mode par morceaux
+ALLOWED_EXTENSIONS = {'csv', 'parquet'} | ARROW_EXTENSIONS
+# Captures réseau (route /predict-pcap et jobs 'predict-pcap')
+PCAP_EXTENSIONS = {'pcap', 'pcapng', 'cap'}
+PCAP_SCORE_BATCH = 50_000
+PCAP_MAX_FLOWS = 1 << 18
+# Source de la surveillance temps réel (voir sources.create_source) :
+# 'synthetic://?rate=1000', 'tcp://127.0.0.1:9501', 'udp://127.0.0.1:9500', 'pipe:///tmp/ids_flux'...
+# ou paquets agrégés en flux : 'tcp://127.0.0.1:9502?packets=1&idle_timeout=30'
+LIVE_SOURCE = 'synthetic'
+LIVE_QUEUE_SIZE = 10_000
+LIVE_OVERFLOW = 'drop_oldest'  # 'block', 'drop_oldest' ou 'sample'
+LIVE_BATCH_SIZE = 512
+LIVE_BATCH_LATENCY = 0.05  # secondes d'attente max du plus ancien flux avant scoring d'un lot partiel
+# Résumés Socket.IO : une image par intervalle, quel que soit le débit de flux
+SUMMARY_INTERVAL = 0.5  # secondes
+SUMMARY_TOP_N = 10
+# Moteur d'inférence : 'keras', 'numpy', 'numpy-float16', 'numpy-int8' (bundles quantifiés)
+# ou 'auto' (NumPy si les bundles .npz existent)
+INFERENCE_BACKEND = 'auto'
+# Cascade à sortie anticipée : 'ensemble' (cinq modèles) ou 'cascade'
+SCORING_MODE = 'ensemble'
+CASCADE_ORDER = ['Model 1', 'Model 2', 'Model 3', 'Model 4', 'Model 5']
+CASCADE_BANDS = 0.4  # une ligne continue si |p - 0.5| < bande
+# Traitement par morceaux des gros fichiers (ou ?stream=1)
+STREAM_THRESHOLD_MB = 50
+STREAM_CHUNK_SIZE = 100_000
+# /predict-combined : lignes malveillantes détaillées (type d'attaque) au plus
+COMBINED_MAX_ROWS = 10_000
+# Profilage /analyse : approximatif (HyperLogLog + échantillonnage) au-delà du seuil ou avec ?approx=1
+PROFILE_APPROX_THRESHOLD_MB = 1024
+PROFILE_SAMPLE_RATE = 0.1
+# Pool de processus pour les analyses asynchrones (None : un par cœur)
+JOB_WORKERS = None
+# État et résultats des jobs, partagés entre workers pré-forkés
+JOB_DIR = os.path.join(REPORTS_DIR, 'jobs')
+# Rendu PNG / SVG des graphiques à la demande, mis en cache par empreinte
+PLOT_WORKERS = 1
+PLOT_CACHE_DIR = os.path.join(REPORTS_DIR, 'plots')
+PLOT_CACHE_DISK_MB = 256
+# Cache des résultats par contenu de fichier et version des modèles
+RESULT_CACHE_DIR = os.path.join(REPORTS_DIR, 'cache')
+RESULT_CACHE_MEMORY_MB = 256
+RESULT_CACHE_DISK_MB = 2048
+# Préchargement des modèles en arrière-plan après le démarrage du serveur
+PREWARM = True
+# Service pré-forké (prefork.py) : nombre de workers, 1 = processus unique
+SERVE_WORKERS = 1
+SHARED_WEIGHTS_DIR = os.path.join(REPORTS_DIR, 'weights')
+# Histogrammes de latence par étape (metrics.py), exposés sur /metrics
+METRICS_ENABLED = True
+METRICS_SAMPLE_RATE = 1.0  # fraction des exécutions chronométrées
+metrics.configure(METRICS_SAMPLE_RATE, METRICS_ENABLED)
+# Historique des verdicts (history.py) : segments horaires, requêtes sur /history
+HISTORY_ENABLED = True
+HISTORY_DIR = os.path.join(REPORTS_DIR, 'history')
+HISTORY_FLUSH_INTERVAL = 5.0  # secondes avant écriture d'un tampon partiel
+HISTORY_RETENTION_DAYS = 7
+HISTORY_MAX_LIMIT = 1000  # lignes par page sur /history
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
@@ -71,20 +142,183 @@ os.makedirs(REPORTS_DIR, exist_ok=True)
 
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
-# Initialisation du détecteur temps réel
-detector = PacketDetector()
-detector.initialize()
+# Détecteur temps réel : artefacts et modèles chargés au premier usage
+detector = None
+# Verrou natif : le préchauffage tourne dans un vrai thread (eventlet.tpool)
+detector_lock = eventlet.patcher.original('threading').Lock()
+
+def load_detector():
+    """Charge artefacts et modèles binaires"""
+    with profile.measure('import', 'detection'):
+        from detection import PacketDetector
+    with profile.measure('artifacts', 'PacketDetector.initialize'):
+        new_detector = PacketDetector()
+        new_detector.initialize(backend=INFERENCE_BACKEND)
+    new_detector.enable_cascade(order=CASCADE_ORDER, bands=CASCADE_BANDS)
+    if SCORING_MODE != 'cascade':
+        new_detector.disable_cascade()
+    return new_detector
+
+def get_detector():
+    """Retourne le détecteur, en le chargeant au premier appel"""
+    global detector
+    if detector is None:
+        with detector_lock:
+            if detector is None:
+                detector = load_detector()
+                profile.mark('detector_ready')
+    return detector
+
+def prewarm():
+    """Préchargement des modèles et dépendances une fois le serveur démarré"""
+    try:
+        get_detector()
+        with profile.measure('artifacts', 'PacketDetector.initialize_multiclass'):
+            detector.initialize_multiclass()
+    except FileNotFoundError as e:
+        print(f"Préchauffage partiel: {str(e)}")
+    preload('streaming', 'analyse')
+    profile.mark('prewarm_done')
+
+def preload_shared():
+    """Mode pré-forké : chargement unique dans le maître, poids NumPy en mémoire partagée"""
+    from prefork import share_weights
+
+    shared = load_detector()
+    try:
+        shared.initialize_multiclass()
+    except FileNotFoundError as e:
+        print(f"Préchargement partiel: {str(e)}")
+    preload('streaming', 'analyse')
+    shared_bytes = share_weights(shared, SHARED_WEIGHTS_DIR)
+    print(f"Poids partagés: {shared_bytes / 1e6:.1f} Mo")
+    return shared
+
+def start_worker(channel, shared):
+    """Exécuté dans chaque worker après le fork"""
+    global detector, worker_channel
+    detector = shared
+    worker_channel = channel
+    profile.mark('detector_ready')
+    socketio.start_background_task(channel.listen, handle_channel_message)
+
+# Analyses asynchrones dans un pool de processus
+job_manager = JobManager(JOB_DIR, max_workers=JOB_WORKERS, backend=INFERENCE_BACKEND,
+                         chunk_size=STREAM_CHUNK_SIZE, history_dir=HISTORY_DIR if HISTORY_ENABLED else None)
+plot_renderer = PlotRenderer(PLOT_CACHE_DIR, max_workers=PLOT_WORKERS, max_disk_bytes=PLOT_CACHE_DISK_MB << 20)
+result_cache = ResultCache(RESULT_CACHE_DIR, max_memory_bytes=RESULT_CACHE_MEMORY_MB << 20,
+                           max_disk_bytes=RESULT_CACHE_DISK_MB << 20)
+history = HistoryStore(HISTORY_DIR, flush_interval=HISTORY_FLUSH_INTERVAL,
+                       retention=HISTORY_RETENTION_DAYS * 86400) if HISTORY_ENABLED else None
 
 # Variables globales pour la surveillance temps réel
 realtime_thread = None
 thread_lock = Lock()
 is_detection_running = False
+live_feed = None
+# Canal vers les autres workers en mode pré-forké (prefork.WorkerChannel), sinon None
+worker_channel = None
+summary_window = SummaryWindow(top_n=SUMMARY_TOP_N)
+# Modèles ayant eu au moins un abonné (salons 'model:<nom>')
+model_rooms = set()
 
 
 # Fonction utilitaire
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def is_pcap(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in PCAP_EXTENSIONS
+
+def use_streaming(filepath):
+    """Mode par morceaux si demandé, pour l'Arrow ou si le fichier dépasse le seuil"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    if filepath.rsplit('.', 1)[-1].lower() in ARROW_EXTENSIONS:
+        return True
+    return os.path.getsize(filepath) > STREAM_THRESHOLD_MB * 1024 * 1024
+
+def chart_response(charts):
+    """Enregistre les graphiques pour le rendu à la demande ; ?plots=inline renvoie aussi les images"""
+    plot_renderer.register_all(charts)
+    if request.args.get('plots') == 'inline':
+        return charts, [plot_renderer.render_base64(chart) for chart in charts]
+    return charts, []
+
+def cached_result(digest, route, task, compute, **options):
+    """Résultat d'une route pour un fichier déjà vu, sinon calculé puis mis en cache
+
+    task : 'binary' / 'multiclass' (version des artefacts correspondants) ou None.
+    """
+    version = get_detector().artifact_version(task) if task else ''
+    result_cache.set_version(route, version)
+    key = result_cache.key(digest, route, version, **options)
+    result = result_cache.get(key, version)
+    if result is None:
+        result = result_cache.put(key, compute(), version)
+    return result
+
+def summary_only():
+    return request.args.get('summary') in ('1', 'true')
+
+def row_response(filepath, digest, route, task):
+    """Prédictions ligne à ligne envoyées au fil du scoring (?format=ndjson|arrow)
+
+    ?compression=gzip (ou zstd / lz4 en Arrow), ?offset= et ?limit= pour
+    paginer, ?summary=1 pour l'en-tête et la synthèse seulement. Le fichier
+    appartient ensuite au flux, qui le supprime une fois terminé.
+    """
+    version = get_detector().artifact_version(task)
+    result_cache.set_version(route, version)
+    # Même clé que la réponse JSON par morceaux : une fois le flux complet, la synthèse est en cache
+    key = result_cache.key(digest, route, version, stream=True)
+
+    def on_complete(response):
+        if task == 'multiclass':
+            response['classNames'] = get_detector().class_names
+        result_cache.put(key, response, version)
+
+    owned = f"{filepath}.{time.time_ns()}"
+    os.replace(filepath, owned)
+    compression = request.args.get('compression') or None
+    limit = request.args.get('limit')
+    try:
+        mimetype, pieces = stream_rows(
+            owned, filepath.rsplit('.', 1)[1].lower(), get_detector(), task=task,
+            fmt=request.args.get('format'), compression=compression,
+            offset=int(request.args.get('offset', 0)), limit=int(limit) if limit else None,
+            summary_only=summary_only(), chunk_size=STREAM_CHUNK_SIZE, history=history, on_complete=on_complete
+        )
+    except ValueError as e:
+        os.remove(owned)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def generate():
+        try:
+            yield from pieces
+        finally:
+            if os.path.exists(owned):
+                os.remove(owned)
+
+    response = Response(generate(), mimetype=mimetype)
+    if compression == 'gzip':
+        response.headers['Content-Encoding'] = 'gzip'
+    # Pas de mise en tampon par un éventuel proxy : les lots partent dès qu'ils sont scorés
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def profile_options(filepath):
+    """Mode de profilage de /analyse : ?approx=0|1 et ?sample=<fraction>"""
+    approx = request.args.get('approx')
+    if approx is None:
+        approximate = os.path.getsize(filepath) > PROFILE_APPROX_THRESHOLD_MB * 1024 * 1024
+    else:
+        approximate = approx in ('1', 'true')
+    sample_rate = float(request.args.get('sample', PROFILE_SAMPLE_RATE if approximate else 1.0))
+    if not 0 < sample_rate <= 1:
+        raise ValueError("Le taux d'échantillonnage doit être dans ]0, 1]")
+    return {'approximate': approximate, 'sample_rate': sample_rate, 'chunk_size': STREAM_CHUNK_SIZE}
 # Dictionnaire pour stocker les utilisateurs (remplacez par une base de données en production)
 users = {}
 
@@ -194,8 +428,148 @@ def serve_report(report_type):
 def health_check():
     return "Server is running", 200
 
+@app.before_request
+def refresh_artifacts():
+    # Rechargement à chaud si un artefact a changé (vérification limitée dans le temps)
+    if detector is not None:
+        detector.refresh()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Étiquetée par règle de route (et non par URL) pour borner le nombre de séries
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request', time.perf_counter() - started, route=route, method=request.method)
+    return response
+
+@app.route('/metrics')
+def metrics_prometheus():
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/summary')
+def metrics_summary():
+    return jsonify(metrics.summary())
+
+def history_args():
+    """Filtres communs des routes /history : intervalle (epoch ou ISO 8601), source, tâche"""
+    return {
+        'start': parse_time(request.args.get('start')),
+        'end': parse_time(request.args.get('end')),
+        'source': request.args.get('source') or None,
+        'task': request.args.get('task') or None
+    }
 
-
+@app.route('/history')
+def history_query():
+    if history is None:
+        return jsonify({'error': "Historique désactivé"}), 404
+    try:
+        min_score = request.args.get('min_score')
+        return jsonify(history.query(
+            predicted=request.args.get('predicted') or None,
+            min_score=float(min_score) if min_score else None,
+            limit=min(max(int(request.args.get('limit', 100)), 1), HISTORY_MAX_LIMIT),
+            offset=max(int(request.args.get('offset', 0)), 0),
+            **history_args()
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/history/counts')
+def history_counts():
+    if history is None:
+        return jsonify({'error': "Historique désactivé"}), 404
+    try:
+        bucket = request.args.get('bucket')
+        options = history_args()
+        # Comptage par tâche : binaire par défaut
+        options['task'] = options['task'] or 'binary'
+        return jsonify(history.count(bucket=float(bucket) if bucket else None, **options))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/history/top')
+def history_top():
+    if history is None:
+        return jsonify({'error': "Historique désactivé"}), 404
+    try:
+        n = min(max(int(request.args.get('n', 10)), 1), HISTORY_MAX_LIMIT)
+        return jsonify(history.top(n, **history_args()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/history/stats')
+def history_stats():
+    if history is None:
+        return jsonify({'error': "Historique désactivé"}), 404
+    return jsonify(history.stats())
+
+@app.route('/artifacts')
+def artifacts():
+    from registry import registry
+    return jsonify(registry.snapshot())
+
+@app.route('/startup')
+def startup_report():
+    report = profile.report()
+    report['detector_loaded'] = detector is not None
+    return jsonify(report)
+
+@app.route('/live/stats')
+def live_stats():
+    stats = live_feed.stats() if live_feed else {}
+    if worker_channel is not None:
+        stats['worker'] = worker_channel.stats()
+    return jsonify(stats)
+
+@app.route('/cascade/stats')
+def cascade_stats():
+    return jsonify(detector.cascade.stats() if detector else {})
+
+
+
+
+def predict_cascade(filepath):
+    """Prédiction binaire d'un fichier avec la cascade de modèles"""
+    if filepath.endswith('.parquet'):
+        df = pd.read_parquet(filepath)
+    elif filepath.rsplit('.', 1)[-1].lower() in ARROW_EXTENSIONS:
+        # Format fichier (Feather v2) ou flux IPC
+        import pyarrow as pa # type: ignore
+        from columnar import open_arrow
+
+        reader, batches = open_arrow(filepath)
+        df = pa.Table.from_batches(list(batches), schema=reader.schema).to_pandas()
+    else:
+        df = pd.read_csv(filepath)
+    df.columns = df.columns.str.strip()
+
+    result = get_detector().score_cascade(df)
+    total = len(result)
+    malicious = int(result.labels().sum())
+    benign = total - malicious
+    benign_pct = round(benign / total * 100, 2) if total else 0.0
+    malicious_pct = round(malicious / total * 100, 2) if total else 0.0
+
+    return {
+        'success': True,
+        'message': 'Analyse terminée avec succès',
+        'image': '',
+        'predictions': [{
+            'Model': 'Cascade',
+            'Final Prediction': 'Malicious' if malicious > benign else 'Benign',
+            'Confidence (%)': max(benign_pct, malicious_pct),
+            'Benign (%)': benign_pct,
+            'Malicious (%)': malicious_pct
+        }],
+        'stats': {'total': total, 'benign': benign, 'malicious': malicious},
+        'cascade': result.stage_counts()
+    }
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -208,26 +582,54 @@ def predict():
         return jsonify({'error': 'Aucun fichier sélectionné'}), 400
     
     if not allowed_file(file.filename):
-        return jsonify({'error': 'Seuls les fichiers CSV ou Parquet sont acceptés'}), 400
+        return jsonify({'error': 'Seuls les fichiers CSV, Parquet ou Arrow sont acceptés'}), 400
 
     try:
         # Sauvegarde temporaire du fichier
         filename = secure_filename(file.filename)
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        digest = save_upload(file, filepath)
         
-        # Traitement du fichier
-        result = process_file(filepath)
+        # Mode cascade : sortie anticipée des lignes déjà sûres
+        if request.args.get('mode') == 'cascade':
+            cascade = get_detector().cascade
+            response = dict(cached_result(digest, 'predict-cascade', 'binary', lambda: predict_cascade(filepath),
+                                          order=cascade.order, bands=cascade.bands))
+            response['charts'], images = chart_response(prediction_charts(response['predictions'], 'binary'))
+            response['image'] = images[0] if images else ''
+            return jsonify(response)
+
+        if request.args.get('format'):
+            return row_response(filepath, digest, 'predict', 'binary')
+
+        def compute():
+            # Gros fichiers : scoring par morceaux à mémoire bornée
+            if streaming:
+                return stream_predict(filepath, filename.rsplit('.', 1)[1].lower(), get_detector(),
+                                      task='binary', chunk_size=STREAM_CHUNK_SIZE, history=history)
+            # Traitement du fichier
+            return process_file(filepath)
+
+        streaming = use_streaming(filepath)
+        result = cached_result(digest, 'predict', 'binary', compute, stream=streaming)
         
-        if not result or 'image' not in result:
-             raise ValueError("Erreur lors de la génération du graphique")
+        if not result:
+             raise ValueError("Erreur lors de l'analyse du fichier")
+
+        if summary_only():
+            return jsonify({'success': True, 'predictions': result.get('predictions', []),
+                            'stats': result.get('stats', {}), 'histograms': result.get('histograms')})
+
+        charts, images = chart_response(result.get('charts') or prediction_charts(result.get('predictions', []), 'binary'))
         
         return jsonify({
             'success': True,
             'message': 'Analyse terminée avec succès',
-            'image': result['image'],  # déjà en base64
+            'image': result.get('image') or (images[0] if images else ''),  # base64, sinon voir charts
+            'charts': charts,
             'predictions': result.get('predictions', []),
-            'stats': result.get('stats', {})
+            'stats': result.get('stats', {}),
+            'histograms': result.get('histograms')
         })
         
     except Exception as e:
@@ -251,31 +653,39 @@ def analyse():
         return jsonify({'error': 'Aucun fichier sélectionné'}), 400
     
     if not allowed_file(file.filename):
-        return jsonify({'error': 'Seuls les fichiers CSV ou Parquet sont acceptés'}), 400
+        return jsonify({'error': 'Seuls les fichiers CSV, Parquet ou Arrow sont acceptés'}), 400
 
     try:
         # Sauvegarde temporaire du fichier
         filename = secure_filename(file.filename)
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        digest = save_upload(file, filepath)
         
         # Déterminer le type de fichier
         file_ext = filename.rsplit('.', 1)[1].lower()
         
-        # Analyser le fichier
-        analysis_results = analyze_uploaded_file(filepath, file_ext)
-        
-        if 'error' in analysis_results:
-            raise ValueError(analysis_results['error'])
+        # Analyser le fichier (les erreurs ne sont pas mises en cache)
+        options = profile_options(filepath)
+        key = result_cache.key(digest, 'analyse', **options)
+        analysis_results = result_cache.get(key)
+        if analysis_results is None:
+            analysis_results = analyze_uploaded_file(filepath, file_ext, **options)
+            if 'error' in analysis_results:
+                raise ValueError(analysis_results['error'])
+            analysis_results = result_cache.put(key, analysis_results)
+
+        charts, plots = chart_response(analysis_results['charts'])
         
         return jsonify({
             'success': True,
             'message': 'Analyse terminée avec succès',
-            'plots': analysis_results['plots'],
+            'plots': plots,
+            'charts': charts,
             'file_info': analysis_results['file_info'],
             'missing_analysis': analysis_results['missing_analysis'],
             'column_stats': analysis_results['column_stats'],
             'issues': analysis_results['issues'],
+            'error_bounds': analysis_results.get('error_bounds'),
             'execution_time': analysis_results['execution_time']
         })
         
@@ -303,22 +713,45 @@ def predictM():
         # Sauvegarde temporaire
         filename = secure_filename(file.filename)
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        digest = save_upload(file, filepath)
+
+        if request.args.get('format'):
+            return row_response(filepath, digest, 'predict-multiclass', 'multiclass')
+
+        def compute():
+            if streaming:
+                # Scoring par morceaux à mémoire bornée
+                result = stream_predict(filepath, filename.rsplit('.', 1)[1].lower(), get_detector(),
+                                        task='multiclass', chunk_size=STREAM_CHUNK_SIZE, history=history)
+                return dict(result, classNames=detector.class_names)
+
+            # Traitement
+            result = process_file_m(filepath)
 
-        # Traitement
-        result = process_file_m(filepath)
+            # Classes du label encoder, chargé une seule fois par le registre
+            from registry import registry, load_joblib
+            label_encoder = registry.get('label_encoder.pkl', load_joblib)
+            return dict(result, classNames=list(label_encoder.classes_))
 
-        # Chargement des classes (label encoder)
-        label_encoder = load_artifacts()['label_encoder']
-        classes = list(label_encoder.classes_)
+        streaming = use_streaming(filepath)
+        result = cached_result(digest, 'predict-multiclass', 'multiclass', compute, stream=streaming)
+
+        if summary_only():
+            return jsonify({'success': True, 'predictions': result.get('predictions', []),
+                            'stats': result.get('stats', {}), 'histograms': result.get('histograms'),
+                            'classNames': result['classNames']})
+
+        charts, images = chart_response(result.get('charts') or prediction_charts(result.get('predictions', []), 'multiclass'))
 
         return jsonify({
             'success': True,
-            'image': result.get('image', ''),
+            'image': result.get('image') or (images[0] if images else ''),
+            'charts': charts,
             'predictions': result.get('predictions', []),
             
             'stats': result.get('stats', {}),
-            'classNames': classes  # <- nécessaire pour `results.classNames.map`
+            'histograms': result.get('histograms'),
+            'classNames': result['classNames']  # <- nécessaire pour `results.classNames.map`
         })
 
     except Exception as e:
@@ -327,10 +760,209 @@ def predictM():
         if 'filepath' in locals() and os.path.exists(filepath):
             os.remove(filepath)
 
+@app.route('/predict-combined', methods=['POST'])
+def predict_combined():
+    """Binaire sur toutes les lignes puis type d'attaque des lignes malveillantes, en une lecture du fichier"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'Aucun fichier fourni'}), 400
 
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Aucun fichier sélectionné'}), 400
 
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Seuls les fichiers CSV, Parquet ou Arrow sont acceptés'}), 400
 
+    try:
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        digest = save_upload(file, filepath)
 
+        def compute():
+            return stream_predict(filepath, filename.rsplit('.', 1)[1].lower(), get_detector(),
+                                  task='two-stage', chunk_size=STREAM_CHUNK_SIZE, max_rows=COMBINED_MAX_ROWS,
+                                  history=history)
+
+        # Les deux versions d'artefacts entrent dans la clé
+        result = cached_result(digest, 'predict-combined', 'multiclass', compute,
+                               binary_version=get_detector().artifact_version('binary'),
+                               max_rows=COMBINED_MAX_ROWS)
+
+        charts, images = chart_response(result['charts'])
+        return jsonify({
+            'success': True,
+            'message': 'Analyse terminée avec succès',
+            'image': images[0] if images else '',
+            'charts': charts,
+            'predictions': result['predictions'],
+            'stats': result['stats'],
+            'histograms': result['histograms'],
+            'multiclass': result['multiclass'],
+            'flagged': result['flagged'],
+            'flagged_truncated': result['flagged_truncated']
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        if 'filepath' in locals() and os.path.exists(filepath):
+            os.remove(filepath)
+
+
+@app.route('/predict-pcap', methods=['POST'])
+def predict_pcap():
+    """Extraction des flux d'une capture pcap / pcapng et scoring ; ?multiclass=1 ajoute les modèles multiclasses"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'Aucun fichier fourni'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Aucun fichier sélectionné'}), 400
+
+    if not is_pcap(file.filename):
+        return jsonify({'error': 'Seules les captures pcap ou pcapng sont acceptées'}), 400
+
+    try:
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(UPLOAD_FOLDER, f"{time.time_ns()}_{filename}")
+        digest = save_upload(file, filepath)
+
+        multiclass = request.args.get('multiclass') in ('1', 'true')
+        tasks = ('binary', 'multiclass') if multiclass else ('binary',)
+
+        def compute():
+            return ingest_pcap(filepath, get_detector(), tasks=tasks,
+                               score_batch=PCAP_SCORE_BATCH, max_flows=PCAP_MAX_FLOWS)
+
+        if multiclass:
+            # Les deux versions d'artefacts entrent dans la clé
+            result = cached_result(digest, 'predict-pcap-multiclass', 'multiclass', compute,
+                                   binary_version=get_detector().artifact_version('binary'))
+        else:
+            result = cached_result(digest, 'predict-pcap', 'binary', compute)
+
+        charts, images = chart_response(result['charts'])
+        binary = result['binary']
+        return jsonify({
+            'success': True,
+            'message': 'Analyse terminée avec succès',
+            'image': images[0] if images else '',
+            'charts': charts,
+            'predictions': binary['predictions'],
+            'stats': binary['stats'],
+            'histograms': binary.get('histograms'),
+            'multiclass': result.get('multiclass'),
+            'ingest': result['ingest']
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        if 'filepath' in locals() and os.path.exists(filepath):
+            os.remove(filepath)
+
+
+
+
+
+
+
+# Jobs d'analyse asynchrones
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    if 'file' not in request.files:
+        return jsonify({'error': 'Aucun fichier fourni'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Aucun fichier sélectionné'}), 400
+
+    kind = request.form.get('kind', 'predict')
+    if kind not in JOB_KINDS:
+        return jsonify({'error': f"Type de job inconnu: {kind}"}), 400
+
+    if kind == 'predict-pcap':
+        if not is_pcap(file.filename):
+            return jsonify({'error': 'Seules les captures pcap ou pcapng sont acceptées'}), 400
+    elif not allowed_file(file.filename):
+        return jsonify({'error': 'Seuls les fichiers CSV, Parquet ou Arrow sont acceptés'}), 400
+
+    # Nom unique : plusieurs analystes peuvent envoyer le même fichier
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(UPLOAD_FOLDER, f"{time.time_ns()}_{filename}")
+    file.save(filepath)
+
+    tasks = None
+    if kind == 'predict-pcap':
+        # Comme /predict-pcap : binaire, plus multiclasse avec multiclass=1
+        multiclass = (request.form.get('multiclass') or request.args.get('multiclass')) in ('1', 'true')
+        tasks = ('binary', 'multiclass') if multiclass else ('binary',)
+    job_id = job_manager.submit(kind, filepath, filename, tasks=tasks)
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify(job_manager.list())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    if status['state'] != 'done':
+        return jsonify({'success': False, 'state': status['state'], 'error': status.get('error')}), 409
+    result = job_manager.result(job_id)
+    plot_renderer.register_all(result.get('charts', []))
+    return jsonify(dict(result, success=True))
+
+# Cache des résultats
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/cache', methods=['DELETE'])
+def clear_cache():
+    result_cache.invalidate()
+    return jsonify({'success': True})
+
+# Graphiques rendus à la demande
+@app.route('/plots/stats')
+def plot_stats():
+    return jsonify(plot_renderer.stats())
+
+@app.route('/plots/<key>', methods=['GET'])
+def get_chart(key):
+    chart = plot_renderer.chart(key)
+    if chart is None:
+        return jsonify({'error': 'Graphique introuvable'}), 404
+    return jsonify(chart)
+
+@app.route('/plots/<key>.<fmt>', methods=['GET'])
+def render_plot(key, fmt):
+    if fmt not in CHART_FORMATS:
+        return jsonify({'error': 'Format non supporté'}), 400
+    try:
+        data = plot_renderer.render(key, fmt)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if data is None:
+        return jsonify({'error': 'Graphique introuvable'}), 404
+    # Contenu adressé par empreinte : jamais modifié, cache navigateur illimité
+    return Response(data, mimetype=CHART_FORMATS[fmt],
+                    headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify({'success': True, 'job_id': job_id})
 
 
 @app.route('/surveillance')
@@ -339,41 +971,154 @@ def surveillance():
 
 @socketio.on('connect')
 def handle_connect():
+    # Résumé complet par défaut ; 'subscribe' / 'unsubscribe' pour les autres salons
+    join_room('summary')
     print('Connexion client établie')
 
-@socketio.on('start_detection')
-def handle_start_detection():
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    room = (data or {}).get('room', 'summary')
+    if room.startswith('model:'):
+        # Seuls les modèles du détecteur : model_rooms est parcouru à chaque diffusion
+        name = room.split(':', 1)[1]
+        try:
+            # Premier chargement hors du hub : un abonnement peut précéder le préchauffage
+            current = detector or tpool.execute(get_detector)
+        except FileNotFoundError as e:
+            return {'error': f"Détecteur indisponible: {e}"}
+        names = ['Cascade'] if current.scoring_mode == 'cascade' else current.ensemble.model_names
+        if name not in names:
+            return {'error': f"Modèle inconnu: {name}"}
+        model_rooms.add(name)
+    elif room not in ('summary', 'alerts'):
+        return {'error': f"Salon inconnu: {room}"}
+    join_room(room)
+    return {'room': room}
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    room = (data or {}).get('room', 'summary')
+    leave_room(room)
+    return {'room': room}
+
+def start_detection():
     global is_detection_running
     with thread_lock:
         if not is_detection_running:
             is_detection_running = True
             socketio.start_background_task(detection_loop)
+            socketio.start_background_task(summary_loop)
             print('Détection démarrée')
 
-@socketio.on('stop_detection')
-def handle_stop_detection():
+def stop_detection():
     global is_detection_running
     with thread_lock:
         is_detection_running = False
         print('Détection arrêtée')
 
-def detection_loop():
+@socketio.on('start_detection')
+def handle_start_detection():
+    # Mode pré-forké : seul le meneur exécute la détection
+    if worker_channel is not None and not worker_channel.is_leader:
+        worker_channel.send_to_leader('start')
+    else:
+        start_detection()
+
+@socketio.on('stop_detection')
+def handle_stop_detection():
+    if worker_channel is not None and not worker_channel.is_leader:
+        worker_channel.send_to_leader('stop')
+    else:
+        stop_detection()
+
+def handle_channel_message(kind, data):
+    """Messages du canal entre workers : résumés du meneur, commandes vers le meneur"""
+    if kind == 'summary':
+        emit_frames(data)
+    elif kind == 'start':
+        start_detection()
+    elif kind == 'stop':
+        stop_detection()
+
+def emit_frames(summary):
+    """Diffuse un résumé aux salons des clients de ce processus"""
+    with metrics.timer('socketio_emit'):
+        socketio.emit('summary', summary, to='summary')
+        alerts = alert_payload(summary)
+        if alerts is not None:
+            socketio.emit('alerts', alerts, to='alerts')
+        for name in list(model_rooms):
+            payload = model_payload(summary, name)
+            if payload is not None:
+                socketio.emit('model', payload, to=f"model:{name}")
+
+def emit_summary():
+    """Diffuse le résumé de la fenêtre écoulée, ici et dans les autres workers"""
+    extra = None
+    if live_feed is not None:
+        stats = live_feed.stats()
+        extra = {'lag_ms': stats['lag_last_ms'], 'queue_depth': stats['queue']['depth'],
+                 'dropped': stats['queue']['dropped']}
+    summary = summary_window.snapshot(extra)
+    if summary is None:
+        return
+    emit_frames(summary)
+    if worker_channel is not None:
+        worker_channel.publish('summary', summary)
+
+def summary_loop():
     while is_detection_running:
-        try:
-            packet = detector.generate_realistic_packet()
-            results = detector.process_packet(packet)
-            
-            socketio.emit('update', {
-                'timestamp': time.strftime('%H:%M:%S'),
-                'results': results
-            })
-            eventlet.sleep(3)
-            
-        except Exception as e:
-            print(f"Erreur: {str(e)}")
-            break
+        eventlet.sleep(SUMMARY_INTERVAL)
+        emit_summary()
+
+def score_live_batch(detector, records):
+    """Scoring d'un lot temps réel et journalisation des verdicts (thread natif)"""
+    if history is None:
+        return detector.score_records(records)
+    result, digests = detector.score_records(records, digests=True)
+    history.append(result, digests, source='live')
+    return result
+
+def detection_loop():
+    global live_feed
+    detector = get_detector()
+    source = create_source(LIVE_SOURCE, detector.generate_realistic_packet)
+    feed = live_feed = LiveFeed(source, maxsize=LIVE_QUEUE_SIZE, policy=LIVE_OVERFLOW,
+                                batch_size=LIVE_BATCH_SIZE, max_latency=LIVE_BATCH_LATENCY).start()
+    try:
+        while is_detection_running:
+            records, enqueued_at = feed.get_batch(timeout=0.5)
+            if not records:
+                continue
+            try:
+                # Scoring dans un thread natif : la boucle eventlet reste disponible
+                result = tpool.execute(score_live_batch, detector, records)
+            except Exception as e:
+                print(f"Erreur: {str(e)}")
+                continue
+            summary_window.add(result, records)
+            feed.done(enqueued_at)
+    finally:
+        feed.stop()
+        if history is not None:
+            tpool.execute(history.flush)
         
 
 
-if __name__ == "__main__":
-    socketio.run(app , host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+profile.mark('app_ready')
+
+
+def main():
+    """Lance le serveur ; point d'entrée : server.py"""
+    if SERVE_WORKERS > 1:
+        from prefork import serve
+
+        shared_detector = preload_shared()
+        serve(app, host="0.0.0.0", port=5000, workers=SERVE_WORKERS,
+              on_worker_start=lambda channel: start_worker(channel, shared_detector))
+    else:
+        if PREWARM:
+            # Le greenlet ne démarre qu'une fois le serveur en écoute ; le chargement
+            # s'exécute dans un thread natif pour ne pas bloquer la boucle eventlet
+            socketio.start_background_task(tpool.execute, prewarm)
+        socketio.run(app , host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,435 @@
+"""Suite de benchmarks reproductible : détection, scoring des uploads, profilage, Socket.IO.
+
+Les données sont générées (schéma CICIDS, graine fixe) : aucun jeu de données
+à télécharger. Chaque suite s'exécute dans un processus neuf, pour que les
+imports, le chargement des modèles et la mémoire d'une suite ne faussent pas
+la suivante :
+
+    packet     PacketDetector.process_batch pour plusieurs tailles de lot
+    flask      /predict, /predict-multiclass et /predict-combined via le client de test Flask, en
+               mode par morceaux (cache de résultats vidé avant chaque requête)
+    analyse    analyze_uploaded_file sur 10k / 1M / 10M lignes
+    socketio   diffusion d'un résumé de surveillance à N clients
+
+Pour chaque cas : débit (éléments/s), latence p50 / p99 par exécution et pic
+de RSS (remis à zéro avant chaque cas quand le noyau le permet). Le résultat
+est écrit en JSON et peut être comparé à une référence enregistrée :
+
+    python bench.py --baseline reports/bench/baseline.json
+    python bench.py --suite packet --save-baseline
+
+Le code de sortie vaut 1 si une régression dépasse la tolérance.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import numpy as np
+import pandas as pd
+from flows import FLOW_FEATURES
+
+SUITES = ('packet', 'flask', 'analyse', 'socketio')
+BENCH_DIR = os.path.join('reports', 'bench')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+SEED = 2017
+
+PACKET_BATCH_SIZES = (1, 16, 64, 256, 1024)
+FLASK_ROWS = (10_000, 100_000)
+ANALYSE_ROWS = (10_000, 1_000_000, 10_000_000)
+SOCKETIO_CLIENTS = (1, 10, 100)
+QUICK_SCALE = 100  # --quick : tailles de fichiers divisées d'autant
+WRITE_CHUNK = 200_000
+
+# Comparaison à la référence : sens d'amélioration de chaque mesure
+COMPARED = {'p50_ms': -1, 'p99_ms': -1, 'throughput': 1, 'peak_rss_mb': -1}
+DEFAULT_TOLERANCE = 0.10
+
+# Classes du jeu CICIDS2017 et proportions approximatives
+LABELS = ('Benign', 'DoS', 'DDoS', 'PortScan', 'Bot', 'BruteForce', 'Web Attack', 'Infiltration')
+LABEL_WEIGHTS = (0.80, 0.07, 0.05, 0.05, 0.01, 0.01, 0.007, 0.003)
+
+
+# --- Données synthétiques ---------------------------------------------------
+
+def _column_kind(name):
+    if name == 'Protocol':
+        return 'protocol'
+    if 'URG Flags' in name or 'Bulk' in name or name == 'CWE Flag Count':
+        return 'zero'
+    if 'Flag' in name:
+        return 'flag'
+    if '/s' in name:
+        return 'rate'
+    if any(word in name for word in ('Duration', 'IAT', 'Active', 'Idle')):
+        return 'time'
+    if 'Win Bytes' in name:
+        return 'window'
+    if 'Packets' in name and 'Length' not in name:
+        return 'count'
+    if 'Ratio' in name:
+        return 'ratio'
+    return 'size'
+
+
+def synthetic_frame(n, seed=SEED, columns=None, labels=True):
+    """DataFrame de `n` flux au schéma CICIDS (colonnes inconnues : uniformes sur [0, 1000))
+
+    Les flux d'attaque (20 %) sont plus courts, plus denses et plus petits,
+    pour que les modèles voient des scores variés.
+    """
+    rng = np.random.default_rng(seed)
+    label = rng.choice(len(LABELS), size=n, p=LABEL_WEIGHTS)
+    attack = label > 0
+    # Facteurs d'échelle par ligne, communs aux colonnes d'une même famille
+    scale = {'time': np.where(attack, 0.05, 1.0), 'rate': np.where(attack, 20.0, 1.0),
+             'size': np.where(attack, 0.3, 1.0), 'count': np.where(attack, 0.5, 1.0)}
+    data = {}
+    for name in columns or FLOW_FEATURES:
+        kind = _column_kind(name) if name in FLOW_FEATURES else 'unknown'
+        if kind == 'protocol':
+            values = rng.choice([6, 17, 0], size=n, p=[0.7, 0.28, 0.02])
+        elif kind == 'flag':
+            values = (rng.random(n) < 0.3).astype(np.int64)
+        elif kind == 'zero':
+            values = np.zeros(n, dtype=np.int64)
+        elif kind == 'rate':
+            values = rng.lognormal(6, 2.5, n) * scale['rate']
+        elif kind == 'time':
+            values = rng.lognormal(10, 3, n) * scale['time']
+        elif kind == 'window':
+            values = rng.choice([-1, 0, 229, 8192, 29200, 65535], size=n)
+        elif kind == 'count':
+            values = np.ceil(rng.lognormal(1.2, 1.2, n) * scale['count']).astype(np.int64)
+        elif kind == 'ratio':
+            values = rng.integers(0, 4, n)
+        elif kind == 'size':
+            values = rng.lognormal(4.5, 1.5, n) * scale['size']
+        else:
+            values = rng.uniform(0, 1000, n)
+        data[name] = values
+    df = pd.DataFrame(data)
+    if labels:
+        df['Label'] = np.asarray(LABELS)[label]
+    return df
+
+
+def write_synthetic(n, file_format='csv', seed=SEED, columns=None, directory=None):
+    """Fichier synthétique de `n` lignes, généré par morceaux et réutilisé d'une exécution à l'autre"""
+    columns = list(columns or FLOW_FEATURES)
+    directory = directory or os.path.join(BENCH_DIR, 'data')
+    os.makedirs(directory, exist_ok=True)
+    schema = hashlib.sha256('\n'.join(columns).encode()).hexdigest()[:12]
+    path = os.path.join(directory, f"synthetic-{n}-{seed}-{schema}.{file_format}")
+    if os.path.exists(path):
+        return path
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    writer = None
+    for i, start in enumerate(range(0, n, WRITE_CHUNK)):
+        chunk = synthetic_frame(min(WRITE_CHUNK, n - start), seed + i, columns)
+        if file_format == 'csv':
+            chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        elif file_format == 'parquet':
+            import pyarrow as pa # type: ignore
+            import pyarrow.parquet as pq # type: ignore
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+        else:
+            raise ValueError(f"Format non pris en charge: {file_format}")
+    if writer is not None:
+        writer.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def synthetic_records(n, seed=SEED, columns=None):
+    """Flux synthétiques sous forme de dicts, comme ceux reçus par la surveillance"""
+    return synthetic_frame(n, seed, columns, labels=False).to_dict(orient='records')
+
+
+# --- Mesure -----------------------------------------------------------------
+
+def _reset_peak_rss():
+    """Remet à zéro le pic de RSS du processus (Linux) ; False si impossible"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, Ko ailleurs
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(name, fn, items=1, params=None, warmup=1, min_runs=5, max_runs=1000, min_time=1.0, setup=None):
+    """Exécute `fn` jusqu'à `min_runs` fois et `min_time` secondes (au plus `max_runs`)
+
+    `items` : éléments traités par exécution (débit = items / durée moyenne).
+    `setup` est appelé avant chaque exécution, hors chronométrage.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    reset = _reset_peak_rss()
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < max_runs and (len(durations) < min_runs or time.perf_counter() - started < min_time):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t)
+    durations = np.asarray(durations)
+    return {
+        'name': name,
+        'params': params or {},
+        'runs': len(durations),
+        'items': items,
+        'mean_ms': round(float(durations.mean()) * 1000, 4),
+        'p50_ms': round(float(np.percentile(durations, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(durations, 99)) * 1000, 4),
+        'throughput': round(items / float(durations.mean()), 2),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'rss_scope': 'case' if reset else 'process'
+    }
+
+
+def _quick(sizes, quick):
+    if not quick:
+        return sizes
+    return tuple(sorted({max(1000, n // QUICK_SCALE) for n in sizes}))
+
+
+# --- Suites (exécutées dans un processus dédié) -----------------------------
+
+def bench_packet(options):
+    from detection import PacketDetector
+
+    detector = PacketDetector()
+    detector.initialize(backend=options['backend'])
+    columns = detector.required_columns()
+    results = []
+    for batch_size in PACKET_BATCH_SIZES:
+        packets = synthetic_records(batch_size, SEED, columns)
+        results.append(measure('process_batch', lambda: detector.process_batch(packets), items=batch_size,
+                               params={'batch': batch_size, 'backend': options['backend']}))
+    packet = packets[0]
+    results.append(measure('process_packet', lambda: detector.process_packet(packet),
+                           params={'backend': options['backend']}))
+    return results
+
+
+def bench_flask(options):
+    import app as server
+
+    detector = server.load_detector()
+    columns = list(dict.fromkeys(detector.required_columns() + detector.required_columns('multiclass')))
+    client = server.app.test_client()
+    results = []
+    for n in _quick(FLASK_ROWS, options['quick']):
+        path = write_synthetic(n, options['format'], columns=columns)
+        filename = f"bench.{options['format']}"
+        for route in ('/predict', '/predict-multiclass', '/predict-combined'):
+            def post():
+                # ?stream=1 : scoring par le détecteur (streaming.py), quelle que soit la taille
+                with open(path, 'rb') as f:
+                    response = client.post(f"{route}?stream=1", data={'file': (f, filename)})
+                if response.status_code != 200:
+                    raise RuntimeError(f"{route}: {response.status_code} {response.get_json()}")
+
+            results.append(measure(route, post, items=n, params={'rows': n, 'format': options['format']},
+                                   warmup=1, min_runs=3, max_runs=20, setup=server.result_cache.invalidate))
+    server.plot_renderer.shutdown()
+    return results
+
+
+def bench_analyse(options):
+    from analyse import analyze_uploaded_file
+
+    results = []
+    for n in _quick(ANALYSE_ROWS, options['quick']):
+        path = write_synthetic(n, options['format'])
+        # Gros fichiers : une seule exécution, sans tour de chauffe
+        large = n >= 1_000_000
+        results.append(measure('analyze_uploaded_file', lambda: analyze_uploaded_file(path, options['format']),
+                               items=n, params={'rows': n, 'format': options['format']},
+                               warmup=0 if large else 1, min_runs=1 if large else 3, max_runs=20,
+                               min_time=0 if large else 1.0))
+    return results
+
+
+def bench_socketio(options):
+    import app as server
+    from live_summary import SummaryWindow
+
+    detector = server.load_detector()
+    records = synthetic_records(512, SEED, detector.required_columns())
+    window = SummaryWindow(top_n=server.SUMMARY_TOP_N)
+    window.add(detector.score_records(records), records)
+    summary = window.snapshot()
+    results = []
+    for n in SOCKETIO_CLIENTS:
+        clients = [server.socketio.test_client(server.app) for _ in range(n)]
+
+        def emit():
+            server.emit_frames(summary)
+            for client in clients:
+                client.get_received()
+
+        results.append(measure('socketio_fanout', emit, items=n, params={'clients': n}))
+        for client in clients:
+            client.disconnect()
+    return results
+
+
+SUITE_FUNCTIONS = {'packet': bench_packet, 'flask': bench_flask, 'analyse': bench_analyse,
+                   'socketio': bench_socketio}
+
+
+def run_suite(name, options):
+    results = SUITE_FUNCTIONS[name](options)
+    for result in results:
+        result['suite'] = name
+    return results
+
+
+def run(suites, options):
+    """Exécute chaque suite dans un processus neuf et renvoie le rapport complet"""
+    results = []
+    for name in suites:
+        print(f"Suite {name}...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            results.extend(pool.submit(run_suite, name, options).result())
+    return {'meta': environment(options), 'results': results}
+
+
+def environment(options):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': SEED,
+        'options': options
+    }
+
+
+# --- Comparaison à la référence ---------------------------------------------
+
+def case_key(result):
+    params = ','.join(f"{k}={v}" for k, v in sorted(result['params'].items()))
+    return f"{result['name']}[{params}]"
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Écarts relatifs par cas et par mesure ; statut 'regression' au-delà de la tolérance"""
+    reference = {case_key(r): r for r in baseline['results']}
+    rows = []
+    for result in report['results']:
+        base = reference.get(case_key(result))
+        if base is None:
+            continue
+        for metric, direction in COMPARED.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction < -tolerance:
+                status = 'regression'
+            elif change * direction > tolerance:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append({'case': case_key(result), 'metric': metric, 'baseline': old, 'current': new,
+                         'change_pct': round(change * 100, 1), 'status': status})
+    return rows
+
+
+def print_report(report, comparison=None):
+    print(f"{'cas':<52} {'exéc.':>6} {'p50 ms':>10} {'p99 ms':>10} {'débit/s':>12} {'RSS Mo':>8}")
+    for r in report['results']:
+        print(f"{case_key(r):<52} {r['runs']:>6} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} "
+              f"{r['throughput']:>12.1f} {r['peak_rss_mb']:>8.1f}")
+    if comparison:
+        print()
+        for row in comparison:
+            if row['status'] != 'ok':
+                print(f"{row['status']:<12} {row['case']:<52} {row['metric']:<12} "
+                      f"{row['baseline']} -> {row['current']} ({row['change_pct']:+.1f} %)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de détection, de scoring et de profilage")
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help="suite à exécuter (répétable ; toutes par défaut)")
+    parser.add_argument('--backend', default='auto', choices=['auto', 'numpy', 'numpy-float16', 'numpy-int8', 'keras'])
+    parser.add_argument('--format', default='csv', choices=['csv', 'parquet'],
+                        help="format des fichiers synthétiques")
+    parser.add_argument('--quick', action='store_true', help=f"fichiers {QUICK_SCALE} fois plus petits")
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'latest.json'))
+    parser.add_argument('--baseline', help="rapport de référence à comparer")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f"enregistre le rapport comme référence ({BASELINE_PATH} par défaut)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="écart relatif toléré avant de signaler une régression")
+    args = parser.parse_args(argv)
+
+    options = {'backend': args.backend, 'format': args.format, 'quick': args.quick}
+    report = run(args.suite or SUITES, options)
+
+    comparison = None
+    # Avec --save-baseline, une référence encore absente est simplement créée
+    if args.baseline and (os.path.exists(args.baseline) or not args.save_baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(report, baseline, args.tolerance)
+        report['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance, 'rows': comparison}
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        path = args.baseline or BASELINE_PATH
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print_report(report, comparison)
+    if comparison and any(row['status'] == 'regression' for row in comparison):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Cascade de modèles binaires avec sortie anticipée.
+
+Les modèles sont évalués du moins coûteux au plus coûteux. Après chaque
+étage, seules les lignes dont la probabilité reste dans la bande
+d'incertitude ]seuil - bande, seuil + bande[ passent à l'étage suivant ;
+les autres sortent avec la décision de l'étage courant.
+
+Calibration hors ligne sur un CSV étiqueté :
+    python cascade.py calibrate data.csv --bands 0.1 0.2 0.3 0.4
+"""
+import argparse
+import sys
+import time
+from threading import Lock
+import numpy as np
+import pandas as pd
+from metrics import metrics
+
+
+class CascadeResult:
+    """Probabilité finale et étage de sortie de chaque ligne"""
+
+    def __init__(self, stage_names, probabilities, exit_stage, threshold=0.5):
+        self.stage_names = list(stage_names)
+        self.probabilities = probabilities
+        self.exit_stage = exit_stage
+        self.threshold = threshold
+
+    def __len__(self):
+        return self.probabilities.shape[0]
+
+    def labels(self):
+        return (self.probabilities > self.threshold).astype(np.int8)
+
+    def stage_counts(self):
+        """Nombre de lignes sorties à chaque étage"""
+        counts = np.bincount(self.exit_stage, minlength=len(self.stage_names))
+        return {name: int(c) for name, c in zip(self.stage_names, counts)}
+
+    def format_row(self, i):
+        prob = float(self.probabilities[i])
+        return [{
+            'Modèle': self.stage_names[self.exit_stage[i]],
+            'Statut': '🔴 Malicieux' if prob > self.threshold else '🟢 Bénin',
+            'Confiance': f"{prob*100:.1f}%",
+            'Valeur brute': f"{prob:.4f}"
+        }]
+
+    def format(self):
+        with metrics.timer('format'):
+            return [self.format_row(i) for i in range(len(self))]
+
+
+class CascadeScorer:
+    """Évalue les modèles dans l'ordre `order` avec sortie anticipée.
+
+    bands : largeur de la bande d'incertitude après chaque étage (sauf le
+    dernier) ; un flottant unique s'applique à tous les étages.
+    """
+
+    def __init__(self, models, order=None, bands=0.4, threshold=0.5):
+        self.order = list(order) if order else list(models)
+        missing = [name for name in self.order if name not in models]
+        if missing:
+            raise ValueError(f"Modèles inconnus dans la cascade: {', '.join(missing)}")
+        if np.isscalar(bands):
+            bands = [bands] * (len(self.order) - 1)
+        if len(bands) != len(self.order) - 1:
+            raise ValueError("Il faut une bande par étage, sauf pour le dernier")
+        self.models = [models[name] for name in self.order]
+        self.bands = [float(b) for b in bands]
+        self.threshold = threshold
+        self.stats_lock = Lock()
+        self.rows = 0
+        self.exits = np.zeros(len(self.order), dtype=np.int64)
+
+    def predict(self, X):
+        """Score `X` et retourne un `CascadeResult`"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        probabilities = np.empty(n_rows, dtype=np.float32)
+        exit_stage = np.full(n_rows, len(self.order) - 1, dtype=np.int8)
+        active = np.arange(n_rows)
+
+        for stage, model in enumerate(self.models):
+            if active.size == 0:
+                break
+            with metrics.timer('model_forward', task='cascade', model=self.order[stage]):
+                probs = np.asarray(model.predict(X[active], verbose=0))[:, 0]
+            probabilities[active] = probs
+            if stage == len(self.models) - 1:
+                break
+            uncertain = np.abs(probs - self.threshold) < self.bands[stage]
+            exit_stage[active[~uncertain]] = stage
+            active = active[uncertain]
+
+        result = CascadeResult(self.order, probabilities, exit_stage, self.threshold)
+        with self.stats_lock:
+            self.rows += n_rows
+            self.exits += np.bincount(exit_stage, minlength=len(self.order))
+        return result
+
+    def stats(self):
+        """Sorties cumulées par étage depuis le démarrage"""
+        with self.stats_lock:
+            return {
+                'order': self.order,
+                'bands': self.bands,
+                'rows': int(self.rows),
+                'exits': {name: int(c) for name, c in zip(self.order, self.exits)},
+                'exit_ratio': {
+                    name: round(float(c) / self.rows, 4) if self.rows else 0.0
+                    for name, c in zip(self.order, self.exits)
+                }
+            }
+
+
+def binary_labels(labels):
+    """Étiquettes binaires à partir d'une colonne Label (texte ou 0/1)"""
+    if pd.api.types.is_numeric_dtype(labels):
+        return labels.astype(np.int8).to_numpy()
+    return (labels.astype(str).str.strip() != 'Benign').astype(np.int8).to_numpy()
+
+
+def binary_rates(y_true, y_pred):
+    """Accuracy, taux de détection, FAR et AMR (définitions de far_amr_b)"""
+    tn = int(np.sum((y_true == 0) & (y_pred == 0)))
+    fp = int(np.sum((y_true == 0) & (y_pred == 1)))
+    fn = int(np.sum((y_true == 1) & (y_pred == 0)))
+    tp = int(np.sum((y_true == 1) & (y_pred == 1)))
+    return {
+        'accuracy': (tp + tn) / len(y_true) if len(y_true) else 0.0,
+        'detection_rate': tp / (tp + fn) if tp + fn else 0.0,
+        'far': fp / (tn + fp) if tn + fp else 0.0,
+        'amr': fn / (tp + fn) if tp + fn else 0.0
+    }
+
+
+def calibrate_cascade(detector, df, bands_grid, order=None, label_column='Label'):
+    """Mesure le compromis précision / débit de la cascade sur des données étiquetées.
+
+    Retourne la référence (ensemble complet, vote majoritaire) puis une ligne
+    par bande testée.
+    """
+    y_true = binary_labels(df[label_column])
+    X = np.ascontiguousarray(detector.prepare_features(df.drop(columns=[label_column])), dtype=np.float32)
+
+    start = time.perf_counter()
+    full = detector.ensemble.predict(X)
+    full_time = time.perf_counter() - start
+    reference = dict(binary_rates(y_true, full.majority_vote()),
+                     mode='ensemble', rows_per_s=len(X) / full_time if full_time else 0.0)
+
+    report = [reference]
+    for band in bands_grid:
+        cascade = CascadeScorer(detector.models, order=order, bands=band)
+        start = time.perf_counter()
+        result = cascade.predict(X)
+        elapsed = time.perf_counter() - start
+        rows_per_s = len(X) / elapsed if elapsed else 0.0
+        report.append(dict(
+            binary_rates(y_true, result.labels()),
+            mode='cascade',
+            band=band,
+            rows_per_s=rows_per_s,
+            speedup=rows_per_s / reference['rows_per_s'] if reference['rows_per_s'] else 0.0,
+            exits=result.stage_counts()
+        ))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibration de la cascade de modèles binaires")
+    sub = parser.add_subparsers(dest='command', required=True)
+    calibrate = sub.add_parser('calibrate', help="Compromis précision / débit sur un CSV étiqueté")
+    calibrate.add_argument('data')
+    calibrate.add_argument('--bands', type=float, nargs='+', default=[0.1, 0.2, 0.3, 0.4, 0.45])
+    calibrate.add_argument('--order', nargs='+', help="ex. 'Model 1' 'Model 3' 'Model 5'")
+    calibrate.add_argument('--label-column', default='Label')
+    args = parser.parse_args(argv)
+
+    from detection import PacketDetector
+
+    detector = PacketDetector()
+    detector.initialize()
+    df = pd.read_csv(args.data)
+    df.columns = df.columns.str.strip()
+
+    for row in calibrate_cascade(detector, df, args.bands, order=args.order, label_column=args.label_column):
+        label = 'ensemble' if row['mode'] == 'ensemble' else f"bande {row['band']:.2f}"
+        line = (f"{label:<12} acc={row['accuracy']*100:.2f}% détection={row['detection_rate']*100:.2f}% "
+                f"FAR={row['far']:.4f} AMR={row['amr']:.4f} {row['rows_per_s']:.0f} lignes/s")
+        if row['mode'] == 'cascade':
+            line += f" x{row['speedup']:.2f} sorties={row['exits']}"
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Lecture colonnaire des fichiers de flux pour le scoring.
+
+Seules les colonnes utilisées par les modèles sont lues : projection de
+colonnes pour le Parquet et le CSV, mappage mémoire pour les fichiers Arrow
+IPC / Feather. Chaque lot est remis sous forme de matrice NumPy float32
+(colonnes dans l'ordre demandé), sans DataFrame intermédiaire pour les
+formats Arrow.
+"""
+import numpy as np
+from metrics import metrics
+
+ARROW_EXTENSIONS = {'arrow', 'feather', 'ipc'}
+
+
+def _resolve_columns(available, columns):
+    """Associe chaque colonne demandée au nom réel du fichier (espaces CICIDS)"""
+    by_stripped = {name.strip(): name for name in available}
+    missing = [c for c in columns if c not in by_stripped]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+    return [by_stripped[c] for c in columns]
+
+
+def _fill_nan(X):
+    """Équivalent de fillna(0), en place"""
+    X[np.isnan(X)] = 0
+    return X
+
+
+def _fill_matrix(arrays, n_rows):
+    """Copie des colonnes Arrow dans une matrice float32 ; NaN -> 0"""
+    X = np.empty((n_rows, len(arrays)), dtype=np.float32)
+    for j, array in enumerate(arrays):
+        # to_numpy est sans copie pour les colonnes numériques sans nulls
+        X[:, j] = array.to_numpy(zero_copy_only=False)
+    return _fill_nan(X)
+
+
+def _record_batch_matrix(batch, names):
+    return _fill_matrix([batch.column(batch.schema.get_field_index(n)) for n in names], batch.num_rows)
+
+
+def iter_parquet(filepath, columns, batch_size):
+    import pyarrow.parquet as pq # type: ignore
+
+    parquet_file = pq.ParquetFile(filepath, memory_map=True)
+    names = _resolve_columns(parquet_file.schema_arrow.names, columns)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=names):
+        yield _record_batch_matrix(batch, names)
+
+
+def open_arrow(filepath):
+    """Ouvre un fichier Arrow IPC (format fichier ou flux) en mappage mémoire"""
+    import pyarrow as pa # type: ignore
+
+    source = pa.memory_map(filepath, 'r')
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader, [reader.get_batch(i) for i in range(reader.num_record_batches)]
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader, reader
+
+
+def iter_arrow(filepath, columns, batch_size):
+    reader, batches = open_arrow(filepath)
+    names = _resolve_columns(reader.schema.names, columns)
+    for batch in batches:
+        # Les record batches sont des vues sur le fichier mappé : le découpage ne copie rien
+        for offset in range(0, batch.num_rows, batch_size):
+            yield _record_batch_matrix(batch.slice(offset, batch_size), names)
+
+
+def iter_csv(filepath, columns, batch_size):
+    import pandas as pd
+
+    wanted = set(columns)
+    for chunk in pd.read_csv(filepath, chunksize=batch_size, usecols=lambda c: c.strip() in wanted):
+        names = _resolve_columns(chunk.columns, columns)
+        yield _fill_nan(chunk[names].to_numpy(dtype=np.float32))
+
+
+def check_columns(filepath, file_ext, columns):
+    """Vérifie la présence des colonnes d'après le schéma ou l'en-tête seul ; ValueError sinon"""
+    if file_ext == 'parquet':
+        import pyarrow.parquet as pq # type: ignore
+
+        available = pq.ParquetFile(filepath, memory_map=True).schema_arrow.names
+    elif file_ext in ARROW_EXTENSIONS:
+        available = open_arrow(filepath)[0].schema.names
+    elif file_ext == 'csv':
+        import pandas as pd
+
+        available = pd.read_csv(filepath, nrows=0).columns
+    else:
+        raise ValueError("Type de fichier non supporté")
+    _resolve_columns(available, columns)
+
+
+def _timed(batches, file_ext):
+    """Chronomètre la lecture de chaque lot (étape 'file_parse')"""
+    while True:
+        with metrics.timer('file_parse', format=file_ext):
+            batch = next(batches, None)
+        if batch is None:
+            return
+        yield batch
+
+
+def iter_feature_batches(filepath, file_ext, columns, batch_size=100_000):
+    """Itère sur des matrices float32 (n_lignes, len(columns))"""
+    if file_ext == 'parquet':
+        return _timed(iter_parquet(filepath, columns, batch_size), file_ext)
+    if file_ext in ARROW_EXTENSIONS:
+        return _timed(iter_arrow(filepath, columns, batch_size), file_ext)
+    if file_ext == 'csv':
+        return _timed(iter_csv(filepath, columns, batch_size), file_ext)
+    raise ValueError("Type de fichier non supporté")
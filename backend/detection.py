@@ -1,42 +1,141 @@
 import threading
 import numpy as np
 import pandas as pd
-import pickle
-from tensorflow.keras.models import load_model # type: ignore
+import os
 import time
 from threading import Lock
+from ensemble import EnsembleExecutor, TwoStageResult
+from features import FeaturePipeline, row_digests
+from cascade import CascadeScorer
+from numpy_mlp import NumpyMLP, bundle_path_for
+from registry import registry, load_joblib, load_keras, load_pickle
+
+MODEL_FILES_B = {
+    'Model 1': 'model_1_b.keras',
+    'Model 2': 'model_2_b.keras',
+    'Model 3': 'model_3_b.keras',
+    'Model 4': 'model_4_b.keras',
+    'Model 5': 'model_5_b.keras'
+}
+
+MODEL_FILES_M = {
+    'Model 1': 'model_1_m.keras',
+    'Model 2': 'model_2_m.keras',
+    'Model 3': 'model_3_m.keras',
+    'Model 4': 'model_4_m.keras',
+    'Model 5': 'model_5_m.keras'
+}
+
+ARTIFACT_FILES_B = ('feature_tuples_b.pkl', 'normalizer_b.pkl', 'selected_features_final_b.pkl')
+ARTIFACT_FILES_M = ('label_encoder.pkl', 'feature_tuples_m.pkl')
 
 class PacketDetector:
     def __init__(self):
         self.models = None
+        self.ensemble = None
+        self.cascade = None
+        self.scoring_mode = 'ensemble'
+        self.models_m = None
+        self.ensemble_m = None
+        self.features_m = None
+        self.label_encoder = None
+        self.backend = 'auto'
         self.normalizer = None
         self.selected_features = None
         self.features = None
         self.weights = None
+        self.pipeline = None
         self.thread = None
         self.thread_lock = Lock()
         self.is_running = False
 
-    def initialize(self):
-        """Charge tous les artefacts et modèles"""
-        with open('feature_tuples_b.pkl', 'rb') as f:
-            feature_tuples = pickle.load(f)
-            
-        with open('normalizer_b.pkl', 'rb') as f:
-            self.normalizer = pickle.load(f)
-            
-        with open('selected_features_final_b.pkl', 'rb') as f:
-            self.selected_features = pickle.load(f)
-
-        self.models = {
-            'Model 1': load_model('model_1_b.keras'),
-            'Model 2': load_model('model_2_b.keras'),
-            'Model 3': load_model('model_3_b.keras'),
-            'Model 4': load_model('model_4_b.keras'),
-            'Model 5': load_model('model_5_b.keras')
-        }
+    def initialize(self, backend='auto'):
+        """Charge tous les artefacts et modèles (via le registre partagé)
+
+        backend : 'keras', 'numpy' (bundles .npz exportés par numpy_mlp.py),
+        'numpy-float16' / 'numpy-int8' (bundles quantifiés, voir
+        `numpy_mlp.py quantize`) ou 'auto' (NumPy si tous les bundles
+        float32 existent, Keras sinon).
+        """
+        feature_tuples_path, normalizer_path, selected_path = ARTIFACT_FILES_B
+        feature_tuples = registry.get(feature_tuples_path, load_pickle)
+        self.normalizer = registry.get(normalizer_path, load_pickle)
+        self.selected_features = registry.get(selected_path, load_pickle)
+
+        self.backend = backend
+        models = self.load_models(MODEL_FILES_B, backend)
+        if not self._same_models(self.models, models):
+            self.models = models
+            self.ensemble = EnsembleExecutor(self.models, task='binary')
+            if self.cascade is not None:
+                self.cascade = CascadeScorer(self.models, order=self.cascade.order, bands=self.cascade.bands)
 
         self.features, self.weights = zip(*feature_tuples)
+        self.pipeline = FeaturePipeline.from_normalizer(self.features, self.weights,
+                                                        self.selected_features, self.normalizer)
+
+    def initialize_multiclass(self, backend=None):
+        """Charge les artefacts multiclasses (au premier appel)"""
+        if self.ensemble_m is not None:
+            return
+        self._load_multiclass(backend or self.backend)
+
+    def _load_multiclass(self, backend):
+        label_encoder_path, feature_tuples_path = ARTIFACT_FILES_M
+        self.label_encoder = registry.get(label_encoder_path, load_joblib)
+        self.features_m = [name for name, _ in registry.get(feature_tuples_path, load_pickle)]
+        models = self.load_models(MODEL_FILES_M, backend)
+        if not self._same_models(self.models_m, models):
+            self.models_m = models
+            self.ensemble_m = EnsembleExecutor(self.models_m, task='multiclass')
+
+    def refresh(self):
+        """Recharge les artefacts modifiés sur le disque ; retourne True si rechargés"""
+        if self.models is None or not registry.changed():
+            return False
+        self.initialize(self.backend)
+        if self.ensemble_m is not None:
+            self._load_multiclass(self.backend)
+        return True
+
+    @staticmethod
+    def _same_models(current, new):
+        return current is not None and current.keys() == new.keys() and all(
+            current[name] is new[name] for name in new
+        )
+
+    @property
+    def class_names(self):
+        return [str(c) for c in self.label_encoder.classes_]
+
+    def model_paths(self, model_files, backend='auto'):
+        """Moteur effectif et chemins des modèles à charger"""
+        if backend == 'auto':
+            has_bundles = all(os.path.exists(bundle_path_for(p)) for p in model_files.values())
+            backend = 'numpy' if has_bundles else 'keras'
+
+        if backend == 'numpy' or backend.startswith('numpy-'):
+            precision = backend.partition('-')[2] or 'float32'
+            return backend, {name: bundle_path_for(path, precision) for name, path in model_files.items()}
+        if backend == 'keras':
+            return backend, dict(model_files)
+        raise ValueError(f"Moteur d'inférence inconnu: {backend}")
+
+    def load_models(self, model_files, backend='auto'):
+        """Charge les modèles avec le moteur demandé"""
+        backend, paths = self.model_paths(model_files, backend)
+        loader = NumpyMLP.load if backend.startswith('numpy') else load_keras
+        return {name: registry.get(path, loader) for name, path in paths.items()}
+
+    def artifact_version(self, task='binary'):
+        """Empreinte des artefacts et modèles utilisés par une tâche"""
+        if task == 'multiclass':
+            self.initialize_multiclass()
+            files, model_files = ARTIFACT_FILES_M, MODEL_FILES_M
+        else:
+            files, model_files = ARTIFACT_FILES_B, MODEL_FILES_B
+        _, paths = self.model_paths(model_files, self.backend)
+        return registry.version(list(files) + list(paths.values()))
 
     def generate_realistic_packet(self):
         """Génère un paquet réseau réaliste"""
@@ -78,21 +177,95 @@ class PacketDetector:
 
     def process_packet(self, packet):
         """Traite un paquet et retourne les résultats"""
-        df = pd.DataFrame([packet]).fillna(0)
-        X_norm = self.normalizer.transform(df[list(self.features)])
-        df['Combined_Importance_Score'] = X_norm.dot(np.array(self.weights))
-        X = df[self.selected_features]
-        
-        results = []
-        for model_name, model in self.models.items():
-            prob = model.predict(X, verbose=0)[0][0]
-            results.append({
-                'Modèle': model_name,
-                'Statut': '🔴 Malicieux' if prob > 0.5 else '🟢 Bénin',
-                'Confiance': f"{prob*100:.1f}%",
-                'Valeur brute': f"{prob:.4f}"
-            })
-        return results
+        return self.process_batch([packet])[0]
+
+    def process_batch(self, packets):
+        """Traite un lot de paquets en un seul passage par modèle"""
+        return self.score_records(packets).format()
+
+    def score_records(self, records, digests=False):
+        """Score des enregistrements selon le mode courant, sans formatage
+
+        records : liste de dicts ou DataFrame. Les colonnes absentes valent 0 et
+        les colonnes inconnues sont ignorées. Avec digests=True, renvoie
+        (résultat, empreinte des colonnes brutes de chaque ligne).
+        """
+        if isinstance(records, pd.DataFrame):
+            X = self.pipeline.matrix_from_frame(records)
+        else:
+            X = self.pipeline.matrix_from_records(records)
+        row_digest = row_digests(X) if digests else None
+        X = self.pipeline.transform(X)
+        if self.scoring_mode == 'cascade':
+            result = self._cascade().predict(X)
+        else:
+            result = self.ensemble.predict(X)
+        return (result, row_digest) if digests else result
+
+    def required_columns(self, task='binary'):
+        """Colonnes brutes à lire dans un fichier pour scorer une tâche
+
+        'two-stage' : colonnes binaires suivies des colonnes multiclasses manquantes.
+        """
+        if task == 'multiclass':
+            self.initialize_multiclass()
+            return list(self.features_m)
+        columns = list(self.pipeline.columns)
+        if task == 'two-stage':
+            self.initialize_multiclass()
+            columns += [name for name in self.features_m if name not in columns]
+        return columns
+
+    def prepare_matrix(self, X):
+        """Prétraitement sur matrice float32 ordonnée selon required_columns('binary')"""
+        return self.pipeline.transform(X[:, :len(self.pipeline.columns)])
+
+    def score_matrix(self, X, task='binary'):
+        """Score une matrice de colonnes brutes (voir required_columns)"""
+        if task == 'multiclass':
+            self.initialize_multiclass()
+            return self.ensemble_m.predict(X)
+        if task == 'two-stage':
+            return self.score_two_stage(X)
+        return self.ensemble.predict(self.prepare_matrix(X))
+
+    def score_two_stage(self, X):
+        """Ensemble binaire sur toutes les lignes, puis multiclasse sur les seules lignes malveillantes
+
+        X est ordonnée selon required_columns('two-stage') : le fichier n'est lu
+        et converti qu'une fois pour les deux étages. Les modèles multiclasses
+        ayant été entraînés sur les seules attaques, les lignes bénignes ne
+        leur sont pas soumises.
+        """
+        binary = self.ensemble.predict(self.prepare_matrix(X))
+        flagged = np.flatnonzero(binary.majority_vote())
+        if flagged.size == 0:
+            return TwoStageResult(binary, flagged)
+        index = {name: i for i, name in enumerate(self.required_columns('two-stage'))}
+        columns = [index[name] for name in self.features_m]
+        return TwoStageResult(binary, flagged, self.ensemble_m.predict(X[np.ix_(flagged, columns)]))
+
+    def score_cascade(self, df):
+        """Score un DataFrame avec la cascade à sortie anticipée"""
+        return self._cascade().predict(self.prepare_features(df))
+
+    def _cascade(self):
+        if self.cascade is None:
+            raise RuntimeError("La cascade n'est pas configurée")
+        return self.cascade
+
+    def enable_cascade(self, order=None, bands=0.4):
+        """Configure la cascade et l'utilise pour la détection temps réel"""
+        self.cascade = CascadeScorer(self.models, order=order, bands=bands)
+        self.scoring_mode = 'cascade'
+        return self.cascade
+
+    def disable_cascade(self):
+        self.scoring_mode = 'ensemble'
+
+    def prepare_features(self, df):
+        """Prétraitement partagé : normalisation, score d'importance combiné et interactions (voir features.py)"""
+        return self.pipeline.transform_frame(df)
 
     def detection_loop(self, socketio):
         """Boucle principale de détection"""
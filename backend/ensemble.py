@@ -0,0 +1,185 @@
+"""Évaluation groupée des cinq modèles binaires ou multiclasses.
+
+L'entrée commune est convertie une seule fois en matrice float32. Pour les
+modèles NumPy, les premières couches Dense sont concaténées en une seule
+multiplication matricielle ; pour les modèles Keras, les appels `predict`
+peuvent être lancés en parallèle. Les chaînes formatées ne sont produites
+qu'à la demande.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from metrics import metrics
+from numpy_mlp import ACTIVATIONS, NumpyMLP, dense
+
+
+class EnsembleResult:
+    """Sorties compactes d'un ensemble : une colonne par modèle"""
+
+    def __init__(self, model_names, scores, probabilities=None, threshold=0.5):
+        self.model_names = list(model_names)
+        # binaire : probabilité de la classe malveillante, (n_rows, n_models)
+        # multiclasse : indice de classe prédit, (n_rows, n_models)
+        self.scores = scores
+        # multiclasse uniquement : (n_rows, n_models, n_classes)
+        self.probabilities = probabilities
+        self.threshold = threshold
+
+    @property
+    def is_multiclass(self):
+        return self.probabilities is not None
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def labels(self):
+        """Décision par modèle : 0/1 en binaire, indice de classe en multiclasse"""
+        if self.is_multiclass:
+            return self.scores
+        return (self.scores > self.threshold).astype(np.int8)
+
+    def majority_vote(self):
+        """Classe majoritaire parmi les modèles, par ligne"""
+        labels = self.labels()
+        if not self.is_multiclass:
+            return (labels.sum(axis=1) * 2 > labels.shape[1]).astype(np.int8)
+        n_classes = self.probabilities.shape[2]
+        counts = np.zeros((labels.shape[0], n_classes), dtype=np.int32)
+        for j in range(labels.shape[1]):
+            counts[np.arange(labels.shape[0]), labels[:, j]] += 1
+        return counts.argmax(axis=1)
+
+    def mean_probability(self):
+        """Probabilité moyenne des modèles : (n_rows,) en binaire, (n_rows, n_classes) sinon"""
+        if self.is_multiclass:
+            return self.probabilities.mean(axis=1)
+        return self.scores.mean(axis=1)
+
+    def votes(self):
+        return {
+            'majority': self.majority_vote(),
+            'mean_probability': self.mean_probability()
+        }
+
+    def format_row(self, i, class_names=None):
+        """Résultats formatés d'une ligne, au format de la surveillance temps réel"""
+        results = []
+        for j, model_name in enumerate(self.model_names):
+            if self.is_multiclass:
+                label = int(self.scores[i, j])
+                prob = float(self.probabilities[i, j, label])
+                results.append({
+                    'Modèle': model_name,
+                    'Classe': class_names[label] if class_names is not None else label,
+                    'Confiance': f"{prob*100:.1f}%",
+                    'Valeur brute': f"{prob:.4f}"
+                })
+            else:
+                prob = float(self.scores[i, j])
+                results.append({
+                    'Modèle': model_name,
+                    'Statut': '🔴 Malicieux' if prob > self.threshold else '🟢 Bénin',
+                    'Confiance': f"{prob*100:.1f}%",
+                    'Valeur brute': f"{prob:.4f}"
+                })
+        return results
+
+    def format(self, class_names=None):
+        with metrics.timer('format'):
+            return [self.format_row(i, class_names) for i in range(len(self))]
+
+
+class TwoStageResult:
+    """Scoring en deux étages : ensemble binaire sur toutes les lignes, multiclasse sur les lignes malveillantes"""
+
+    def __init__(self, binary, flagged, multiclass=None):
+        self.binary = binary
+        # Indices (dans le lot) des lignes jugées malveillantes par vote majoritaire
+        self.flagged = flagged
+        # EnsembleResult multiclasse des seules lignes `flagged`, None si aucune
+        self.multiclass = multiclass
+
+    def __len__(self):
+        return len(self.binary)
+
+    def attack_types(self):
+        """Indice de classe d'attaque (vote majoritaire) de chaque ligne signalée"""
+        if self.multiclass is None:
+            return np.empty(0, dtype=np.int64)
+        return self.multiclass.majority_vote()
+
+    def attack_confidence(self):
+        """Probabilité moyenne de la classe retenue, par ligne signalée"""
+        if self.multiclass is None:
+            return np.empty(0, dtype=np.float32)
+        attacks = self.attack_types()
+        return self.multiclass.mean_probability()[np.arange(len(attacks)), attacks]
+
+
+class EnsembleExecutor:
+    """Exécute un dict de modèles nom -> modèle sur une entrée partagée"""
+
+    def __init__(self, models, task='binary', threshold=0.5, max_workers=None):
+        if task not in ('binary', 'multiclass'):
+            raise ValueError(f"Tâche inconnue: {task}")
+        self.models = models
+        self.model_names = list(models)
+        self.task = task
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers) if max_workers and max_workers > 1 else None
+        self._fused = self._fuse_first_layers()
+
+    def _fuse_first_layers(self):
+        """Concatène les premières couches des modèles NumPy de même dimension d'entrée et de même type de poids"""
+        models = list(self.models.values())
+        if not models or not all(isinstance(m, NumpyMLP) for m in models):
+            return None
+        if len({m.input_dim for m in models}) != 1 or len({m.layers[0][0].dtype for m in models}) != 1:
+            return None
+        W = np.concatenate([m.layers[0][0] for m in models], axis=1)
+        b = np.concatenate([m.layers[0][1] for m in models])
+        splits = np.cumsum([m.layers[0][0].shape[1] for m in models])[:-1]
+        # int8 : les échelles par canal suivent les colonnes concaténées
+        scale = np.concatenate([m.scales[0] for m in models]) if models[0].scales[0] is not None else None
+        return W, b, splits, scale
+
+    def _forward_fused(self, X):
+        W, b, splits, scale = self._fused
+        with metrics.timer('model_forward', task=self.task, model='first_layers_fused'):
+            hidden = dense(X, W, b, scale)
+        outputs = []
+        for name, model, h in zip(self.model_names, self.models.values(), np.split(hidden, splits, axis=1)):
+            with metrics.timer('model_forward', task=self.task, model=name):
+                h = ACTIVATIONS[model.layers[0][2]](h)
+                outputs.append(model.forward(h, start=1))
+        return outputs
+
+    def _forward_models(self, X):
+        def predict(item):
+            name, model = item
+            with metrics.timer('model_forward', task=self.task, model=name):
+                return np.asarray(model.predict(X, verbose=0))
+
+        if self.pool:
+            return list(self.pool.map(predict, self.models.items()))
+        return [predict(item) for item in self.models.items()]
+
+    def forward(self, X):
+        """Sorties brutes de chaque modèle, dans l'ordre de `model_names`"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self._fused is not None:
+            return self._forward_fused(X)
+        return self._forward_models(X)
+
+    def predict(self, X):
+        """Évalue tous les modèles et retourne un `EnsembleResult`"""
+        outputs = self.forward(X)
+        if self.task == 'binary':
+            scores = np.stack([out[:, 0] for out in outputs], axis=1)
+            return EnsembleResult(self.model_names, scores, threshold=self.threshold)
+
+        probabilities = np.stack(outputs, axis=1)
+        scores = probabilities.argmax(axis=2)
+        return EnsembleResult(self.model_names, scores, probabilities=probabilities)
@@ -0,0 +1,175 @@
+"""Pipeline de features binaire compilé, partagé par la surveillance et les uploads.
+
+Les positions des colonnes sont résolues une fois au chargement des
+artefacts ; chaque lot passe ensuite par des noyaux NumPy vectorisés sur des
+tampons float32 préalloués (un jeu par thread) :
+
+    1. normes des lignes sur les features du normalizer (l2, l1 ou max) ;
+    2. score d'importance combiné = (X @ poids) / norme, sans matérialiser
+       la matrice normalisée ;
+    3. features d'interaction du notebook (create_new_features_2 / _3),
+       calculées sur les valeurs normalisées comme à l'entraînement ;
+    4. features du normalizer sélectionnées : valeurs normalisées, le
+       notebook ne gardant que la matrice normalisée ; autres colonnes
+       sélectionnées recopiées brutes à leur position.
+
+Ni DataFrame ni recherche par nom dans la boucle : un lot de dicts (temps
+réel) est copié directement dans le tampon d'entrée.
+"""
+import threading
+import numpy as np
+from metrics import metrics
+
+COMBINED_SCORE = 'Combined_Importance_Score'
+# Features construites du notebook : (opération, colonne a, colonne b)
+ENGINEERED_FEATURES = {
+    'Bwd_Fwd_Product': ('product', 'Bwd Packets/s', 'Flow Duration'),
+    'Packet_Length_Std_Diff': ('difference', 'Bwd Packet Length Std', 'Packet Length Std'),
+    'Total_Packets_Diff': ('difference', 'Total Fwd Packets', 'Total Backward Packets')
+}
+NORMS = ('l2', 'l1', 'max')
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+
+class FeaturePipeline:
+    """Colonnes brutes (ordre `columns`) -> matrice float32 des `selected_features`"""
+
+    def __init__(self, features, weights, selected_features, norm='l2'):
+        if norm not in NORMS:
+            raise ValueError(f"Norme inconnue: {norm}")
+        self.features = list(features)
+        self.selected_features = list(selected_features)
+        self.norm = norm
+        self.weights = np.asarray(weights, dtype=np.float32)
+
+        # Entrée : features du normalizer, puis colonnes brutes sélectionnées, puis opérandes des interactions
+        columns = list(self.features)
+        for name in self.selected_features:
+            if name in ENGINEERED_FEATURES:
+                operands = ENGINEERED_FEATURES[name][1:]
+            elif name == COMBINED_SCORE:
+                operands = ()
+            else:
+                operands = (name,)
+            columns += [c for c in operands if c not in columns]
+        self.columns = columns
+        index = {name: i for i, name in enumerate(columns)}
+        n_features = len(self.features)
+
+        # Plan de sortie résolu une fois : positions de copie (normalisées ou brutes), interactions
+        self.combined = [j for j, name in enumerate(self.selected_features) if name == COMBINED_SCORE]
+        self.scale_out, self.scale_in = [], []
+        self.copy_out, self.copy_in = [], []
+        self.interactions = []
+        for j, name in enumerate(self.selected_features):
+            if name in ENGINEERED_FEATURES:
+                op, a, b = ENGINEERED_FEATURES[name]
+                # Opérande normalisé s'il fait partie des features du normalizer
+                self.interactions.append((j, op, index[a], index[a] < n_features, index[b], index[b] < n_features))
+            elif name != COMBINED_SCORE and index[name] < n_features:
+                self.scale_out.append(j)
+                self.scale_in.append(index[name])
+            elif name != COMBINED_SCORE:
+                self.copy_out.append(j)
+                self.copy_in.append(index[name])
+        self.scale_out = np.asarray(self.scale_out, dtype=np.intp)
+        self.scale_in = np.asarray(self.scale_in, dtype=np.intp)
+        self.copy_out = np.asarray(self.copy_out, dtype=np.intp)
+        self.copy_in = np.asarray(self.copy_in, dtype=np.intp)
+        self._local = threading.local()
+
+    @classmethod
+    def from_normalizer(cls, features, weights, selected_features, normalizer):
+        return cls(features, weights, selected_features, norm=getattr(normalizer, 'norm', 'l2'))
+
+    def _buffer(self, name, n_rows, n_cols):
+        """Tampon float32 (n_rows, n_cols) réutilisé par le thread courant ; agrandi au besoin"""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape[0] < n_rows or buffer.shape[1] != n_cols:
+            capacity = 1 << max(n_rows - 1, 0).bit_length()
+            buffer = buffers[name] = np.empty((capacity, n_cols), dtype=np.float32)
+        return buffer[:n_rows]
+
+    def matrix_from_records(self, records):
+        """Copie un lot de dicts dans le tampon d'entrée (colonnes absentes ou nulles -> 0)"""
+        X = self._buffer('input', len(records), len(self.columns))
+        columns = self.columns
+        try:
+            X[:] = [[record.get(name, 0.0) for name in columns] for record in records]
+        except (TypeError, ValueError):
+            X[:] = [[_to_float(record.get(name)) for name in columns] for record in records]
+        X[np.isnan(X)] = 0
+        return X
+
+    def matrix_from_frame(self, df):
+        """Matrice d'entrée d'un DataFrame (colonnes absentes -> 0, NaN -> 0)"""
+        X = self._buffer('input', len(df), len(self.columns))
+        X[:] = df.reindex(columns=self.columns).to_numpy(dtype=np.float32, na_value=0)
+        X[np.isnan(X)] = 0
+        return X
+
+    def transform(self, X):
+        """Matrice (n, len(selected_features)) à partir d'une matrice ordonnée selon `columns`
+
+        La sortie est un tampon du thread courant, valable jusqu'au prochain appel.
+        """
+        n_rows = X.shape[0]
+        n_features = len(self.features)
+        F = X[:, :n_features]
+        with metrics.timer('normalize'):
+            if self.norm == 'l2':
+                norms = np.sqrt(np.einsum('ij,ij->i', F, F))
+            elif self.norm == 'l1':
+                norms = np.abs(F).sum(axis=1)
+            else:
+                norms = np.abs(F).max(axis=1) if n_features else np.zeros(n_rows, dtype=np.float32)
+            # Lignes nulles laissées telles quelles, comme sklearn
+            norms[norms == 0] = 1
+            inverse = np.reciprocal(norms, out=norms)
+
+        out = self._buffer('output', n_rows, len(self.selected_features))
+        with metrics.timer('combined_score'):
+            if self.combined:
+                combined = F @ self.weights
+                combined *= inverse
+                for j in self.combined:
+                    out[:, j] = combined
+            if len(self.scale_out):
+                out[:, self.scale_out] = X[:, self.scale_in] * inverse[:, None]
+            if len(self.copy_out):
+                out[:, self.copy_out] = X[:, self.copy_in]
+            for j, op, a, a_normalized, b, b_normalized in self.interactions:
+                left = X[:, a] * inverse if a_normalized else X[:, a]
+                right = X[:, b] * inverse if b_normalized else X[:, b]
+                if op == 'product':
+                    np.multiply(left, right, out=out[:, j])
+                else:
+                    np.subtract(left, right, out=out[:, j])
+        return out
+
+    def transform_records(self, records):
+        return self.transform(self.matrix_from_records(records))
+
+    def transform_frame(self, df):
+        return self.transform(self.matrix_from_frame(df))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def row_digests(X):
+    """Empreinte 64 bits de chaque ligne d'une matrice de colonnes brutes (FNV-1a sur les mots float32)"""
+    words = np.ascontiguousarray(X, dtype=np.float32).view(np.uint32)
+    digests = np.full(words.shape[0], FNV_OFFSET, dtype=np.uint64)
+    for j in range(words.shape[1]):
+        digests ^= words[:, j]
+        digests *= FNV_PRIME
+    return digests
@@ -0,0 +1,466 @@
+"""Table de flux : construction incrémentale des features CICIDS à partir de paquets.
+
+Chaque paquet (horodatage, 5-uplet, longueur de charge utile, longueur
+d'en-tête, flags TCP, fenêtre) met à jour le flux bidirectionnel auquel il
+appartient ; le sens « forward » est celui du premier paquet du flux, comme
+dans CICFlowMeter. Les moyennes et écarts types sont tenus à jour par lots
+(fusion de Welford / Chan), sans conserver les paquets.
+
+Les flux sont stockés dans un tableau NumPy préalloué (une ligne par flux,
+une colonne par compteur) : la mémoire est bornée par `max_flows`. Les flux
+terminés (inactivité, durée maximale, FIN dans les deux sens ou RST) ou les
+plus anciens quand la table est pleine sont évincés par lots, sous forme
+d'un DataFrame aux colonnes du jeu CICIDS, prêt pour le détecteur.
+"""
+import numpy as np
+import pandas as pd
+
+# Colonnes du jeu CICIDS après nettoyage (voir le notebook), sans 'Label'
+FLOW_FEATURES = [
+    'Protocol', 'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
+    'Fwd Packets Length Total', 'Bwd Packets Length Total', 'Fwd Packet Length Max',
+    'Fwd Packet Length Min', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
+    'Bwd Packet Length Max', 'Bwd Packet Length Min', 'Bwd Packet Length Mean',
+    'Bwd Packet Length Std', 'Flow Bytes/s', 'Flow Packets/s', 'Flow IAT Mean',
+    'Flow IAT Std', 'Flow IAT Max', 'Flow IAT Min', 'Fwd IAT Total', 'Fwd IAT Mean',
+    'Fwd IAT Std', 'Fwd IAT Max', 'Fwd IAT Min', 'Bwd IAT Total', 'Bwd IAT Mean',
+    'Bwd IAT Std', 'Bwd IAT Max', 'Bwd IAT Min', 'Fwd PSH Flags', 'Bwd PSH Flags',
+    'Fwd URG Flags', 'Bwd URG Flags', 'Fwd Header Length', 'Bwd Header Length',
+    'Fwd Packets/s', 'Bwd Packets/s', 'Packet Length Min', 'Packet Length Max',
+    'Packet Length Mean', 'Packet Length Std', 'Packet Length Variance',
+    'FIN Flag Count', 'SYN Flag Count', 'RST Flag Count', 'PSH Flag Count',
+    'ACK Flag Count', 'URG Flag Count', 'CWE Flag Count', 'ECE Flag Count',
+    'Down/Up Ratio', 'Avg Packet Size', 'Avg Fwd Segment Size', 'Avg Bwd Segment Size',
+    'Fwd Avg Bytes/Bulk', 'Fwd Avg Packets/Bulk', 'Fwd Avg Bulk Rate',
+    'Bwd Avg Bytes/Bulk', 'Bwd Avg Packets/Bulk', 'Bwd Avg Bulk Rate',
+    'Subflow Fwd Packets', 'Subflow Fwd Bytes', 'Subflow Bwd Packets',
+    'Subflow Bwd Bytes', 'Init Fwd Win Bytes', 'Init Bwd Win Bytes',
+    'Fwd Act Data Packets', 'Fwd Seg Size Min', 'Active Mean', 'Active Std',
+    'Active Max', 'Active Min', 'Idle Mean', 'Idle Std', 'Idle Max', 'Idle Min'
+]
+# Identification du flux, ajoutée aux features évincées
+FLOW_METADATA = ['Source IP', 'Source Port', 'Destination IP', 'Destination Port', 'Timestamp']
+
+# Champs d'un paquet (colonnes d'un DataFrame ou clés d'un dict de tableaux) ;
+# ts en secondes, length = octets de charge utile, header_length = en-tête transport
+PACKET_FIELDS = ['ts', 'src', 'dst', 'sport', 'dport', 'proto', 'length', 'header_length', 'flags', 'window']
+
+# Flags TCP (octet 13 de l'en-tête)
+FIN, SYN, RST, PSH, ACK, URG, ECE, CWR = (1 << i for i in range(8))
+
+# Colonnes de l'état d'un flux. Un groupe de statistiques occupe 5 colonnes :
+# effectif, moyenne, M2 (somme des carrés des écarts), minimum, maximum
+STAT_N, STAT_MEAN, STAT_M2, STAT_MIN, STAT_MAX = range(5)
+FWD_LEN, BWD_LEN, FLOW_IAT, FWD_IAT, BWD_IAT, ACTIVE, IDLE = (5 * i for i in range(7))
+(PROTO, FIRST_TS, LAST_TS, LAST_FWD_TS, LAST_BWD_TS, ACTIVE_START,
+ FWD_HEADER, BWD_HEADER, FWD_SEG_MIN, INIT_FWD_WIN, INIT_BWD_WIN, FWD_ACT_DATA,
+ SUBFLOWS, FIN_FWD, FIN_BWD, N_FIN, N_SYN, N_RST, N_PSH, N_ACK, N_URG, N_CWR, N_ECE,
+ FWD_PSH, BWD_PSH, FWD_URG, BWD_URG) = range(35, 62)
+N_FIELDS = 62
+STAT_GROUPS = (FWD_LEN, BWD_LEN, FLOW_IAT, FWD_IAT, BWD_IAT, ACTIVE, IDLE)
+
+FLAG_FIELDS = ((FIN, N_FIN), (SYN, N_SYN), (RST, N_RST), (PSH, N_PSH),
+               (ACK, N_ACK), (URG, N_URG), (CWR, N_CWR), (ECE, N_ECE))
+
+SUBFLOW_GAP = 1_000_000  # µs, comme CICFlowMeter
+
+
+def _segments(slots):
+    """Débuts des groupes de valeurs consécutives d'un tableau trié"""
+    return np.flatnonzero(np.r_[True, slots[1:] != slots[:-1]])
+
+
+def _merge_stats(state, slots, values, base):
+    """Fusionne les statistiques (n, moyenne, M2, min, max) des valeurs par flux
+
+    `slots` doit être trié ; la fusion de deux effectifs suit Chan et al.,
+    numériquement stable et indépendante de la taille des lots.
+    """
+    if len(values) == 0:
+        return
+    start = _segments(slots)
+    uniq = slots[start]
+    counts = np.diff(np.r_[start, len(values)])
+    mean_b = np.add.reduceat(values, start) / counts
+    m2_b = np.add.reduceat((values - np.repeat(mean_b, counts)) ** 2, start)
+
+    n_a = state[uniq, base + STAT_N]
+    mean_a = state[uniq, base + STAT_MEAN]
+    n = n_a + counts
+    delta = mean_b - mean_a
+    state[uniq, base + STAT_MEAN] = mean_a + delta * counts / n
+    state[uniq, base + STAT_M2] += m2_b + delta ** 2 * n_a * counts / n
+    state[uniq, base + STAT_N] = n
+    state[uniq, base + STAT_MIN] = np.minimum(state[uniq, base + STAT_MIN], np.minimum.reduceat(values, start))
+    state[uniq, base + STAT_MAX] = np.maximum(state[uniq, base + STAT_MAX], np.maximum.reduceat(values, start))
+
+
+def _std(n, m2):
+    """Écart type d'échantillon (0 pour moins de deux valeurs)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n > 1, np.sqrt(np.maximum(m2, 0) / (n - 1)), 0.0)
+
+
+def _ratio(num, den):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / den, 0.0)
+
+
+def _finite(values):
+    """Minimums / maximums d'un groupe vide (±inf) ramenés à 0"""
+    return np.where(np.isfinite(values), values, 0.0)
+
+
+class FlowTable:
+    """Flux actifs et mise à jour incrémentale de leurs features"""
+
+    def __init__(self, max_flows=1 << 18, idle_timeout=120.0, active_timeout=1800.0,
+                 activity_timeout=5.0, on_flows=None):
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout * 1e6
+        self.active_timeout = active_timeout * 1e6
+        self.activity_timeout = activity_timeout * 1e6
+        self.on_flows = on_flows
+        # np.zeros : les pages ne sont réservées qu'à l'usage
+        self.state = np.zeros((max_flows, N_FIELDS), dtype=np.float64)
+        self.index = {}                      # clé canonique -> ligne
+        self.keys = [None] * max_flows       # ligne -> clé canonique
+        self.forward = [None] * max_flows    # ligne -> (ip, port) de l'initiateur
+        self.free = list(range(max_flows - 1, -1, -1))
+        self.clock = 0.0                     # horodatage (µs) du dernier paquet vu
+        self.packets = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def memory_bytes(self):
+        return self.state.nbytes
+
+    def _allocate(self, key, endpoint, proto):
+        slot = self.free.pop()
+        self.index[key] = slot
+        self.keys[slot] = key
+        self.forward[slot] = endpoint
+        row = self.state[slot]
+        row[:] = 0.0
+        row[PROTO] = proto
+        for base in STAT_GROUPS:
+            row[base + STAT_MIN] = np.inf
+            row[base + STAT_MAX] = -np.inf
+        row[LAST_TS] = row[LAST_FWD_TS] = row[LAST_BWD_TS] = np.nan
+        row[FWD_SEG_MIN] = np.inf
+        row[INIT_FWD_WIN] = row[INIT_BWD_WIN] = -1
+        row[SUBFLOWS] = 1
+        return slot
+
+    def _assign(self, src, dst, sport, dport, proto):
+        """Ligne et sens de chaque paquet ; crée les flux nouveaux"""
+        n = len(src)
+        slots = np.empty(n, dtype=np.intp)
+        forward = np.empty(n, dtype=bool)
+        index = self.index
+        for i, (s, d, sp, dp, p) in enumerate(zip(src, dst, sport, dport, proto)):
+            a, b = (s, sp), (d, dp)
+            key = (p, a, b) if a <= b else (p, b, a)
+            slot = index.get(key)
+            if slot is None:
+                if not self.free:
+                    raise MemoryError("Table de flux pleine")
+                slot = self._allocate(key, a, p)
+            slots[i] = slot
+            forward[i] = self.forward[slot] == a
+        return slots, forward
+
+    def add_packets(self, packets):
+        """Ajoute un lot de paquets ; renvoie les flux évincés (DataFrame, éventuellement vide)"""
+        columns = {field: np.asarray(packets[field]) for field in PACKET_FIELDS}
+        n = len(columns['ts'])
+        evicted = []
+        # Un lot ne peut pas créer plus de flux que la moitié de la table
+        step = max(1, self.max_flows // 2)
+        for offset in range(0, n, step):
+            part = {k: v[offset:offset + step] for k, v in columns.items()}
+            evicted.append(self.expire(part['ts'].min() * 1e6, emit=False))
+            # Table trop pleine : éviction des flux les moins récemment actifs
+            needed = len(part['ts']) - len(self.free)
+            if needed > 0:
+                evicted.append(self._evict(self._oldest(needed)))
+            self._update(part)
+        return self._emit([e for e in evicted if len(e)])
+
+    def _update(self, columns):
+        ts = columns['ts'].astype(np.float64) * 1e6
+        slots, forward = self._assign(columns['src'].tolist(), columns['dst'].tolist(),
+                                      columns['sport'].tolist(), columns['dport'].tolist(),
+                                      columns['proto'].tolist())
+        order = np.lexsort((ts, slots))
+        slots, forward, ts = slots[order], forward[order], ts[order]
+        length = columns['length'].astype(np.float64)[order]
+        header = columns['header_length'].astype(np.float64)[order]
+        flags = columns['flags'].astype(np.int64)[order]
+        window = columns['window'].astype(np.float64)[order]
+        state = self.state
+        self.packets += len(ts)
+        self.clock = max(self.clock, float(ts[-1]))
+
+        start = _segments(slots)
+        uniq = slots[start]
+        last = np.r_[start[1:], len(slots)] - 1
+        first_seen = np.isnan(state[uniq, LAST_TS])
+        state[uniq[first_seen], FIRST_TS] = ts[start[first_seen]]
+        state[uniq[first_seen], ACTIVE_START] = ts[start[first_seen]]
+
+        # Inter-arrivées du flux : le premier paquet d'un groupe se compare au dernier connu
+        previous = np.r_[np.nan, ts[:-1]]
+        previous[start] = state[uniq, LAST_TS]
+        iat = ts - previous
+        has_iat = ~np.isnan(previous)
+        _merge_stats(state, slots[has_iat], iat[has_iat], FLOW_IAT)
+        np.add.at(state[:, SUBFLOWS], slots[has_iat & (iat > SUBFLOW_GAP)], 1)
+        self._update_activity(slots, ts, previous, iat, has_iat)
+        state[uniq, LAST_TS] = ts[last]
+
+        for direction, mask in (('fwd', forward), ('bwd', ~forward)):
+            if not mask.any():
+                continue
+            d_slots, d_ts = slots[mask], ts[mask]
+            d_len, d_header, d_flags, d_window = length[mask], header[mask], flags[mask], window[mask]
+            d_start = _segments(d_slots)
+            d_uniq = d_slots[d_start]
+            d_last = np.r_[d_start[1:], len(d_slots)] - 1
+            last_ts, length_base, iat_base = (
+                (LAST_FWD_TS, FWD_LEN, FWD_IAT) if direction == 'fwd' else (LAST_BWD_TS, BWD_LEN, BWD_IAT)
+            )
+
+            _merge_stats(state, d_slots, d_len, length_base)
+            d_previous = np.r_[np.nan, d_ts[:-1]]
+            d_previous[d_start] = state[d_uniq, last_ts]
+            d_iat = d_ts - d_previous
+            d_has_iat = ~np.isnan(d_previous)
+            _merge_stats(state, d_slots[d_has_iat], d_iat[d_has_iat], iat_base)
+            state[d_uniq, last_ts] = d_ts[d_last]
+
+            # Fenêtre TCP initiale : premier paquet du sens
+            init_win = INIT_FWD_WIN if direction == 'fwd' else INIT_BWD_WIN
+            unset = state[d_uniq, init_win] < 0
+            state[d_uniq[unset], init_win] = d_window[d_start[unset]]
+
+            if direction == 'fwd':
+                np.add.at(state[:, FWD_HEADER], d_slots, d_header)
+                state[d_uniq, FWD_SEG_MIN] = np.minimum(state[d_uniq, FWD_SEG_MIN],
+                                                        np.minimum.reduceat(d_header, d_start))
+                np.add.at(state[:, FWD_ACT_DATA], d_slots, (d_len > 0).astype(np.float64))
+                np.add.at(state[:, FWD_PSH], d_slots, (d_flags & PSH > 0).astype(np.float64))
+                np.add.at(state[:, FWD_URG], d_slots, (d_flags & URG > 0).astype(np.float64))
+                np.add.at(state[:, FIN_FWD], d_slots, (d_flags & FIN > 0).astype(np.float64))
+            else:
+                np.add.at(state[:, BWD_HEADER], d_slots, d_header)
+                np.add.at(state[:, BWD_PSH], d_slots, (d_flags & PSH > 0).astype(np.float64))
+                np.add.at(state[:, BWD_URG], d_slots, (d_flags & URG > 0).astype(np.float64))
+                np.add.at(state[:, FIN_BWD], d_slots, (d_flags & FIN > 0).astype(np.float64))
+
+        for bit, field in FLAG_FIELDS:
+            np.add.at(state[:, field], slots, (flags & bit > 0).astype(np.float64))
+
+    def _update_activity(self, slots, ts, previous, iat, has_iat):
+        """Périodes actives / inactives : un silence > activity_timeout clôt une période active"""
+        gaps = np.flatnonzero(has_iat & (iat > self.activity_timeout))
+        if len(gaps) == 0:
+            return
+        state = self.state
+        g_slots = slots[gaps]
+        first_gap = np.r_[True, g_slots[1:] != g_slots[:-1]]
+        last_gap = np.r_[g_slots[1:] != g_slots[:-1], True]
+        # Début de la période active : mémorisé pour le premier silence du flux, sinon le silence précédent
+        active_start = np.where(first_gap, state[g_slots, ACTIVE_START], np.r_[np.nan, ts[gaps][:-1]])
+        active = previous[gaps] - active_start
+        positive = active > 0
+        _merge_stats(state, g_slots[positive], active[positive], ACTIVE)
+        _merge_stats(state, g_slots, iat[gaps], IDLE)
+        state[g_slots[last_gap], ACTIVE_START] = ts[gaps][last_gap]
+
+    def _oldest(self, count):
+        """Lignes des `count` flux les moins récemment actifs"""
+        slots = np.fromiter(self.index.values(), dtype=np.intp, count=len(self.index))
+        count = min(count, len(slots))
+        last_seen = self.state[slots, LAST_TS]
+        return slots[np.argpartition(last_seen, count - 1)[:count]] if count else slots[:0]
+
+    def expire(self, now=None, emit=True):
+        """Évince les flux terminés à l'instant `now` (µs, par défaut le dernier paquet vu)"""
+        if not self.index:
+            return self._emit([]) if emit else self._empty()
+        now = self.clock if now is None else now
+        slots = np.fromiter(self.index.values(), dtype=np.intp, count=len(self.index))
+        state = self.state
+        done = (
+            (now - state[slots, LAST_TS] > self.idle_timeout)
+            | (now - state[slots, FIRST_TS] > self.active_timeout)
+            | (state[slots, N_RST] > 0)
+            | ((state[slots, FIN_FWD] > 0) & (state[slots, FIN_BWD] > 0))
+        )
+        flows = self._evict(slots[done])
+        return self._emit([flows]) if emit else flows
+
+    def flush(self):
+        """Évince tous les flux (fin de capture)"""
+        slots = np.fromiter(self.index.values(), dtype=np.intp, count=len(self.index))
+        return self._emit([self._evict(slots)])
+
+    def _emit(self, frames):
+        frames = [f for f in frames if len(f)]
+        flows = pd.concat(frames, ignore_index=True) if len(frames) > 1 else (frames[0] if frames else self._empty())
+        if self.on_flows is not None and len(flows):
+            self.on_flows(flows)
+        return flows
+
+    @staticmethod
+    def _empty():
+        return pd.DataFrame(columns=FLOW_METADATA + FLOW_FEATURES)
+
+    def _evict(self, slots):
+        if len(slots) == 0:
+            return self._empty()
+        flows = self.features(slots)
+        metadata = []
+        for slot in slots.tolist():
+            key = self.keys[slot]
+            (src, sport) = self.forward[slot]
+            (dst, dport) = key[2] if key[1] == (src, sport) else key[1]
+            metadata.append((src, sport, dst, dport))
+            del self.index[key]
+            self.keys[slot] = self.forward[slot] = None
+            self.free.append(slot)
+        self.evicted += len(slots)
+        meta = pd.DataFrame(metadata, columns=FLOW_METADATA[:4])
+        meta['Timestamp'] = pd.to_datetime(self.state[slots, FIRST_TS], unit='us')
+        return pd.concat([meta, flows], axis=1)
+
+    def features(self, slots):
+        """Features CICIDS des flux `slots` (sans les évincer)"""
+        s = self.state[slots].copy()
+        n_fwd, n_bwd = s[:, FWD_LEN + STAT_N], s[:, BWD_LEN + STAT_N]
+        n = n_fwd + n_bwd
+        fwd_bytes = s[:, FWD_LEN + STAT_MEAN] * n_fwd
+        bwd_bytes = s[:, BWD_LEN + STAT_MEAN] * n_bwd
+        duration = s[:, LAST_TS] - s[:, FIRST_TS]
+        seconds = duration / 1e6
+
+        # Période active en cours à la clôture du flux
+        tail = s[:, LAST_TS] - s[:, ACTIVE_START]
+        positive = tail > 0
+        if positive.any():
+            rows = np.flatnonzero(positive)
+            _merge_stats(s, rows, tail[rows], ACTIVE)
+
+        # Longueurs, tous sens confondus : fusion des deux sens
+        mean_all = _ratio(fwd_bytes + bwd_bytes, n)
+        delta = s[:, BWD_LEN + STAT_MEAN] - s[:, FWD_LEN + STAT_MEAN]
+        m2_all = s[:, FWD_LEN + STAT_M2] + s[:, BWD_LEN + STAT_M2] + _ratio(delta ** 2 * n_fwd * n_bwd, n)
+        std_all = _std(n, m2_all)
+
+        def stats(base):
+            return (s[:, base + STAT_MEAN], _std(s[:, base + STAT_N], s[:, base + STAT_M2]),
+                    _finite(s[:, base + STAT_MAX]), _finite(s[:, base + STAT_MIN]))
+
+        fwd_mean, fwd_std, fwd_max, fwd_min = stats(FWD_LEN)
+        bwd_mean, bwd_std, bwd_max, bwd_min = stats(BWD_LEN)
+        iat_mean, iat_std, iat_max, iat_min = stats(FLOW_IAT)
+        fiat_mean, fiat_std, fiat_max, fiat_min = stats(FWD_IAT)
+        biat_mean, biat_std, biat_max, biat_min = stats(BWD_IAT)
+        act_mean, act_std, act_max, act_min = stats(ACTIVE)
+        idle_mean, idle_std, idle_max, idle_min = stats(IDLE)
+        zeros = np.zeros(len(s))
+
+        columns = {
+            'Protocol': s[:, PROTO],
+            'Flow Duration': duration,
+            'Total Fwd Packets': n_fwd,
+            'Total Backward Packets': n_bwd,
+            'Fwd Packets Length Total': fwd_bytes,
+            'Bwd Packets Length Total': bwd_bytes,
+            'Fwd Packet Length Max': fwd_max,
+            'Fwd Packet Length Min': fwd_min,
+            'Fwd Packet Length Mean': fwd_mean,
+            'Fwd Packet Length Std': fwd_std,
+            'Bwd Packet Length Max': bwd_max,
+            'Bwd Packet Length Min': bwd_min,
+            'Bwd Packet Length Mean': bwd_mean,
+            'Bwd Packet Length Std': bwd_std,
+            'Flow Bytes/s': _ratio(fwd_bytes + bwd_bytes, seconds),
+            'Flow Packets/s': _ratio(n, seconds),
+            'Flow IAT Mean': iat_mean,
+            'Flow IAT Std': iat_std,
+            'Flow IAT Max': iat_max,
+            'Flow IAT Min': iat_min,
+            'Fwd IAT Total': fiat_mean * s[:, FWD_IAT + STAT_N],
+            'Fwd IAT Mean': fiat_mean,
+            'Fwd IAT Std': fiat_std,
+            'Fwd IAT Max': fiat_max,
+            'Fwd IAT Min': fiat_min,
+            'Bwd IAT Total': biat_mean * s[:, BWD_IAT + STAT_N],
+            'Bwd IAT Mean': biat_mean,
+            'Bwd IAT Std': biat_std,
+            'Bwd IAT Max': biat_max,
+            'Bwd IAT Min': biat_min,
+            'Fwd PSH Flags': s[:, FWD_PSH],
+            'Bwd PSH Flags': s[:, BWD_PSH],
+            'Fwd URG Flags': s[:, FWD_URG],
+            'Bwd URG Flags': s[:, BWD_URG],
+            'Fwd Header Length': s[:, FWD_HEADER],
+            'Bwd Header Length': s[:, BWD_HEADER],
+            'Fwd Packets/s': _ratio(n_fwd, seconds),
+            'Bwd Packets/s': _ratio(n_bwd, seconds),
+            'Packet Length Min': _finite(np.minimum(s[:, FWD_LEN + STAT_MIN], s[:, BWD_LEN + STAT_MIN])),
+            'Packet Length Max': _finite(np.maximum(s[:, FWD_LEN + STAT_MAX], s[:, BWD_LEN + STAT_MAX])),
+            'Packet Length Mean': mean_all,
+            'Packet Length Std': std_all,
+            'Packet Length Variance': std_all ** 2,
+            'FIN Flag Count': s[:, N_FIN],
+            'SYN Flag Count': s[:, N_SYN],
+            'RST Flag Count': s[:, N_RST],
+            'PSH Flag Count': s[:, N_PSH],
+            'ACK Flag Count': s[:, N_ACK],
+            'URG Flag Count': s[:, N_URG],
+            'CWE Flag Count': s[:, N_CWR],
+            'ECE Flag Count': s[:, N_ECE],
+            'Down/Up Ratio': np.floor(_ratio(n_bwd, n_fwd)),
+            'Avg Packet Size': mean_all,
+            'Avg Fwd Segment Size': fwd_mean,
+            'Avg Bwd Segment Size': bwd_mean,
+            # Features de « bulk » : nulles dans CICIDS2017, non calculées
+            'Fwd Avg Bytes/Bulk': zeros,
+            'Fwd Avg Packets/Bulk': zeros,
+            'Fwd Avg Bulk Rate': zeros,
+            'Bwd Avg Bytes/Bulk': zeros,
+            'Bwd Avg Packets/Bulk': zeros,
+            'Bwd Avg Bulk Rate': zeros,
+            'Subflow Fwd Packets': n_fwd / s[:, SUBFLOWS],
+            'Subflow Fwd Bytes': fwd_bytes / s[:, SUBFLOWS],
+            'Subflow Bwd Packets': n_bwd / s[:, SUBFLOWS],
+            'Subflow Bwd Bytes': bwd_bytes / s[:, SUBFLOWS],
+            'Init Fwd Win Bytes': s[:, INIT_FWD_WIN],
+            'Init Bwd Win Bytes': s[:, INIT_BWD_WIN],
+            'Fwd Act Data Packets': s[:, FWD_ACT_DATA],
+            'Fwd Seg Size Min': _finite(s[:, FWD_SEG_MIN]),
+            'Active Mean': act_mean,
+            'Active Std': act_std,
+            'Active Max': act_max,
+            'Active Min': act_min,
+            'Idle Mean': idle_mean,
+            'Idle Std': idle_std,
+            'Idle Max': idle_max,
+            'Idle Min': idle_min
+        }
+        return pd.DataFrame(columns, columns=FLOW_FEATURES)
+
+    def stats(self):
+        return {
+            'active_flows': len(self.index),
+            'max_flows': self.max_flows,
+            'packets': self.packets,
+            'evicted_flows': self.evicted,
+            'memory_bytes': self.memory_bytes
+        }
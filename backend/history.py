@@ -0,0 +1,629 @@
+"""Historique persistant des détections : segments colonnaires partitionnés dans le temps.
+
+Les verdicts (surveillance temps réel, uploads) sont ajoutés à un tampon en
+mémoire, écrit en un segment dès `segment_rows` lignes ou `flush_interval`
+secondes. Un segment est un .npz non compressé, une entrée par colonne :
+
+    timestamp      float64, secondes epoch
+    digest         uint64, empreinte des colonnes brutes (features.row_digests)
+    probabilities  float32 (n, modèles) : probabilité malveillante de chaque
+                   modèle (multiclasse : probabilité de la classe retenue)
+    score          float32, moyenne des modèles (tri des flux suspects)
+    predicted      int16, indice dans les classes du segment
+
+et une entrée `meta` (JSON : source, tâche, modèles, classes, bornes
+temporelles, lignes par classe, score maximal) lue seule pour construire
+l'index. Les segments sont rangés par partition (un répertoire par heure)
+et jamais modifiés ; leurs noms contiennent le pid, si bien que plusieurs
+processus (workers pré-forkés, jobs) écrivent dans le même historique.
+
+L'index en mémoire (bornes, comptes par classe et score maximal de chaque
+segment) répond aux comptages des segments entièrement couverts sans les
+lire et élague les segments inutiles aux requêtes et au top N. Les tampons
+non écrits sont inclus dans les réponses du processus courant.
+
+Compaction, au plus toutes les `compact_interval` secondes et déclenchée
+par les écritures : les partitions plus anciennes que la rétention sont
+supprimées ; dans une partition close, les segments de niveau 0 d'un même
+schéma sont fusionnés une seule fois en segments de niveau 1 triés par
+temps. Chaque ligne est donc écrite au plus deux fois.
+"""
+import argparse
+import calendar
+import datetime
+import functools
+import json
+import os
+import shutil
+import sys
+import time
+import zipfile
+from collections import OrderedDict
+import numpy as np
+if 'eventlet' in sys.modules:
+    # Verrous et threads natifs : append est appelé depuis les threads tpool comme depuis le hub eventlet
+    from eventlet.patcher import original # type: ignore
+    threading = original('threading')
+else:
+    import threading
+from live_summary import result_scores
+
+SEGMENT_ROWS = 65_536
+FLUSH_INTERVAL = 5.0  # secondes
+PARTITION_SECONDS = 3600
+RETENTION_SECONDS = 7 * 86400
+COMPACT_INTERVAL = 600  # secondes
+COMPACT_ROWS = 1 << 20  # lignes max d'un segment fusionné
+REFRESH_INTERVAL = 1.0  # secondes entre deux relectures du répertoire
+CACHE_BYTES = 64 << 20  # colonnes de segments gardées en mémoire
+LOCK_STALE = 3600  # secondes
+READ_RETRIES = 3  # relances d'une requête dont un segment a disparu (compaction, rétention)
+BINARY_CLASSES = ('Benign', 'Malicious')
+PARTITION_FORMAT = '%Y-%m-%dT%H%M%S'
+COLUMNS = ('timestamp', 'digest', 'probabilities', 'score', 'predicted')
+
+
+def result_columns(result, class_names=None):
+    """(tâche, modèles, classes, probabilités (n, m), classe prédite (n,)) d'un lot scoré"""
+    if hasattr(result, 'flagged'):
+        # Deux étages : bénin, ou type d'attaque des lignes signalées
+        if class_names is None:
+            raise ValueError("class_names requis pour un résultat en deux étages")
+        names, probabilities, _ = result_scores(result.binary)
+        predicted = np.zeros(len(result), dtype=np.int16)
+        predicted[result.flagged] = result.attack_types() + 1
+        return 'two-stage', names, ('Benign',) + tuple(class_names), probabilities, predicted
+    if getattr(result, 'is_multiclass', False):
+        if class_names is None:
+            raise ValueError("class_names requis pour un résultat multiclasse")
+        predicted = result.majority_vote()
+        n, m = result.scores.shape
+        probabilities = result.probabilities[np.arange(n)[:, None], np.arange(m), predicted[:, None]]
+        return 'multiclass', result.model_names, tuple(class_names), probabilities, predicted
+    # Binaire ou cascade
+    names, probabilities, verdicts = result_scores(result)
+    return 'binary', names, BINARY_CLASSES, probabilities, verdicts
+
+
+def partition_name(start):
+    return time.strftime(PARTITION_FORMAT, time.gmtime(start))
+
+
+def partition_start(name):
+    return calendar.timegm(time.strptime(name, PARTITION_FORMAT))
+
+
+def parse_time(value):
+    """Instant en secondes epoch ou ISO 8601 (UTC si sans fuseau) ; None si absent"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return moment.timestamp()
+
+
+def segment_meta(columns, schema, partition, level=0, merged=()):
+    source, task, model_names, classes = schema
+    timestamps, score = columns['timestamp'], columns['score']
+    return {
+        'source': source, 'task': task, 'model_names': list(model_names), 'classes': list(classes),
+        'partition': partition, 'level': level, 'rows': len(timestamps),
+        't_min': float(timestamps.min()), 't_max': float(timestamps.max()),
+        'counts': np.bincount(columns['predicted'], minlength=len(classes)).tolist(),
+        'max_score': float(score.max()), 'merged': list(merged)
+    }
+
+
+class Segment:
+    """Entrée d'index : méta-données d'un segment (écrit, ou tampon en mémoire si path est None)"""
+
+    __slots__ = ('path', 'meta', 'size', 'columns')
+
+    def __init__(self, path, meta, size=0, columns=None):
+        self.path = path
+        self.meta = meta
+        self.size = size
+        self.columns = columns
+
+    def __getattr__(self, name):
+        try:
+            return self.meta[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def schema(self):
+        return self.source, self.task, tuple(self.model_names), tuple(self.classes)
+
+    def overlaps(self, start, end):
+        return (start is None or self.t_max >= start) and (end is None or self.t_min < end)
+
+    def within(self, start, end):
+        return (start is None or self.t_min >= start) and (end is None or self.t_max < end)
+
+
+def _time_mask(timestamps, start, end):
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start is not None:
+        mask &= timestamps >= start
+    if end is not None:
+        mask &= timestamps < end
+    return mask
+
+
+def _retry_on_compaction(method):
+    """Relance une requête si un segment sélectionné a été supprimé avant sa lecture
+
+    La compaction écrit le segment fusionné avant de supprimer ceux qu'il
+    remplace : après relecture de l'index, les lignes sont toutes retrouvées.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for _ in range(READ_RETRIES - 1):
+            try:
+                return method(self, *args, **kwargs)
+            except FileNotFoundError:
+                self.refresh()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _Buffer:
+    """Lots en attente d'écriture pour une partition et un schéma"""
+
+    def __init__(self):
+        self.chunks = []
+        self.rows = 0
+        self.created_at = time.monotonic()
+
+    def add(self, columns):
+        self.chunks.append(columns)
+        self.rows += len(columns['timestamp'])
+
+    def columns(self):
+        return {name: np.concatenate([chunk[name] for chunk in self.chunks]) for name in COLUMNS}
+
+
+class HistoryStore:
+    """Journal des verdicts en segments append-only, avec index et requêtes par intervalle de temps"""
+
+    def __init__(self, directory, segment_rows=SEGMENT_ROWS, flush_interval=FLUSH_INTERVAL,
+                 partition_seconds=PARTITION_SECONDS, retention=RETENTION_SECONDS,
+                 compact_interval=COMPACT_INTERVAL):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.flush_interval = flush_interval
+        self.partition_seconds = partition_seconds
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self.lock = threading.Lock()
+        self.buffers = {}   # (partition, schéma) -> _Buffer
+        self.flushing = []  # (partition, schéma, _Buffer) en cours d'écriture, encore visibles
+        self.segments = {}  # chemin -> Segment
+        self.refreshed_at = None
+        self.cache = OrderedDict()  # (chemin, colonne) -> tableau
+        self.cache_bytes = 0
+        self.seq = 0
+        self.last_compaction = time.time()
+        self.written_rows = 0
+        self.rewritten_rows = 0
+        self.compactions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Écriture -------------------------------------------------------------
+
+    def append(self, result, digests=None, timestamp=None, source='live', class_names=None):
+        """Ajoute les verdicts d'un lot scoré ; écrit les tampons pleins ou trop anciens"""
+        task, names, classes, probabilities, predicted = result_columns(result, class_names)
+        n = len(predicted)
+        if n == 0:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        probabilities = np.asarray(probabilities, dtype=np.float32).reshape(n, -1)
+        columns = {
+            'timestamp': np.full(n, timestamp, dtype=np.float64),
+            'digest': np.zeros(n, dtype=np.uint64) if digests is None else np.asarray(digests, dtype=np.uint64),
+            'probabilities': probabilities,
+            'score': probabilities.mean(axis=1),
+            'predicted': np.asarray(predicted, dtype=np.int16)
+        }
+        partition = int(timestamp // self.partition_seconds * self.partition_seconds)
+        key = (partition, (source, task, tuple(names), tuple(classes)))
+        with self.lock:
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = self.buffers[key] = _Buffer()
+            buffer.add(columns)
+        self.flush(due_only=True)
+
+    def flush(self, due_only=False):
+        """Écrit les tampons (seulement ceux pleins ou trop anciens si due_only)"""
+        now = time.monotonic()
+        with self.lock:
+            keys = [key for key, buffer in self.buffers.items() if not due_only or
+                    buffer.rows >= self.segment_rows or now - buffer.created_at >= self.flush_interval]
+            ready = [(*key, self.buffers.pop(key)) for key in keys]
+            self.flushing.extend(ready)
+        for pending in ready:
+            try:
+                self._write(*pending[:2], pending[2].columns(), flushed=pending)
+            except Exception:
+                with self.lock:
+                    self.flushing.remove(pending)
+                raise
+        if ready and time.time() - self.last_compaction >= self.compact_interval:
+            # Hors du chemin d'écriture : la compaction relit et réécrit des segments entiers
+            self.last_compaction = time.time()
+            threading.Thread(target=self.compact, name='history-compact', daemon=True).start()
+
+    def close(self):
+        self.flush()
+
+    def _write(self, partition, schema, columns, level=0, merged=(), flushed=None):
+        meta = segment_meta(columns, schema, partition, level, merged)
+        directory = os.path.join(self.directory, partition_name(partition))
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self.seq += 1
+            name = f"seg-{int(meta['t_min'] * 1000)}-{os.getpid()}-{self.seq}-L{level}.npz"
+        path = os.path.join(directory, name)
+        # Écriture atomique ; les fichiers tmp- sont ignorés par l'index
+        tmp = os.path.join(directory, f'tmp-{name}')
+        np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), **columns)
+        os.replace(tmp, path)
+        with self.lock:
+            # Le tampon écrit quitte les requêtes au moment où son segment y entre
+            self.segments[path] = Segment(path, meta, os.path.getsize(path))
+            if flushed is not None:
+                self.flushing.remove(flushed)
+                self.written_rows += flushed[2].rows
+        return path
+
+    # --- Index ----------------------------------------------------------------
+
+    def _partitions(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        partitions = []
+        for name in sorted(names):
+            try:
+                partitions.append((partition_start(name), os.path.join(self.directory, name)))
+            except ValueError:
+                continue
+        return partitions
+
+    def refresh(self):
+        """Synchronise l'index avec le disque (segments d'autres processus, compaction)"""
+        found, merged = {}, set()
+        for _, directory in self._partitions():
+            try:
+                names = os.listdir(directory)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if not (name.startswith('seg-') and name.endswith('.npz')):
+                    continue
+                path = os.path.join(directory, name)
+                segment = self.segments.get(path)
+                if segment is None:
+                    try:
+                        with np.load(path) as data:
+                            meta = json.loads(data['meta'].tobytes())
+                        segment = Segment(path, meta, os.path.getsize(path))
+                    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                        continue
+                found[path] = segment
+                merged.update(os.path.join(directory, m) for m in segment.merged)
+        # Segments déjà fusionnés dont la suppression a été interrompue
+        for path in merged:
+            found.pop(path, None)
+        with self.lock:
+            # Segments écrits par ce processus après la lecture du répertoire
+            for path, segment in self.segments.items():
+                if path not in found and path not in merged and os.path.exists(path):
+                    found[path] = segment
+            self.segments = found
+        self.refreshed_at = time.monotonic()
+
+    def _selected(self, start, end, source=None, task=None):
+        """Segments écrits et tampons qui recoupent [start, end)"""
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= REFRESH_INTERVAL:
+            self.refresh()
+        with self.lock:
+            segments = list(self.segments.values())
+            buffers = [(*key, buffer) for key, buffer in self.buffers.items()] + self.flushing
+            for partition, schema, buffer in buffers:
+                columns = buffer.columns()
+                segments.append(Segment(None, segment_meta(columns, schema, partition), columns=columns))
+        return [s for s in segments if s.overlaps(start, end)
+                and (source is None or s.source == source) and (task is None or s.task == task)]
+
+    def _column(self, segment, name):
+        if segment.columns is not None:
+            return segment.columns[name]
+        key = (segment.path, name)
+        with self.lock:
+            array = self.cache.get(key)
+            if array is not None:
+                self.cache.move_to_end(key)
+                return array
+        with np.load(segment.path) as data:
+            array = data[name]
+        with self.lock:
+            self.cache[key] = array
+            self.cache_bytes += array.nbytes
+            while self.cache_bytes > CACHE_BYTES and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.cache_bytes -= evicted.nbytes
+        return array
+
+    # --- Requêtes -------------------------------------------------------------
+
+    def _row(self, segment, i):
+        timestamp = float(self._column(segment, 'timestamp')[i])
+        probabilities = self._column(segment, 'probabilities')[i]
+        return {
+            'timestamp': timestamp,
+            'time': datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(),
+            'digest': f"{int(self._column(segment, 'digest')[i]):016x}",
+            'source': segment.source,
+            'task': segment.task,
+            'predicted': segment.classes[int(self._column(segment, 'predicted')[i])],
+            'score': round(float(self._column(segment, 'score')[i]), 4),
+            'probabilities': {name: round(float(p), 4) for name, p in zip(segment.model_names, probabilities)}
+        }
+
+    @_retry_on_compaction
+    def query(self, start=None, end=None, source=None, task=None, predicted=None, min_score=None,
+              limit=100, offset=0):
+        """Verdicts de [start, end), du plus récent au plus ancien, paginés par limit / offset"""
+        wanted = offset + limit
+        matches = []  # (timestamp, segment, ligne)
+        scanned = 0
+        for segment in sorted(self._selected(start, end, source, task), key=lambda s: -s.t_max):
+            if len(matches) >= wanted and segment.t_max < matches[wanted - 1][0]:
+                break
+            if min_score is not None and segment.max_score < min_score:
+                continue
+            if predicted is not None:
+                if predicted not in segment.classes or not segment.counts[segment.classes.index(predicted)]:
+                    continue
+            timestamps = self._column(segment, 'timestamp')
+            mask = _time_mask(timestamps, start, end)
+            if predicted is not None:
+                mask &= self._column(segment, 'predicted') == segment.classes.index(predicted)
+            if min_score is not None:
+                mask &= self._column(segment, 'score') >= min_score
+            rows = np.flatnonzero(mask)
+            scanned += 1
+            if len(rows) > wanted:
+                # Seules les `wanted` lignes les plus récentes du segment peuvent figurer dans la page
+                rows = rows[np.argsort(-timestamps[rows], kind='stable')[:wanted]]
+            matches.extend((float(timestamps[i]), segment, int(i)) for i in rows)
+            matches.sort(key=lambda match: -match[0])
+            del matches[wanted:]
+        page = matches[offset:wanted]
+        return {'rows': [self._row(segment, i) for _, segment, i in page], 'limit': limit, 'offset': offset,
+                'has_more': len(matches) == wanted, 'scanned_segments': scanned}
+
+    @_retry_on_compaction
+    def count(self, task, start=None, end=None, source=None, bucket=None):
+        """Verdicts d'une tâche par classe sur [start, end) ; `bucket` (secondes) ajoute une série temporelle
+
+        Une tâche à la fois : les mêmes flux peuvent figurer sous plusieurs tâches.
+        """
+        if task is None:
+            raise ValueError("Tâche requise pour un comptage")
+        totals, series = {}, {}
+        scanned = 0
+        segments = self._selected(start, end, source, task)
+        for segment in segments:
+            if bucket is None and segment.within(start, end):
+                # Entièrement couvert : réponse de l'index, sans lecture
+                counts = segment.counts
+            else:
+                timestamps = self._column(segment, 'timestamp')
+                predicted = self._column(segment, 'predicted')
+                mask = _time_mask(timestamps, start, end)
+                counts = np.bincount(predicted[mask], minlength=len(segment.classes)).tolist()
+                scanned += 1
+                if bucket:
+                    slots = (timestamps[mask] // bucket).astype(np.int64)
+                    keys, n = np.unique(slots * len(segment.classes) + predicted[mask], return_counts=True)
+                    for key, k in zip(keys.tolist(), n.tolist()):
+                        slot = series.setdefault(key // len(segment.classes) * bucket, {})
+                        name = segment.classes[key % len(segment.classes)]
+                        slot[name] = slot.get(name, 0) + k
+            for name, n in zip(segment.classes, counts):
+                totals[name] = totals.get(name, 0) + int(n)
+        total = sum(totals.values())
+        response = {'task': task, 'total': total, 'malicious': total - totals.get('Benign', 0), 'by_class': totals,
+                    'segments': len(segments), 'scanned_segments': scanned}
+        if bucket:
+            response['buckets'] = [{'start': start_, 'counts': series[start_]} for start_ in sorted(series)]
+        return response
+
+    @_retry_on_compaction
+    def top(self, n=10, start=None, end=None, source=None, task=None):
+        """Les n verdicts au score le plus élevé (tâches binaires et deux étages si task est None)"""
+        segments = [s for s in self._selected(start, end, source, task) if task is not None or s.task != 'multiclass']
+        best = []  # (score, segment, ligne), décroissant
+        scanned = 0
+        for segment in sorted(segments, key=lambda s: -s.max_score):
+            if len(best) >= n and segment.max_score <= best[-1][0]:
+                break
+            score = self._column(segment, 'score')
+            rows = np.flatnonzero(_time_mask(self._column(segment, 'timestamp'), start, end))
+            if len(rows) > n:
+                rows = rows[np.argpartition(-score[rows], n - 1)[:n]]
+            scanned += 1
+            best.extend((float(score[i]), segment, int(i)) for i in rows)
+            best.sort(key=lambda item: -item[0])
+            del best[n:]
+        return {'rows': [self._row(segment, i) for _, segment, i in best], 'scanned_segments': scanned}
+
+    def stats(self):
+        self.refresh()
+        with self.lock:
+            segments = list(self.segments.values())
+            pending = sum(buffer.rows for buffer in self.buffers.values()) + \
+                sum(buffer.rows for _, _, buffer in self.flushing)
+        rows = sum(s.rows for s in segments)
+        return {
+            'directory': self.directory,
+            'partitions': len({s.partition for s in segments}),
+            'segments': len(segments),
+            'level_0_segments': sum(1 for s in segments if s.level == 0),
+            'rows': rows,
+            'bytes': sum(s.size for s in segments),
+            't_min': min((s.t_min for s in segments), default=None),
+            't_max': max((s.t_max for s in segments), default=None),
+            'pending_rows': pending,
+            # Écritures de ce processus : lignes écrites puis réécrites par la compaction
+            'written_rows': self.written_rows,
+            'rewritten_rows': self.rewritten_rows,
+            'write_amplification': round((self.written_rows + self.rewritten_rows) / self.written_rows, 3)
+            if self.written_rows else None,
+            'compactions': self.compactions,
+            'retention_s': self.retention
+        }
+
+    # --- Compaction -----------------------------------------------------------
+
+    def _acquire(self, path):
+        """Verrou inter-processus par création exclusive ; un verrou trop ancien est repris"""
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) < LOCK_STALE:
+                        return False
+                    os.remove(path)
+                except OSError:
+                    return False
+        return False
+
+    def compact(self, now=None):
+        """Rétention, puis fusion des segments de niveau 0 des partitions closes
+
+        Renvoie None si une autre compaction est en cours.
+        """
+        now = time.time() if now is None else now
+        lock = os.path.join(self.directory, '.compact.lock')
+        if not self._acquire(lock):
+            return None
+        self.last_compaction = now
+        report = {'deleted_partitions': 0, 'merged_segments': 0, 'written_segments': 0, 'rewritten_rows': 0}
+        try:
+            for start, directory in self._partitions():
+                if start + self.partition_seconds <= now - self.retention:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    report['deleted_partitions'] += 1
+            self.refresh()
+
+            # Une partition est close quand plus aucun tampon ne peut y écrire
+            grace = 2 * self.flush_interval + 60
+            groups = {}
+            for segment in self.segments.values():
+                if segment.level == 0 and segment.partition + self.partition_seconds + grace <= now:
+                    groups.setdefault((segment.partition, segment.schema), []).append(segment)
+            for (partition, schema), segments in groups.items():
+                if len(segments) < 2:
+                    continue
+                segments.sort(key=lambda s: s.t_min)
+                batch, rows = [], 0
+                for segment in segments + [None]:
+                    if segment is not None and (rows + segment.rows <= COMPACT_ROWS or not batch):
+                        batch.append(segment)
+                        rows += segment.rows
+                        continue
+                    self._merge(partition, schema, batch, report)
+                    batch, rows = ([segment], segment.rows) if segment is not None else ([], 0)
+            self.refresh()
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+        with self.lock:
+            self.compactions += 1
+            self.rewritten_rows += report['rewritten_rows']
+        return report
+
+    def _merge(self, partition, schema, segments, report):
+        if len(segments) < 2:
+            return
+        columns = {}
+        for name in COLUMNS:
+            with_columns = []
+            for segment in segments:
+                with np.load(segment.path) as data:
+                    with_columns.append(data[name])
+            columns[name] = np.concatenate(with_columns)
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {name: array[order] for name, array in columns.items()}
+        # Les segments fusionnés sont nommés dans le nouveau : ignorés si leur suppression échoue
+        self._write(partition, schema, columns, level=1, merged=[os.path.basename(s.path) for s in segments])
+        for segment in segments:
+            try:
+                os.remove(segment.path)
+            except OSError:
+                pass
+            with self.lock:
+                self.segments.pop(segment.path, None)
+                for name in COLUMNS:
+                    evicted = self.cache.pop((segment.path, name), None)
+                    if evicted is not None:
+                        self.cache_bytes -= evicted.nbytes
+        report['merged_segments'] += len(segments)
+        report['written_segments'] += 1
+        report['rewritten_rows'] += len(order)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultation et maintenance de l'historique des détections")
+    parser.add_argument('--dir', default=os.path.join('reports', 'history'))
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help="état de l'index")
+    compact = sub.add_parser('compact', help="rétention et fusion des segments")
+    compact.add_argument('--retention-days', type=float, default=RETENTION_SECONDS / 86400)
+    for name, help_text in (('counts', "verdicts par classe"), ('top', "flux les plus suspects"),
+                            ('query', "derniers verdicts")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument('--start', help="epoch ou ISO 8601")
+        command.add_argument('--end', help="epoch ou ISO 8601")
+        command.add_argument('--source', choices=['live', 'upload'])
+        command.add_argument('--limit', type=int, default=10)
+        if name == 'counts':
+            command.add_argument('--task', default='binary', choices=['binary', 'multiclass', 'two-stage'])
+            command.add_argument('--bucket', type=float, help="largeur des intervalles de la série (s)")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.dir)
+    if args.command == 'stats':
+        result = store.stats()
+    elif args.command == 'compact':
+        store.retention = args.retention_days * 86400
+        result = store.compact()
+    else:
+        start, end = parse_time(args.start), parse_time(args.end)
+        if args.command == 'counts':
+            result = store.count(args.task, start, end, source=args.source, bucket=args.bucket)
+        elif args.command == 'top':
+            result = store.top(args.limit, start, end, source=args.source)
+        else:
+            result = store.query(start, end, source=args.source, limit=args.limit)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
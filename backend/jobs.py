@@ -0,0 +1,299 @@
+"""File d'attente de jobs d'analyse exécutés dans un pool de processus.
+
+Chaque processus du pool charge une fois le détecteur (modèles binaires et,
+si les artefacts sont présents, multiclasses). Une soumission renvoie
+immédiatement un identifiant ; l'état, la progression (lignes traitées), le
+résultat et l'annulation sont consultables via `JobManager`. Les requêtes
+HTTP et la boucle de surveillance ne sont plus bloquées par une analyse.
+
+L'état des jobs est tenu dans un répertoire partagé, un fichier par aspect :
+
+    <id>.json           description (type, fichier, soumission, pid du serveur)
+    <id>.progress.json  début et lignes traitées, écrit par le processus du pool
+    <id>.cancel         demande d'annulation, lue à chaque morceau
+    <id>.done.json      état final (done, failed, cancelled), durées, erreur
+    <id>.result.json    résultat d'un job terminé
+
+Le pool appartient au processus qui a reçu la soumission, mais en service
+pré-forké (prefork.py) n'importe quel worker suit, annule ou lit un job.
+"""
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+
+JOB_KINDS = ('predict', 'predict-multiclass', 'predict-combined', 'analyse', 'predict-pcap')
+JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# État propre à chaque processus du pool
+_detector = None
+_history = None
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _write_json(path, data):
+    """Écriture atomique : un lecteur d'un autre processus ne voit jamais un fichier partiel"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, default=float)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _job_path(directory, job_id, suffix=''):
+    return os.path.join(directory, f"{job_id}{suffix}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _init_worker(backend, history_dir=None):
+    """Initialisation d'un processus du pool : modèles chargés une seule fois"""
+    global _detector, _history
+    from detection import PacketDetector
+
+    if history_dir:
+        from history import HistoryStore
+
+        # Compaction laissée au serveur
+        _history = HistoryStore(history_dir, compact_interval=float('inf'))
+    _detector = PacketDetector()
+    _detector.initialize(backend=backend)
+    try:
+        _detector.initialize_multiclass()
+    except FileNotFoundError:
+        # Artefacts multiclasses absents : chargés à la demande
+        pass
+
+
+def _run_job(directory, job_id, kind, filepath, file_ext, chunk_size, tasks=None):
+    """Exécuté dans un processus du pool ; écrit progression, résultat et état final"""
+    from streaming import stream_predict
+
+    started_at = time.time()
+    cancel_path = _job_path(directory, job_id, '.cancel')
+    progress_path = _job_path(directory, job_id, '.progress.json')
+
+    def progress(rows):
+        if os.path.exists(cancel_path):
+            raise JobCancelled()
+        _write_json(progress_path, {'started_at': started_at, 'rows': rows})
+
+    try:
+        # Annulation demandée pendant l'attente en file
+        progress(0)
+        if kind == 'predict':
+            result = stream_predict(filepath, file_ext, _detector, task='binary',
+                                    chunk_size=chunk_size, progress=progress, history=_history)
+        elif kind == 'predict-multiclass':
+            result = stream_predict(filepath, file_ext, _detector, task='multiclass',
+                                    chunk_size=chunk_size, progress=progress, history=_history)
+            result['classNames'] = _detector.class_names
+        elif kind == 'predict-combined':
+            result = stream_predict(filepath, file_ext, _detector, task='two-stage',
+                                    chunk_size=chunk_size, progress=progress, history=_history)
+        elif kind == 'predict-pcap':
+            from pcap_ingest import ingest_pcap
+
+            # Progression en paquets lus
+            result = ingest_pcap(filepath, _detector, tasks=tasks or ('binary',), progress=progress)
+        else:
+            from analyse import analyze_uploaded_file
+
+            result = analyze_uploaded_file(filepath, file_ext, chunk_size=chunk_size, progress=progress)
+            if 'error' in result:
+                # L'analyse renvoie ses erreurs, annulation comprise
+                if os.path.exists(cancel_path):
+                    raise JobCancelled()
+                raise ValueError(result['error'])
+        _write_json(_job_path(directory, job_id, '.result.json'), result)
+        record = {'state': 'done'}
+    except JobCancelled:
+        record = {'state': 'cancelled'}
+    except Exception as e:
+        record = {'state': 'failed', 'error': str(e)}
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    _write_json(_job_path(directory, job_id, '.done.json'),
+                dict(record, started_at=started_at, finished_at=time.time()))
+    return record['state']
+
+
+class JobManager:
+    """Soumission, suivi et annulation des jobs d'analyse"""
+
+    def __init__(self, directory, max_workers=None, backend='auto', chunk_size=100_000, ttl=3600,
+                 history_dir=None):
+        self.directory = directory
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.backend = backend
+        self.history_dir = history_dir
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.futures = {}   # jobs de ce processus non terminés : identifiant -> Future
+        self.lock = Lock()
+        self.pool = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _ensure_pool(self):
+        # 'spawn' : pas d'état monkey-patché hérité par fork ; le script principal
+        # réexécuté par chaque processus est server.py, sans effet hors __main__
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.backend, self.history_dir)
+            )
+
+    def _path(self, job_id, suffix=''):
+        return _job_path(self.directory, job_id, suffix)
+
+    def submit(self, kind, filepath, filename, tasks=None):
+        """Soumet un fichier déjà enregistré ; le fichier appartient ensuite au job
+
+        tasks : tâches scorées d'un job 'predict-pcap' (('binary',) par défaut).
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Type de job inconnu: {kind}")
+        file_ext = filename.rsplit('.', 1)[1].lower()
+        job_id = uuid.uuid4().hex
+        _write_json(self._path(job_id, '.json'), {
+            'job_id': job_id, 'kind': kind, 'filename': filename, 'filepath': filepath,
+            'submitted_at': time.time(), 'pid': os.getpid(), 'tasks': list(tasks) if tasks else None
+        })
+        self._purge()
+        with self.lock:
+            self._ensure_pool()
+            # Les processus du pool sont lancés à la demande, lors des soumissions
+            future = self.pool.submit(_run_job, self.directory, job_id, kind, filepath, file_ext,
+                                      self.chunk_size, tasks)
+            self.futures[job_id] = future
+        future.add_done_callback(partial(self._finished, job_id, filepath))
+        return job_id
+
+    def _finished(self, job_id, filepath, future):
+        """Job annulé en file ou processus du pool perdu : état final écrit ici"""
+        with self.lock:
+            self.futures.pop(job_id, None)
+        if os.path.exists(self._path(job_id, '.done.json')):
+            return
+        if future.cancelled():
+            record = {'state': 'cancelled'}
+        else:
+            record = {'state': 'failed', 'error': str(future.exception())}
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        _write_json(self._path(job_id, '.done.json'), dict(record, started_at=None, finished_at=time.time()))
+
+    def _describe(self, job_id):
+        if not JOB_ID.match(job_id):
+            return None
+        return _read_json(self._path(job_id, '.json'))
+
+    def status(self, job_id):
+        """État, progression et durées d'un job ; None s'il est inconnu"""
+        job = self._describe(job_id)
+        if job is None:
+            return None
+        done = _read_json(self._path(job_id, '.done.json'))
+        progress = _read_json(self._path(job_id, '.progress.json')) or {}
+        started_at = progress.get('started_at')
+        info = {
+            'job_id': job_id,
+            'kind': job['kind'],
+            'filename': job['filename'],
+            'rows_processed': progress.get('rows', 0),
+            'submitted_at': job['submitted_at'],
+            'started_at': started_at,
+            'queue_time': round(started_at - job['submitted_at'], 3) if started_at else None
+        }
+        if done is not None:
+            info['state'] = done['state']
+            info['finished_at'] = done['finished_at']
+            if done['state'] == 'done':
+                info['run_time'] = round(done['finished_at'] - done['started_at'], 3)
+            elif done['state'] == 'failed':
+                info['error'] = done['error']
+        elif not _pid_alive(job['pid']):
+            # Le serveur qui portait le pool s'est arrêté avant la fin du job
+            info['state'] = 'failed'
+            info['error'] = "Processus du job arrêté"
+        elif os.path.exists(self._path(job_id, '.cancel')):
+            info['state'] = 'cancelling'
+        elif started_at:
+            info['state'] = 'running'
+            info['run_time'] = round(time.time() - started_at, 3)
+        else:
+            info['state'] = 'queued'
+        return info
+
+    def result(self, job_id):
+        """Résultat d'un job terminé, None s'il n'est pas (encore) disponible"""
+        if self._describe(job_id) is None:
+            return None
+        return _read_json(self._path(job_id, '.result.json'))
+
+    def cancel(self, job_id):
+        """Annule un job en file ; un job en cours s'arrête au prochain morceau"""
+        if self._describe(job_id) is None:
+            return False
+        with self.lock:
+            future = self.futures.get(job_id)
+        if future is None or not future.cancel():
+            # Job d'un autre processus, ou déjà démarré : lu par le pool avant chaque morceau
+            open(self._path(job_id, '.cancel'), 'w').close()
+        return True
+
+    def list(self):
+        statuses = []
+        for name in sorted(os.listdir(self.directory)):
+            job_id, _, ext = name.partition('.')
+            if ext == 'json' and JOB_ID.match(job_id):
+                status = self.status(job_id)
+                if status is not None:
+                    statuses.append(status)
+        return sorted(statuses, key=lambda status: status['submitted_at'])
+
+    def _purge(self):
+        """Oublie les jobs terminés depuis plus de `ttl` secondes"""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            job_id, _, ext = name.partition('.')
+            if ext != 'done.json' or not JOB_ID.match(job_id):
+                continue
+            done = _read_json(os.path.join(self.directory, name))
+            if done is None or now - done['finished_at'] <= self.ttl:
+                continue
+            for suffix in ('.json', '.progress.json', '.cancel', '.result.json', '.done.json'):
+                try:
+                    os.remove(self._path(job_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,145 @@
+"""Résumés fenêtrés de la surveillance temps réel, diffusés par Socket.IO.
+
+Les lots scorés sont agrégés dans une fenêtre (verdicts, alertes et
+probabilité moyenne par modèle, histogrammes de confiance, flux les plus
+suspects) ; un résumé numérique compact est émis à cadence fixe, quel que
+soit le débit de flux. Le coût d'émission dépend donc du nombre d'images
+par seconde et de clients, et non plus du nombre de flux.
+
+Salons Socket.IO :
+    summary        résumé complet de chaque fenêtre
+    alerts         fenêtres contenant au moins un flux malveillant (top N seulement)
+    model:<nom>    statistiques d'un seul modèle
+"""
+import time
+from threading import Lock
+import numpy as np
+
+HISTOGRAM_BINS = 10
+# Champs d'identification repris dans les flux les plus suspects (voir flows.FLOW_METADATA)
+FLOW_KEYS = ('Source IP', 'Source Port', 'Destination IP', 'Destination Port', 'Timestamp')
+
+
+def _round(values, digits=4):
+    return np.round(np.asarray(values, dtype=np.float64), digits).tolist()
+
+
+def result_scores(result):
+    """(noms, probabilités malveillantes par modèle (n, m), verdict par ligne) d'un lot scoré"""
+    if hasattr(result, 'exit_stage'):
+        # Cascade : une seule probabilité, celle de l'étage de sortie
+        return ['Cascade'], result.probabilities.reshape(-1, 1), result.labels()
+    return result.model_names, result.scores, result.majority_vote()
+
+
+class SummaryWindow:
+    """Agrégation des lots scorés pendant une fenêtre"""
+
+    def __init__(self, top_n=10, bins=HISTOGRAM_BINS, threshold=0.5):
+        self.top_n = top_n
+        self.bins = bins
+        self.threshold = threshold
+        self.lock = Lock()
+        self.model_names = []
+        self._reset()
+
+    def _reset(self):
+        self.started_at = time.time()
+        self.flows = 0
+        self.malicious = 0
+        self.model_malicious = None
+        self.model_sum = None
+        self.histograms = None
+        self.top_scores = np.empty(0)
+        self.top_rows = []
+
+    def add(self, result, records=None):
+        """Ajoute un lot scoré ; `records` fournit l'identification des flux suspects"""
+        names, scores, verdicts = result_scores(result)
+        n, m = scores.shape
+        if n == 0:
+            return
+        # Histogrammes de tous les modèles en un seul bincount
+        bins = np.minimum((scores * self.bins).astype(np.int64), self.bins - 1)
+        histograms = np.bincount((bins + np.arange(m) * self.bins).ravel(),
+                                 minlength=m * self.bins).reshape(m, self.bins)
+        mean = scores.mean(axis=1)
+        k = min(self.top_n, n)
+        top = np.argpartition(-mean, k - 1)[:k]
+
+        with self.lock:
+            if self.model_names != list(names):
+                self.model_names = list(names)
+                self.model_malicious = self.model_sum = self.histograms = None
+            if self.histograms is None:
+                self.model_malicious = np.zeros(m, dtype=np.int64)
+                self.model_sum = np.zeros(m)
+                self.histograms = np.zeros((m, self.bins), dtype=np.int64)
+            self.flows += n
+            self.malicious += int(np.count_nonzero(verdicts))
+            self.model_malicious += np.count_nonzero(scores > self.threshold, axis=0)
+            self.model_sum += scores.sum(axis=0)
+            self.histograms += histograms
+
+            # Top N de la fenêtre : seuls les candidats du lot sont comparés
+            candidates = np.concatenate([self.top_scores, mean[top]])
+            rows = self.top_rows + [self._row(records, i, mean[i], scores[i]) for i in top]
+            keep = np.argsort(-candidates, kind='stable')[:self.top_n]
+            self.top_scores = candidates[keep]
+            self.top_rows = [rows[i] for i in keep]
+
+    def _row(self, records, i, mean, scores):
+        row = {'p': round(float(mean), 4), 'scores': _round(scores)}
+        if records is not None:
+            record = records[i]
+            for key in FLOW_KEYS:
+                if key in record:
+                    value = record[key]
+                    row[key] = value.item() if hasattr(value, 'item') else value
+        return row
+
+    def snapshot(self, extra=None):
+        """Résumé de la fenêtre écoulée puis remise à zéro ; None si aucun flux"""
+        with self.lock:
+            if self.flows == 0:
+                self.started_at = time.time()
+                return None
+            now = time.time()
+            summary = {
+                't': round(now, 3),
+                'window': round(now - self.started_at, 3),
+                'flows': self.flows,
+                'verdicts': [self.flows - self.malicious, self.malicious],
+                'models': self.model_names,
+                'malicious': self.model_malicious.tolist(),
+                'mean': _round(self.model_sum / self.flows),
+                'hist': self.histograms.tolist(),
+                'top': self.top_rows
+            }
+            self._reset()
+        if extra:
+            summary.update(extra)
+        return summary
+
+
+def alert_payload(summary):
+    """Résumé réduit aux alertes ; None si la fenêtre ne contient aucun flux malveillant"""
+    if not summary['verdicts'][1]:
+        return None
+    top = [row for row in summary['top'] if row['p'] > 0.5]
+    return {'t': summary['t'], 'flows': summary['flows'], 'malicious': summary['verdicts'][1], 'top': top}
+
+
+def model_payload(summary, name):
+    """Statistiques d'un modèle ; None s'il ne fait pas partie du résumé"""
+    if name not in summary['models']:
+        return None
+    j = summary['models'].index(name)
+    return {
+        't': summary['t'],
+        'model': name,
+        'flows': summary['flows'],
+        'malicious': summary['malicious'][j],
+        'mean': summary['mean'][j],
+        'hist': summary['hist'][j]
+    }
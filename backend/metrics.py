@@ -0,0 +1,180 @@
+"""Latence par étape : histogrammes à seaux fixes, exposés en texte Prometheus et en JSON.
+
+Chaque étape instrumentée (enregistrement de l'upload, lecture du fichier,
+normalisation, score combiné, passe avant de chaque modèle, formatage,
+rendu des graphiques, émission Socket.IO, requêtes HTTP...) est chronométrée
+par `metrics.timer(étape, **étiquettes)`. Une mesure coûte un appel à
+perf_counter et une recherche dichotomique dans les seaux ; avec
+`sample_rate` < 1, seule une fraction des appels est chronométrée (les
+appels sont tous comptés).
+
+En service pré-forké, chaque worker a ses propres histogrammes.
+"""
+import random
+import sys
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+if 'eventlet' in sys.modules:
+    # Verrou natif : les étapes sont chronométrées dans les threads tpool comme sur le hub eventlet
+    from eventlet.patcher import original # type: ignore
+    Lock = original('threading').Lock
+else:
+    from threading import Lock
+
+# Bornes supérieures des seaux, en secondes (100 µs à 60 s)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = 'ids_stage_duration_seconds'
+_BUCKET_LABELS = [repr(b) for b in LATENCY_BUCKETS] + ['+Inf']
+
+_NOT_SAMPLED = nullcontext()
+
+
+class Histogram:
+    """Histogramme cumulable des durées d'une étape"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # dernier seau : +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.calls = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Quantile estimé par interpolation linéaire dans le seau concerné"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if cumulative + n >= rank and n:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(low + (high - low) * (rank - cumulative) / n, self.max)
+            cumulative += n
+        return self.max
+
+
+class _Timer:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class StageMetrics:
+    """Histogrammes de latence indexés par (étape, étiquettes)"""
+
+    def __init__(self, sample_rate=1.0, enabled=True):
+        self.histograms = {}
+        self.lock = Lock()
+        self.configure(sample_rate, enabled)
+
+    def configure(self, sample_rate=1.0, enabled=True):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate doit être dans [0, 1]")
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+
+    def _histogram(self, key):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def timer(self, stage, **labels):
+        """Contexte chronométrant une exécution de l'étape (si elle est échantillonnée)"""
+        if not self.enabled:
+            return _NOT_SAMPLED
+        key = (stage, tuple(sorted(labels.items())))
+        self._histogram(key).calls += 1
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return _NOT_SAMPLED
+        return _Timer(self, key)
+
+    def observe(self, stage, seconds, **labels):
+        """Durée mesurée ailleurs (toujours enregistrée)"""
+        if self.enabled:
+            key = (stage, tuple(sorted(labels.items())))
+            self._histogram(key).calls += 1
+            self._observe(key, seconds)
+
+    def _observe(self, key, seconds):
+        histogram = self._histogram(key)
+        with self.lock:
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def _items(self):
+        with self.lock:
+            return sorted(self.histograms.items())
+
+    def prometheus(self):
+        """Format d'exposition texte de Prometheus"""
+        lines = [
+            f"# HELP {METRIC_NAME} Durée des étapes de traitement (échantillonnée)",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        calls = []
+        for (stage, labels), h in self._items():
+            base = ','.join([f'stage="{stage}"'] + [f'{k}="{_escape(v)}"' for k, v in labels])
+            cumulative = 0
+            for bound, n in zip(_BUCKET_LABELS, h.counts):
+                cumulative += n
+                lines.append(f'{METRIC_NAME}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{{base}}} {h.sum:.9f}')
+            lines.append(f'{METRIC_NAME}_count{{{base}}} {h.count}')
+            calls.append(f'ids_stage_calls_total{{{base}}} {h.calls}')
+        lines.append("# HELP ids_stage_calls_total Exécutions des étapes, échantillonnées ou non")
+        lines.append("# TYPE ids_stage_calls_total counter")
+        lines.extend(calls)
+        lines.append("# HELP ids_metrics_sample_rate Fraction des exécutions chronométrées")
+        lines.append("# TYPE ids_metrics_sample_rate gauge")
+        lines.append(f"ids_metrics_sample_rate {self.sample_rate}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Résumé JSON : quantiles estimés en millisecondes par étape"""
+        stages = []
+        for (stage, labels), h in self._items():
+            entry = {'stage': stage, 'labels': dict(labels), 'calls': h.calls, 'sampled': h.count}
+            if h.count:
+                entry.update({
+                    'mean_ms': round(h.sum / h.count * 1000, 4),
+                    'p50_ms': round(h.quantile(0.5) * 1000, 4),
+                    'p90_ms': round(h.quantile(0.9) * 1000, 4),
+                    'p99_ms': round(h.quantile(0.99) * 1000, 4),
+                    'max_ms': round(h.max * 1000, 4),
+                    'total_s': round(h.sum, 4)
+                })
+            stages.append(entry)
+        return {'sample_rate': self.sample_rate, 'enabled': self.enabled, 'stages': stages}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = StageMetrics()
@@ -0,0 +1,376 @@
+"""Inférence NumPy des MLP binaires et multiclasses, sans TensorFlow.
+
+Les fichiers `model_*_b.keras` / `model_*_m.keras` sont exportés une fois en
+bundles `.npz` (poids, biais et activation de chaque couche Dense). Les
+modèles NumPy exposent la même méthode `predict(X, verbose=0)` que Keras et
+peuvent donc remplacer directement `PacketDetector.models`.
+
+Bundles compacts : poids en float16 (`.float16.npz`) ou en int8 avec une
+échelle par neurone de sortie (`.int8.npz`, quantification symétrique par
+canal). Les poids restent compacts en mémoire et sont convertis en float32
+au moment du produit matriciel ; les biais et les calculs restent en float32.
+La première couche reste en float32 : elle reçoit les features brutes, dont
+les échelles diffèrent de plusieurs ordres de grandeur.
+
+Usage :
+    python numpy_mlp.py export model_1_b.keras model_2_b.keras ...
+    python numpy_mlp.py verify data.csv model_1_b.keras ...
+    python numpy_mlp.py quantize --precision int8 model_1_b.npz model_2_b.npz ...
+    python numpy_mlp.py validate data.csv --precision int8
+"""
+import argparse
+import os
+import sys
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+INT8_MAX = 127
+
+SELU_ALPHA = 1.6732632423543772
+SELU_SCALE = 1.0507009873554805
+
+
+def _linear(x):
+    return x
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+def _tanh(x):
+    return np.tanh(x)
+
+def _selu(x):
+    return SELU_SCALE * np.where(x > 0, x, SELU_ALPHA * np.expm1(np.minimum(x, 0)))
+
+def _sigmoid(x):
+    # Forme stable numériquement : pas de débordement de exp(-x)
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': _linear,
+    'relu': _relu,
+    'tanh': _tanh,
+    'selu': _selu,
+    'sigmoid': _sigmoid,
+    'softmax': _softmax
+}
+
+
+def bundle_path_for(keras_path, precision='float32'):
+    """Chemin du bundle .npz associé à un fichier .keras (model_1_b.int8.npz en int8)"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Précision inconnue: {precision}")
+    suffix = '.npz' if precision == 'float32' else f'.{precision}.npz'
+    return os.path.splitext(keras_path)[0] + suffix
+
+
+def dense(h, W, b, scale=None):
+    """h @ W + b, avec des poids float16 / int8 convertis à la volée et l'échelle par canal"""
+    z = h @ (W if W.dtype == np.float32 else W.astype(np.float32))
+    if scale is not None:
+        z *= scale
+    z += b
+    return z
+
+
+class NumpyMLP:
+    """Passe avant d'un MLP dense en NumPy (calcul en float32)"""
+
+    def __init__(self, layers, name=None, scales=None):
+        for _, _, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Activation non supportée: {activation}")
+        self.layers = []
+        for W, b, activation in layers:
+            W = np.asarray(W)
+            # float16 / int8 conservés tels quels, tout le reste en float32
+            dtype = W.dtype if W.dtype in (np.float16, np.int8) else np.float32
+            self.layers.append((np.ascontiguousarray(W, dtype=dtype), np.ascontiguousarray(b, dtype=np.float32),
+                                activation))
+        # Échelle par neurone de sortie des couches int8, None sinon
+        self.scales = [None if s is None else np.ascontiguousarray(s, dtype=np.float32)
+                       for s in (scales or [None] * len(self.layers))]
+        self.name = name
+
+    @classmethod
+    def load(cls, path):
+        """Charge un bundle .npz (float32, float16 ou int8)"""
+        with np.load(path, allow_pickle=False) as bundle:
+            activations = [str(a) for a in bundle['activations']]
+            layers = [
+                (bundle[f'W{i}'], bundle[f'b{i}'], activation)
+                for i, activation in enumerate(activations)
+            ]
+            scales = [bundle[f'S{i}'] if f'S{i}' in bundle.files else None for i in range(len(activations))]
+        return cls(layers, name=os.path.basename(path), scales=scales)
+
+    def save(self, path):
+        """Écrit les poids au format bundle .npz"""
+        arrays = {'activations': np.array([a for _, _, a in self.layers])}
+        for i, ((W, b, _), scale) in enumerate(zip(self.layers, self.scales)):
+            arrays[f'W{i}'] = W
+            arrays[f'b{i}'] = b
+            if scale is not None:
+                arrays[f'S{i}'] = scale
+        np.savez(path, **arrays)
+
+    @property
+    def precision(self):
+        # La première couche reste en float32 dans les bundles quantifiés
+        return str(self.layers[-1][0].dtype)
+
+    def weight_bytes(self):
+        return int(sum(W.nbytes + b.nbytes for W, b, _ in self.layers) +
+                   sum(s.nbytes for s in self.scales if s is not None))
+
+    def quantize(self, precision):
+        """Copie du modèle aux poids en float16 ou en int8 par canal (depuis des poids float32)"""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Précision inconnue: {precision}")
+        if self.precision != 'float32':
+            raise ValueError(f"Modèle déjà quantifié ({self.precision})")
+        # Première couche gardée en float32 : sur des entrées non normalisées, les poids des
+        # features de grande échelle sont minuscules et s'annuleraient à l'échelle de la colonne
+        layers, scales = self.layers[:1], [None]
+        for W, b, activation in self.layers[1:]:
+            scale = None
+            if precision == 'float16':
+                W = W.astype(np.float16)
+            elif precision == 'int8':
+                # Symétrique par colonne : max |W[:, j]| -> 127
+                scale = np.abs(W).max(axis=0) / INT8_MAX
+                scale[scale == 0] = 1.0
+                W = np.clip(np.rint(W / scale), -INT8_MAX, INT8_MAX).astype(np.int8)
+            layers.append((W, b, activation))
+            scales.append(scale)
+        return NumpyMLP(layers, name=self.name, scales=scales)
+
+    @property
+    def input_dim(self):
+        return self.layers[0][0].shape[0]
+
+    @property
+    def output_dim(self):
+        return self.layers[-1][0].shape[1]
+
+    def count_params(self):
+        return int(sum(W.size + b.size for W, b, _ in self.layers))
+
+    def predict(self, X, verbose=0):
+        """Même signature que keras.Model.predict ; `verbose` est ignoré"""
+        h = np.asarray(X, dtype=np.float32)
+        if h.ndim == 1:
+            h = h.reshape(1, -1)
+        return self.forward(h)
+
+    def forward(self, h, start=0):
+        """Propage `h` à partir de la couche `start` (sortie de la couche start-1)"""
+        for (W, b, activation), scale in zip(self.layers[start:], self.scales[start:]):
+            h = ACTIVATIONS[activation](dense(h, W, b, scale))
+        return h
+
+    __call__ = predict
+
+
+def _keras_layers(model):
+    """Extrait (W, b, activation) des couches Dense ; Dropout est ignoré à l'inférence"""
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ('Dropout', 'InputLayer'):
+            continue
+        if kind != 'Dense':
+            raise ValueError(f"Couche non supportée: {kind}")
+        W, b = layer.get_weights()
+        activation = layer.get_config()['activation']
+        if isinstance(activation, dict):
+            activation = activation.get('config', {}).get('name', activation.get('class_name'))
+        layers.append((W, b, str(activation)))
+    return layers
+
+
+def export_keras_model(keras_path, bundle_path=None):
+    """Convertit un modèle .keras en bundle .npz et retourne son chemin"""
+    from tensorflow.keras.models import load_model # type: ignore
+
+    bundle_path = bundle_path or bundle_path_for(keras_path)
+    model = load_model(keras_path)
+    NumpyMLP(_keras_layers(model), name=os.path.basename(keras_path)).save(bundle_path)
+    return bundle_path
+
+
+def load_numpy_models(paths):
+    """Charge plusieurs bundles ; `paths` est un dict nom -> chemin .npz"""
+    return {name: NumpyMLP.load(path) for name, path in paths.items()}
+
+
+def verify_bundle(keras_path, X, bundle_path=None, atol=1e-5):
+    """Compare les sorties Keras et NumPy ; retourne l'écart absolu maximal"""
+    from tensorflow.keras.models import load_model # type: ignore
+
+    bundle_path = bundle_path or bundle_path_for(keras_path)
+    expected = load_model(keras_path).predict(X, verbose=0)
+    actual = NumpyMLP.load(bundle_path).predict(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    return max_diff, max_diff <= atol
+
+
+def quantize_bundle(path, precision, out_path=None):
+    """Écrit la version quantifiée d'un bundle float32 (ou d'un .keras, exporté au besoin)"""
+    if path.endswith('.keras'):
+        path = bundle_path_for(path) if os.path.exists(bundle_path_for(path)) else export_keras_model(path)
+    out_path = out_path or bundle_path_for(path, precision)
+    NumpyMLP.load(path).quantize(precision).save(out_path)
+    return out_path
+
+
+def _weight_bytes(model):
+    return model.weight_bytes() if isinstance(model, NumpyMLP) else int(model.count_params()) * 4
+
+
+def validate_quantized(df, precision, task='binary', backend='auto', label_column='Label'):
+    """Compare modèles d'origine et quantifiés sur un DataFrame étiqueté
+
+    Une ligne par modèle puis une pour le vote majoritaire : accuracy (et en
+    binaire FAR / AMR, définitions de far_amr_b) avant et après quantification,
+    écarts, accord des décisions et écart maximal des sorties.
+    """
+    from cascade import binary_labels, binary_rates
+    from detection import MODEL_FILES_B, MODEL_FILES_M, PacketDetector
+    from ensemble import EnsembleExecutor
+
+    detector = PacketDetector()
+    detector.initialize(backend=backend)
+    labels, features = df[label_column], df.drop(columns=[label_column])
+    if task == 'binary':
+        # Copie : la sortie du pipeline est un tampon réutilisé
+        X = np.array(detector.prepare_features(features))
+        y = binary_labels(labels)
+        originals, model_files = detector.models, MODEL_FILES_B
+
+        def decide(out):
+            return (out[:, 0] > 0.5).astype(np.int8)
+
+        def rates(pred):
+            return binary_rates(y, pred)
+    else:
+        # Les modèles multiclasses ne connaissent que les attaques
+        detector.initialize_multiclass()
+        names = labels.astype(str).str.strip()
+        known = names.isin(detector.class_names).to_numpy()
+        X = features[known][detector.features_m].fillna(0).to_numpy(dtype=np.float32)
+        y = detector.label_encoder.transform(names[known])
+        originals, model_files = detector.models_m, MODEL_FILES_M
+
+        def decide(out):
+            return out.argmax(axis=1)
+
+        def rates(pred):
+            return {'accuracy': float(np.mean(pred == y)) if len(y) else 0.0}
+
+    _, paths = detector.model_paths(model_files, f'numpy-{precision}')
+    quantized = {name: NumpyMLP.load(paths[name]) for name in originals}
+
+    def row(name, before, after, original, compact, diff=None):
+        result = {'model': name, 'agreement': float(np.mean(before == after)) if len(before) else 1.0}
+        if diff is not None:
+            result['max_abs_diff'] = diff
+        for metric, value in rates(before).items():
+            value_q = rates(after)[metric]
+            result.update({metric: value, f'{metric}_quantized': value_q, f'{metric}_delta': value_q - value})
+        result.update({'original_bytes': original, 'quantized_bytes': compact})
+        return result
+
+    report = []
+    for name, model in originals.items():
+        out, out_q = np.asarray(model.predict(X, verbose=0)), quantized[name].predict(X)
+        report.append(row(name, decide(out), decide(out_q), _weight_bytes(model),
+                          quantized[name].weight_bytes(), float(np.max(np.abs(out - out_q))) if len(X) else 0.0))
+    vote = EnsembleExecutor(originals, task=task).predict(X).majority_vote()
+    vote_q = EnsembleExecutor(quantized, task=task).predict(X).majority_vote()
+    report.append(row('Vote majoritaire', vote, vote_q, sum(r['original_bytes'] for r in report),
+                      sum(r['quantized_bytes'] for r in report)))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export et vérification des MLP NumPy")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help="Exporte des fichiers .keras en bundles .npz")
+    export.add_argument('models', nargs='+')
+
+    verify = sub.add_parser('verify', help="Compare Keras et NumPy sur un CSV de features")
+    verify.add_argument('data', help="CSV contenant exactement les colonnes d'entrée du modèle")
+    verify.add_argument('models', nargs='+')
+    verify.add_argument('--atol', type=float, default=1e-5)
+
+    quantize = sub.add_parser('quantize', help="Écrit des bundles float16 ou int8 par canal")
+    quantize.add_argument('models', nargs='+', help="bundles .npz float32 ou fichiers .keras")
+    quantize.add_argument('--precision', default='int8', choices=PRECISIONS[1:])
+
+    validate = sub.add_parser('validate', help="Accuracy, FAR et AMR avant / après quantification")
+    validate.add_argument('data', help="CSV étiqueté aux colonnes brutes CICIDS")
+    validate.add_argument('--precision', default='int8', choices=PRECISIONS[1:])
+    validate.add_argument('--task', default='binary', choices=['binary', 'multiclass'])
+    validate.add_argument('--backend', default='auto', choices=['auto', 'numpy', 'keras'],
+                          help="moteur des modèles d'origine")
+    validate.add_argument('--label-column', default='Label')
+    validate.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                          help="baisse d'accuracy tolérée avant échec")
+    validate.add_argument('--output', help="rapport JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        for keras_path in args.models:
+            print(f"{keras_path} -> {export_keras_model(keras_path)}")
+        return 0
+
+    if args.command == 'quantize':
+        for path in args.models:
+            out_path = quantize_bundle(path, args.precision)
+            print(f"{path} -> {out_path} ({os.path.getsize(out_path) / 1024:.1f} Ko)")
+        return 0
+
+    import pandas as pd
+
+    if args.command == 'validate':
+        df = pd.read_csv(args.data)
+        df.columns = df.columns.str.strip()
+        report = validate_quantized(df, args.precision, task=args.task, backend=args.backend,
+                                    label_column=args.label_column)
+        ok = True
+        for r in report:
+            line = (f"{r['model']:<18} acc={r['accuracy']*100:.3f}% -> {r['accuracy_quantized']*100:.3f}% "
+                    f"({r['accuracy_delta']*100:+.3f})")
+            if 'far' in r:
+                line += f" FAR {r['far_delta']:+.5f} AMR {r['amr_delta']:+.5f}"
+            line += f" accord={r['agreement']*100:.3f}%"
+            if 'max_abs_diff' in r:
+                line += f" écart max={r['max_abs_diff']:.2e}"
+            print(line + f" {r['original_bytes']} -> {r['quantized_bytes']} octets")
+            ok = ok and r['accuracy_delta'] >= -args.max_accuracy_drop
+        if args.output:
+            import json
+
+            with open(args.output, 'w') as f:
+                json.dump({'precision': args.precision, 'task': args.task, 'models': report}, f, indent=2)
+        return 0 if ok else 1
+
+    X = pd.read_csv(args.data).fillna(0).to_numpy(dtype=np.float32)
+    ok = True
+    for keras_path in args.models:
+        max_diff, passed = verify_bundle(keras_path, X, atol=args.atol)
+        ok = ok and passed
+        print(f"{keras_path}: écart max = {max_diff:.2e} ({'OK' if passed else 'ÉCHEC'})")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,434 @@
+"""Ingestion hors ligne de captures pcap / pcapng.
+
+La capture est lue par blocs (jamais chargée entière) : le parcours des
+enregistrements ne fait que relever horodatages et positions, puis les
+en-têtes Ethernet / VLAN / IPv4 / IPv6 / TCP / UDP de tout le bloc sont
+décodés en une fois avec NumPy. Les paquets alimentent une FlowTable
+(flows.py) ; les flux évincés sont scorés par grands lots avec les modèles
+binaires et / ou multiclasses, et peuvent être enregistrés (Parquet ou CSV).
+
+Utilisation :
+    python pcap_ingest.py capture.pcapng [--multiclass] [--flows-out flux.parquet]
+"""
+import argparse
+import ipaddress
+import json
+import struct
+import sys
+import time
+import numpy as np
+import pandas as pd
+from flows import FlowTable, PACKET_FIELDS
+from metrics import metrics
+from plots import prediction_charts
+from streaming import BinaryStreamStats, MulticlassStreamStats
+
+PCAP_EXTENSIONS = {'pcap', 'pcapng', 'cap'}
+DEFAULT_BLOCK_SIZE = 32 << 20
+DEFAULT_SCORE_BATCH = 50_000
+
+# Types de liens reconnus
+LINKTYPE_NULL, LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LINUX_SLL = 0, 1, 101, 113
+LINKTYPE_IPV4, LINKTYPE_IPV6, LINKTYPE_LINUX_SLL2 = 228, 229, 276
+RAW_LINKTYPES = {12, 14, LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6}
+
+PCAPNG_SHB, PCAPNG_IDB, PCAPNG_EPB = 0x0A0D0D0A, 0x00000001, 0x00000006
+# Marge de zéros après chaque bloc : les lectures d'en-têtes tronqués ne débordent jamais
+PADDING = 128
+# Bit au-delà des 128 bits d'adresse : une adresse IPv6 ne se confond jamais avec une IPv4 (::1 / 0.0.0.1)
+IPV6_TAG = 1 << 128
+
+
+class PcapError(ValueError):
+    pass
+
+
+class _Records:
+    """Enregistrements d'un bloc : horodatage, début des données, longueur capturée, lien"""
+
+    def __init__(self):
+        self.ts, self.start, self.caplen, self.linktype = [], [], [], []
+
+    def add(self, ts, start, caplen, linktype):
+        self.ts.append(ts)
+        self.start.append(start)
+        self.caplen.append(caplen)
+        self.linktype.append(linktype)
+
+    def __len__(self):
+        return len(self.ts)
+
+
+def _walk_pcap(f, header, block_size):
+    magic = header[:4]
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        endian = '>'
+    else:
+        raise PcapError("Format de capture non reconnu")
+    resolution = 1e-9 if magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') else 1e-6
+    linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0xFFFF
+    record = struct.Struct(endian + 'IIII')
+
+    rest = b''
+    while True:
+        chunk = f.read(block_size)
+        data = rest + chunk
+        records = _Records()
+        offset, end = 0, len(data)
+        while offset + 16 <= end:
+            ts_sec, ts_frac, caplen, _ = record.unpack_from(data, offset)
+            if offset + 16 + caplen > end:
+                break
+            records.add(ts_sec + ts_frac * resolution, offset + 16, caplen, linktype)
+            offset += 16 + caplen
+        rest = data[offset:]
+        yield data, records, offset
+        if not chunk:
+            # Fin de fichier ; un éventuel reste est un enregistrement tronqué
+            return
+
+
+def _walk_pcapng(f, block_size):
+    endian = '<'
+    interfaces = []   # (linktype, résolution)
+    rest = b''
+    while True:
+        chunk = f.read(block_size)
+        data = rest + chunk
+        records = _Records()
+        offset, end = 0, len(data)
+        while offset + 12 <= end:
+            block_type = struct.unpack_from(endian + 'I', data, offset)[0]
+            if block_type == PCAPNG_SHB:
+                # L'ordre des octets est donné par chaque section
+                endian = '<' if data[offset + 8:offset + 12] == b'\x4d\x3c\x2b\x1a' else '>'
+                interfaces = []
+            block_len = struct.unpack_from(endian + 'I', data, offset + 4)[0]
+            if block_len < 12:
+                raise PcapError("Bloc pcapng invalide")
+            if offset + block_len > end:
+                break
+            if block_type == PCAPNG_IDB:
+                interfaces.append(_parse_idb(data, offset, block_len, endian))
+            elif block_type == PCAPNG_EPB:
+                iface, ts_high, ts_low, caplen = struct.unpack_from(endian + 'IIII', data, offset + 8)
+                linktype, resolution = interfaces[iface]
+                records.add(((ts_high << 32) | ts_low) * resolution, offset + 28, caplen, linktype)
+            offset += block_len
+        rest = data[offset:]
+        yield data, records, offset
+        if not chunk:
+            return
+
+
+def _parse_idb(data, offset, block_len, endian):
+    """Bloc de description d'interface : type de lien et résolution des horodatages"""
+    linktype = struct.unpack_from(endian + 'H', data, offset + 8)[0]
+    resolution = 1e-6
+    pos, end = offset + 16, offset + block_len - 4
+    while pos + 4 <= end:
+        code, length = struct.unpack_from(endian + 'HH', data, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:   # if_tsresol
+            value = data[pos + 4]
+            resolution = 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        pos += 4 + ((length + 3) & ~3)
+    return linktype, resolution
+
+
+def _u8(buf, pos):
+    return buf[pos].astype(np.int64)
+
+
+def _u16(buf, pos):
+    return (buf[pos].astype(np.int64) << 8) | buf[pos + 1]
+
+
+def _u32(buf, pos):
+    return (_u16(buf, pos) << 16) | _u16(buf, pos + 2)
+
+
+def _ip_int(buf, pos):
+    """Adresse IPv6 (16 octets) en entier Python, marquée par IPV6_TAG"""
+    return IPV6_TAG | int.from_bytes(bytes(buf[pos:pos + 16]), 'big')
+
+
+def decode_packets(data, records):
+    """Décode les en-têtes d'un bloc ; renvoie (colonnes PACKET_FIELDS, nombre de paquets ignorés)"""
+    n = len(records)
+    buf = np.frombuffer(data + bytes(PADDING), dtype=np.uint8)
+    limit = len(buf) - PADDING
+    start = np.minimum(np.asarray(records.start, dtype=np.int64), limit)
+    caplen = np.asarray(records.caplen, dtype=np.int64)
+    linktype = np.asarray(records.linktype, dtype=np.int64)
+    end = start + caplen
+
+    # Couche 3 : position et type (0x0800 IPv4, 0x86DD IPv6)
+    l3 = start.copy()
+    ethertype = np.zeros(n, dtype=np.int64)
+    eth = linktype == LINKTYPE_ETHERNET
+    ethertype[eth] = _u16(buf, start[eth] + 12)
+    l3[eth] += 14
+    for _ in range(2):
+        # Étiquettes VLAN 802.1Q / 802.1ad (au plus deux)
+        vlan = eth & np.isin(ethertype, (0x8100, 0x88A8))
+        ethertype[vlan] = _u16(buf, l3[vlan] + 2)
+        l3[vlan] += 4
+    sll = linktype == LINKTYPE_LINUX_SLL
+    ethertype[sll] = _u16(buf, start[sll] + 14)
+    l3[sll] += 16
+    sll2 = linktype == LINKTYPE_LINUX_SLL2
+    ethertype[sll2] = _u16(buf, start[sll2])
+    l3[sll2] += 20
+    null = linktype == LINKTYPE_NULL
+    l3[null] += 4
+    raw = np.isin(linktype, list(RAW_LINKTYPES)) | null
+    version = _u8(buf, np.minimum(l3, limit)) >> 4
+    ethertype[raw & (version == 4)] = 0x0800
+    ethertype[raw & (version == 6)] = 0x86DD
+    l3 = np.minimum(l3, limit)
+
+    v4 = (ethertype == 0x0800) & (l3 + 20 <= end)
+    v6 = (ethertype == 0x86DD) & (l3 + 40 <= end)
+    ip = v4 | v6
+    skipped = int(n - ip.sum())
+    idx = np.flatnonzero(ip)
+    l3, end, v4, v6 = l3[idx], end[idx], v4[idx], v6[idx]
+    m = len(idx)
+
+    proto = np.zeros(m, dtype=np.int64)
+    ip_payload = np.zeros(m, dtype=np.int64)
+    l4 = np.zeros(m, dtype=np.int64)
+    fragment = np.zeros(m, dtype=bool)
+    src = np.zeros(m, dtype=object)
+    dst = np.zeros(m, dtype=object)
+
+    ihl = (_u8(buf, l3[v4]) & 0x0F) * 4
+    proto[v4] = _u8(buf, l3[v4] + 9)
+    ip_payload[v4] = _u16(buf, l3[v4] + 2) - ihl
+    l4[v4] = l3[v4] + ihl
+    fragment[v4] = (_u16(buf, l3[v4] + 6) & 0x1FFF) > 0
+    src[v4] = _u32(buf, l3[v4] + 12)
+    dst[v4] = _u32(buf, l3[v4] + 16)
+
+    proto[v6] = _u8(buf, l3[v6] + 6)
+    ip_payload[v6] = _u16(buf, l3[v6] + 4)
+    l4[v6] = l3[v6] + 40
+    for i in np.flatnonzero(v6):
+        src[i] = _ip_int(buf, l3[i] + 8)
+        dst[i] = _ip_int(buf, l3[i] + 24)
+
+    sport = np.zeros(m, dtype=np.int64)
+    dport = np.zeros(m, dtype=np.int64)
+    header = np.zeros(m, dtype=np.int64)
+    flags = np.zeros(m, dtype=np.int64)
+    window = np.full(m, -1, dtype=np.int64)
+    l4 = np.minimum(l4, limit)
+
+    tcp = (proto == 6) & ~fragment & (l4 + 20 <= end)
+    sport[tcp], dport[tcp] = _u16(buf, l4[tcp]), _u16(buf, l4[tcp] + 2)
+    header[tcp] = (_u8(buf, l4[tcp] + 12) >> 4) * 4
+    flags[tcp] = _u8(buf, l4[tcp] + 13)
+    window[tcp] = _u16(buf, l4[tcp] + 14)
+
+    udp = (proto == 17) & ~fragment & (l4 + 8 <= end)
+    sport[udp], dport[udp] = _u16(buf, l4[udp]), _u16(buf, l4[udp] + 2)
+    header[udp] = 8
+
+    icmp = np.isin(proto, (1, 58)) & ~fragment
+    header[icmp] = 8
+
+    columns = {
+        'ts': np.asarray(records.ts, dtype=np.float64)[idx],
+        'src': src,
+        'dst': dst,
+        'sport': sport,
+        'dport': dport,
+        'proto': proto,
+        'length': np.maximum(ip_payload - header, 0),
+        'header_length': header,
+        'flags': flags,
+        'window': window
+    }
+    return columns, skipped
+
+
+def iter_packets(filepath, block_size=DEFAULT_BLOCK_SIZE):
+    """Itère sur des lots de paquets décodés (dict de tableaux, voir flows.PACKET_FIELDS)
+
+    Chaque lot porte aussi 'skipped' (paquets non IP) et 'bytes' (taille du bloc lu).
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(24)
+        if len(header) < 24:
+            raise PcapError("Fichier de capture vide ou tronqué")
+        if struct.unpack('<I', header[:4])[0] == PCAPNG_SHB:
+            f.seek(0)
+            walker = _walk_pcapng(f, block_size)
+        else:
+            walker = _walk_pcap(f, header, block_size)
+        for data, records, consumed in walker:
+            if not len(records):
+                continue
+            with metrics.timer('pcap_decode'):
+                columns, skipped = decode_packets(data, records)
+            columns['skipped'] = skipped
+            columns['bytes'] = consumed
+            yield columns
+
+
+def format_address(value):
+    """Adresse entière d'un paquet décodé (IPv4, ou IPv6 marquée par IPV6_TAG) vers sa forme texte"""
+    value = int(value)
+    if value >= IPV6_TAG:
+        return str(ipaddress.IPv6Address(value - IPV6_TAG))
+    return str(ipaddress.IPv4Address(value))
+
+
+def _format_addresses(flows):
+    """Adresses entières des flux évincés vers leur forme texte"""
+    for column in ('Source IP', 'Destination IP'):
+        # Une capture réutilise peu d'adresses : chacune n'est formatée qu'une fois
+        codes, uniques = pd.factorize(flows[column])
+        text = np.array([format_address(a) for a in uniques], dtype=object)
+        flows[column] = text[codes]
+    return flows
+
+
+class _FlowWriter:
+    """Enregistrement des flux extraits, par morceaux (Parquet ou CSV)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.header = True
+
+    def write(self, flows):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa # type: ignore
+            import pyarrow.parquet as pq # type: ignore
+
+            table = pa.Table.from_pandas(flows, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            flows.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+            self.header = False
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def ingest_pcap(filepath, detector=None, tasks=('binary',), score_batch=DEFAULT_SCORE_BATCH,
+                block_size=DEFAULT_BLOCK_SIZE, flows_out=None, progress=None, **table_options):
+    """Extrait les flux d'une capture et les score par lots
+
+    detector : PacketDetector initialisé, ou None pour n'extraire que les flux.
+    progress(paquets_traités) est appelé après chaque bloc.
+    """
+    stats = {}
+    if detector is not None:
+        for task in tasks:
+            if task == 'binary':
+                stats[task] = BinaryStreamStats(detector.ensemble.model_names)
+            elif task == 'multiclass':
+                detector.initialize_multiclass()
+                stats[task] = MulticlassStreamStats(detector.ensemble_m.model_names, detector.class_names)
+            else:
+                raise ValueError(f"Tâche inconnue: {task}")
+
+    table = FlowTable(**table_options)
+    writer = _FlowWriter(flows_out) if flows_out else None
+    pending, pending_rows = [], 0
+    counters = {'packets': 0, 'skipped_packets': 0, 'bytes': 0, 'flows': 0, 'peak_active_flows': 0}
+    started = time.perf_counter()
+
+    def score(frames):
+        flows = _format_addresses(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+        counters['flows'] += len(flows)
+        for task, task_stats in stats.items():
+            X = flows[detector.required_columns(task)].to_numpy(dtype=np.float32)
+            task_stats.update(detector.score_matrix(X, task))
+        if writer:
+            writer.write(flows)
+
+    try:
+        for packets in iter_packets(filepath, block_size):
+            counters['packets'] += len(packets['ts'])
+            counters['skipped_packets'] += packets['skipped']
+            counters['bytes'] += packets['bytes']
+            with metrics.timer('flow_table'):
+                flows = table.add_packets({field: packets[field] for field in PACKET_FIELDS})
+            counters['peak_active_flows'] = max(counters['peak_active_flows'], len(table))
+            if len(flows):
+                pending.append(flows)
+                pending_rows += len(flows)
+            if pending_rows >= score_batch:
+                score(pending)
+                pending, pending_rows = [], 0
+            if progress:
+                progress(counters['packets'])
+        flows = table.flush()
+        if len(flows):
+            pending.append(flows)
+        if pending:
+            score(pending)
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    counters.update({
+        'seconds': round(elapsed, 3),
+        'packets_per_s': round(counters['packets'] / elapsed, 1) if elapsed else 0.0,
+        'flows_per_s': round(counters['flows'] / elapsed, 1) if elapsed else 0.0,
+        'flow_table_bytes': table.memory_bytes
+    })
+
+    response = {'ingest': counters, 'charts': []}
+    for task, task_stats in stats.items():
+        response[task] = task_stats.to_response()
+        response['charts'] += prediction_charts(response[task]['predictions'], task)
+    if 'multiclass' in stats:
+        response['multiclass']['classNames'] = detector.class_names
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extraction et scoring des flux d'une capture pcap / pcapng")
+    parser.add_argument('capture')
+    parser.add_argument('--multiclass', action='store_true', help="score aussi avec les modèles multiclasses")
+    parser.add_argument('--no-score', action='store_true', help="extraction des flux uniquement")
+    parser.add_argument('--flows-out', help="fichier .parquet ou .csv des flux extraits")
+    parser.add_argument('--backend', default='auto', choices=['auto', 'numpy', 'numpy-float16', 'numpy-int8', 'keras'])
+    parser.add_argument('--score-batch', type=int, default=DEFAULT_SCORE_BATCH)
+    parser.add_argument('--max-flows', type=int, default=1 << 18)
+    parser.add_argument('--idle-timeout', type=float, default=120.0)
+    parser.add_argument('--active-timeout', type=float, default=1800.0)
+    args = parser.parse_args(argv)
+
+    detector = None
+    if not args.no_score:
+        from detection import PacketDetector
+
+        detector = PacketDetector()
+        detector.initialize(backend=args.backend)
+    tasks = ('binary', 'multiclass') if args.multiclass else ('binary',)
+
+    def progress(packets):
+        print(f"\r{packets} paquets", end='', file=sys.stderr)
+
+    report = ingest_pcap(args.capture, detector, tasks=tasks, score_batch=args.score_batch,
+                         flows_out=args.flows_out, progress=progress, max_flows=args.max_flows,
+                         idle_timeout=args.idle_timeout, active_timeout=args.active_timeout)
+    print(file=sys.stderr)
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Graphiques des analyses et prédictions, hors du chemin critique des requêtes.
+
+Les routes renvoient des graphiques compacts (type, libellés, séries de
+valeurs) que le frontend peut dessiner lui-même. Le rendu PNG / SVG n'a lieu
+qu'à la demande (route /plots/<clé>.<format>), dans un pool de processus
+dédié, et est mis en cache sur disque sous l'empreinte SHA-256 du graphique :
+des statistiques identiques ne sont jamais rendues deux fois. Le cache disque
+est borné (`max_disk_bytes`, éviction des fichiers les moins récemment utilisés).
+"""
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from metrics import metrics
+
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def chart_key(chart):
+    """Empreinte du contenu d'un graphique (hors clé)"""
+    content = {k: v for k, v in chart.items() if k != 'key'}
+    payload = json.dumps(content, sort_keys=True, separators=(',', ':'), default=float)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _values(values):
+    return [round(float(v), 4) for v in values]
+
+
+def bar_chart(title, labels, values, xlabel='', ylabel='', color=None, size=(14, 7)):
+    return {
+        'type': 'bar',
+        'title': title,
+        'labels': [str(label) for label in labels],
+        'series': [{'name': ylabel, 'values': _values(values), 'color': color}],
+        'xlabel': xlabel,
+        'ylabel': ylabel,
+        'size': list(size)
+    }
+
+
+def stacked_bar_chart(title, labels, series, ylabel='', size=(10, 5)):
+    """`series` : liste de (nom, valeurs, couleur ou None)"""
+    return {
+        'type': 'stacked_bar',
+        'title': title,
+        'labels': [str(label) for label in labels],
+        'series': [{'name': name, 'values': _values(values), 'color': color} for name, values, color in series],
+        'xlabel': '',
+        'ylabel': ylabel,
+        'size': list(size)
+    }
+
+
+def pie_chart(title, labels, values, colors=None, size=(14, 7)):
+    return {
+        'type': 'pie',
+        'title': title,
+        'labels': [str(label) for label in labels],
+        'series': [{'name': title, 'values': _values(values), 'colors': colors}],
+        'size': list(size)
+    }
+
+
+def analysis_charts(missing_percent, unique_counts, dtypes):
+    """Les trois graphiques de /analyse à partir du profil du fichier"""
+    missing_sorted = missing_percent.sort_values(ascending=False)
+    dtype_counts = dtypes.value_counts()
+    return [
+        bar_chart("Pourcentage de valeurs manquantes par colonne", missing_sorted.index, missing_sorted.values,
+                  xlabel="Colonne", ylabel="% de valeurs manquantes", color='salmon'),
+        bar_chart("Nombre d'éléments uniques par colonne", unique_counts.index, unique_counts.values,
+                  xlabel="Colonne", ylabel="Nombre d'éléments uniques", color='lightblue'),
+        pie_chart("Répartition des types de données", dtype_counts.index, dtype_counts.values,
+                  colors=['lightgreen', 'lightblue', 'salmon'])
+    ]
+
+
+def prediction_charts(predictions, task='binary'):
+    """Répartition des prédictions par modèle (/predict, /predict-multiclass)"""
+    models = [p['Model'] for p in predictions]
+    if task == 'binary':
+        series = [
+            ('Bénin', [p['Benign (%)'] for p in predictions], 'lightgreen'),
+            ('Malveillant', [p['Malicious (%)'] for p in predictions], 'salmon')
+        ]
+        ylabel = '% des flux'
+    else:
+        classes = [k for k in predictions[0] if k not in ('Model', 'Total')] if predictions else []
+        series = [(name, [p[name] for p in predictions], None) for name in classes]
+        ylabel = 'Nombre de flux'
+    return [stacked_bar_chart('Répartition des prédictions par modèle', models, series, ylabel=ylabel)]
+
+
+def render_chart(chart, fmt='png'):
+    """Rendu matplotlib d'un graphique ; renvoie les octets de l'image"""
+    from io import BytesIO
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=tuple(chart.get('size', (10, 5))))
+    labels = chart['labels']
+    if chart['type'] == 'pie':
+        series = chart['series'][0]
+        ax.pie(series['values'], labels=labels, autopct='%1.1f%%', colors=series.get('colors'))
+    else:
+        bottom = [0.0] * len(labels)
+        for series in chart['series']:
+            ax.bar(labels, series['values'], bottom=bottom if chart['type'] == 'stacked_bar' else None,
+                   color=series.get('color'), label=series['name'])
+            if chart['type'] == 'stacked_bar':
+                bottom = [b + v for b, v in zip(bottom, series['values'])]
+        ax.set_xlabel(chart.get('xlabel', ''))
+        ax.set_ylabel(chart.get('ylabel', ''))
+        if chart['type'] == 'stacked_bar':
+            ax.legend()
+        else:
+            plt.setp(ax.get_xticklabels(), rotation=90)
+    ax.set_title(chart['title'])
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def _render_to_file(chart, fmt, path):
+    """Exécuté dans un processus du pool : écriture atomique dans le cache"""
+    data = render_chart(chart, fmt)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _touch(path):
+    """Date d'accès pour la LRU disque"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+class PlotRenderer:
+    """Graphiques enregistrés par empreinte et rendus à la demande dans un pool"""
+
+    def __init__(self, cache_dir, max_workers=1, max_charts=1024, max_disk_bytes=256 << 20):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_charts = max_charts
+        self.max_disk_bytes = max_disk_bytes
+        self.charts = OrderedDict()   # clé -> graphique (les plus récents en fin)
+        self.pending = {}             # (clé, format) -> Future
+        self.lock = Lock()
+        self.pool = None
+        self.renders = 0
+        self.cache_hits = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def register(self, chart):
+        """Mémorise un graphique et renvoie sa clé (aussi ajoutée au graphique)"""
+        key = chart_key(chart)
+        chart['key'] = key
+        with self.lock:
+            self.charts[key] = chart
+            self.charts.move_to_end(key)
+            while len(self.charts) > self.max_charts:
+                self.charts.popitem(last=False)
+        # Description aussi sur disque : un autre processus (service pré-forké) peut la rendre
+        path = self.path(key, 'json')
+        if os.path.exists(path):
+            _touch(path)
+        else:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(chart, f)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        return key
+
+    def register_all(self, charts):
+        for chart in charts:
+            self.register(chart)
+        return charts
+
+    def chart(self, key):
+        with self.lock:
+            chart = self.charts.get(key)
+        if chart is None:
+            try:
+                with open(self.path(key, 'json')) as f:
+                    chart = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return None
+        return chart
+
+    def path(self, key, fmt):
+        return os.path.join(self.cache_dir, f"{key}.{fmt}")
+
+    def _ensure_pool(self):
+        # 'spawn' : pas d'état eventlet hérité ; matplotlib n'est importé que dans le pool
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+
+    def render(self, key, fmt='png'):
+        """Octets de l'image, rendue au besoin ; None si la clé est inconnue"""
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"Format non supporté: {fmt}")
+        path = self.path(key, fmt)
+        if os.path.exists(path):
+            _touch(path)
+            with self.lock:
+                self.cache_hits += 1
+        else:
+            chart = self.chart(key)
+            if chart is None:
+                return None
+            with self.lock:
+                # Un seul rendu par graphique, même si plusieurs clients le demandent
+                future = self.pending.get((key, fmt))
+                if future is None:
+                    self._ensure_pool()
+                    future = self.pool.submit(_render_to_file, chart, fmt, path)
+                    self.pending[(key, fmt)] = future
+                    self.renders += 1
+            try:
+                with metrics.timer('plot_render', format=fmt):
+                    future.result()
+            finally:
+                with self.lock:
+                    self.pending.pop((key, fmt), None)
+            with open(path, 'rb') as f:
+                data = f.read()
+            self._evict_disk()
+            return data
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _evict_disk(self):
+        """LRU disque : descriptions et images les moins récemment utilisées supprimées au-delà de max_disk_bytes"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self.lock:
+                self.evictions += 1
+
+    def render_base64(self, chart, fmt='png'):
+        """Image encodée en base64, pour les clients qui attendent l'ancien format"""
+        key = chart.get('key') or self.register(chart)
+        return base64.b64encode(self.render(key, fmt)).decode('utf-8')
+
+    def stats(self):
+        disk = self._disk_entries()
+        with self.lock:
+            return {
+                'charts': len(self.charts),
+                'pending': len(self.pending),
+                'renders': self.renders,
+                'cache_hits': self.cache_hits,
+                'evictions': self.evictions,
+                'cached_files': len(disk),
+                'disk_bytes': sum(size for _, size, _ in disk)
+            }
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
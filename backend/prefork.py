@@ -0,0 +1,210 @@
+"""Service multi-processus pré-forké.
+
+Le processus maître charge une seule fois les artefacts et les modèles, place
+les poids NumPy dans des fichiers mappés en mémoire (lecture seule, pages
+partagées par tous les processus), ouvre le port d'écoute puis crée N
+workers eventlet qui acceptent les connexions sur ce même port. Les poids ne
+sont donc pas dupliqués d'un worker à l'autre ; un worker qui meurt est
+relancé par le maître.
+
+Surveillance temps réel : seul le worker 0 (meneur) exécute la boucle de
+détection. Les résumés qu'il produit sont publiés aux autres workers par un
+canal local (sockets Unix en datagrammes) et chacun les diffuse à ses
+propres clients Socket.IO ; les commandes start / stop reçues par un autre
+worker sont transmises au meneur par le même canal.
+
+Les jobs asynchrones (/jobs) s'exécutent dans le pool du worker qui les a
+reçus ; leur état et leur résultat sont tenus dans un répertoire partagé
+(jobs.py), si bien que n'importe quel worker répond aux requêtes de suivi.
+
+Limite : les clients Socket.IO doivent utiliser le transport websocket (une
+session en long polling peut changer de worker d'une requête à l'autre).
+"""
+import hashlib
+import json
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import numpy as np
+from numpy_mlp import NumpyMLP
+
+LEADER = 0
+MAX_MESSAGE = 1 << 20
+
+
+def _shared_array(array, directory):
+    """Copie un tableau dans un fichier .npy (nommé par son contenu) et le mappe en lecture seule"""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256(array.tobytes()).hexdigest()[:32]
+    path = os.path.join(directory, f"{digest}-{array.dtype.str.strip('<>|=')}.npy")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r')
+
+
+def share_weights(detector, directory):
+    """Remplace les poids NumPy du détecteur par des tableaux mappés partagés
+
+    Les modèles Keras ne sont pas concernés : ils restent partagés par
+    copie sur écriture après le fork. Renvoie le nombre d'octets mappés.
+    """
+    os.makedirs(directory, exist_ok=True)
+    shared = 0
+    models = list(detector.models.values())
+    if detector.models_m:
+        models += list(detector.models_m.values())
+    for model in models:
+        if not isinstance(model, NumpyMLP):
+            continue
+        layers = []
+        for W, b, activation in model.layers:
+            W, b = _shared_array(W, directory), _shared_array(b, directory)
+            shared += W.nbytes + b.nbytes
+            layers.append((W, b, activation))
+        model.layers = layers
+    for ensemble in (detector.ensemble, detector.ensemble_m):
+        # Premières couches concaténées de l'exécuteur d'ensemble
+        if ensemble is not None and ensemble._fused is not None:
+            W, b, splits, scale = ensemble._fused
+            ensemble._fused = (_shared_array(W, directory), _shared_array(b, directory), splits, scale)
+            shared += W.nbytes + b.nbytes
+    return shared
+
+
+class WorkerChannel:
+    """Canal local entre workers : datagrammes JSON sur sockets Unix
+
+    Le meneur publie vers tous les workers présents ; les autres workers
+    n'envoient qu'au meneur (commandes).
+    """
+
+    def __init__(self, directory, index):
+        self.directory = directory
+        self.index = index
+        self.path = self._path(index)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        # Envoi non bloquant : un worker saturé ne ralentit pas le meneur
+        self.out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.out.setblocking(False)
+        self.sent = 0
+        self.dropped = 0
+        self.received = 0
+
+    @property
+    def is_leader(self):
+        return self.index == LEADER
+
+    def _path(self, index):
+        return os.path.join(self.directory, f"worker-{index}.sock")
+
+    def _send(self, path, message):
+        try:
+            self.out.sendto(message, path)
+            self.sent += 1
+        except (BlockingIOError, ConnectionRefusedError, FileNotFoundError):
+            # Worker absent ou saturé : un résumé perdu est remplacé par le suivant
+            self.dropped += 1
+
+    def publish(self, kind, data):
+        """Meneur : envoie un message à tous les autres workers"""
+        message = json.dumps({'type': kind, 'data': data}).encode()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.sock') and path != self.path:
+                self._send(path, message)
+
+    def send_to_leader(self, kind, data=None):
+        self._send(self._path(LEADER), json.dumps({'type': kind, 'data': data}).encode())
+
+    def listen(self, handle):
+        """Boucle de réception (tâche de fond du worker) : handle(type, données)"""
+        while True:
+            message = self.sock.recv(MAX_MESSAGE)
+            self.received += 1
+            try:
+                payload = json.loads(message)
+                handle(payload['type'], payload['data'])
+            except Exception as e:
+                print(f"Message de canal ignoré: {str(e)}")
+
+    def stats(self):
+        return {'worker': self.index, 'leader': self.is_leader, 'sent': self.sent,
+                'dropped': self.dropped, 'received': self.received}
+
+
+def _run_worker(app, listener, channel_dir, index, on_worker_start):
+    import eventlet # type: ignore
+    import eventlet.wsgi # type: ignore
+
+    # Nouveau hub : l'état eventlet du maître n'est pas hérité
+    eventlet.hubs.use_hub()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    channel = WorkerChannel(channel_dir, index)
+    if on_worker_start:
+        on_worker_start(channel)
+    eventlet.wsgi.server(listener, app, log_output=False)
+
+
+def serve(app, host='0.0.0.0', port=5000, workers=2, on_worker_start=None):
+    """Crée `workers` processus servant `app` sur le même port et les relance au besoin
+
+    on_worker_start(channel) est appelé dans chaque worker avant le service.
+    """
+    import eventlet # type: ignore
+
+    listener = eventlet.listen((host, port), reuse_addr=True, backlog=2048)
+    channel_dir = tempfile.mkdtemp(prefix='ids-workers-')
+    children = {}
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, listener, channel_dir, index, on_worker_start)
+            finally:
+                os._exit(0)
+        children[pid] = index
+        print(f"Worker {index} démarré (pid {pid})")
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    # waitpid bloquant d'origine (la version eventlet interroge en boucle) ; un signal l'interrompt
+    waitpid = eventlet.patcher.original('os').waitpid
+    signal.signal(signal.SIGTERM, stop)
+    for index in range(workers):
+        spawn(index)
+    try:
+        while True:
+            try:
+                pid, status = waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            index = children.pop(pid, None)
+            if index is not None:
+                print(f"Worker {index} arrêté (statut {status}), relance")
+                eventlet.patcher.original('time').sleep(0.5)
+                spawn(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(children):
+            try:
+                waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        shutil.rmtree(channel_dir, ignore_errors=True)
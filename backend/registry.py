@@ -0,0 +1,182 @@
+"""Registre partagé des artefacts (normaliseurs, listes de features, encodeur, modèles).
+
+Chaque fichier est chargé une seule fois et indexé par l'empreinte SHA-256 de
+son contenu : deux chemins au contenu identique partagent le même objet. Si un
+fichier change sur le disque (date de modification ou taille), il est rechargé
+au prochain accès ; l'ancien objet reste valide pour les requêtes en cours qui
+en détiennent déjà une référence.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import time
+from threading import RLock
+import numpy as np
+from numpy_mlp import NumpyMLP
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_joblib(path):
+    import joblib
+
+    return joblib.load(path)
+
+
+def load_keras(path):
+    from tensorflow.keras.models import load_model # type: ignore
+
+    return load_model(path)
+
+
+def file_hash(path, block_size=1 << 20):
+    """Empreinte SHA-256 calculée par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def estimate_memory(obj, _depth=0):
+    """Estimation en octets de la mémoire occupée par un artefact"""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, NumpyMLP):
+        return obj.weight_bytes()
+    if hasattr(obj, 'count_params'):
+        # Modèle Keras : poids float32
+        return int(obj.count_params()) * 4
+    size = sys.getsizeof(obj)
+    if _depth > 2:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(estimate_memory(v, _depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(estimate_memory(v, _depth + 1) for v in obj)
+    if hasattr(obj, '__dict__'):
+        return size + sum(estimate_memory(v, _depth + 1) for v in vars(obj).values())
+    return size
+
+
+class ArtifactEntry:
+    def __init__(self, path, digest, mtime_ns, size, obj, load_time, loader):
+        self.path = path
+        self.digest = digest
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.obj = obj
+        self.load_time = load_time
+        self.loader = loader
+        self.loaded_at = time.time()
+        self.hits = 0
+        self.memory = estimate_memory(obj)
+
+
+class ArtifactRegistry:
+    """Cache des artefacts chargés, avec rechargement à chaud"""
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self.entries = {}   # chemin absolu -> ArtifactEntry
+        self.by_hash = {}   # (empreinte, loader) -> objet
+        self.lock = RLock()
+        self.last_check = 0.0
+        self.reloads = 0
+
+    def _stat(self, path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, path, loader=load_pickle):
+        """Retourne l'objet chargé depuis `path`, en le (re)chargeant si nécessaire"""
+        path = os.path.abspath(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and (entry.mtime_ns, entry.size) == self._stat(path):
+                entry.hits += 1
+                return entry.obj
+            try:
+                return self._load(path, loader, entry).obj
+            except Exception as e:
+                if entry is None:
+                    raise
+                # Fichier en cours d'écriture : on continue avec la version précédente
+                print(f"Rechargement impossible de {path}: {str(e)}")
+                return entry.obj
+
+    def _load(self, path, loader, previous=None):
+        mtime_ns, size = self._stat(path)
+        digest = file_hash(path)
+        key = (digest, loader)
+        start = time.perf_counter()
+        obj = self.by_hash.get(key)
+        if obj is None:
+            obj = loader(path)
+            self.by_hash[key] = obj
+        entry = ArtifactEntry(path, digest, mtime_ns, size, obj, time.perf_counter() - start, loader)
+        self.entries[path] = entry
+        if previous is not None:
+            self.reloads += 1
+            # L'ancienne version n'est plus indexée ; les détenteurs actuels la gardent
+            if previous.digest != digest and not any(
+                e.digest == previous.digest for e in self.entries.values()
+            ):
+                self.by_hash.pop((previous.digest, previous.loader), None)
+        return entry
+
+    def changed(self, force=False):
+        """Vrai si un artefact a changé sur le disque (vérifié au plus toutes les `check_interval` s)"""
+        now = time.monotonic()
+        if not force and now - self.last_check < self.check_interval:
+            return False
+        self.last_check = now
+        with self.lock:
+            for path, entry in self.entries.items():
+                try:
+                    if (entry.mtime_ns, entry.size) != self._stat(path):
+                        return True
+                except FileNotFoundError:
+                    # Fichier en cours de remplacement : on garde l'ancienne version
+                    continue
+        return False
+
+    def version(self, paths=None):
+        """Empreinte combinée des artefacts chargés (tous, ou ceux de `paths`)"""
+        with self.lock:
+            paths = sorted(self.entries) if paths is None else sorted(os.path.abspath(p) for p in paths)
+            digest = hashlib.sha256()
+            for path in paths:
+                entry = self.entries.get(path)
+                # Artefact pas encore chargé : le chemin seul distingue la combinaison
+                digest.update((entry.digest if entry else path).encode())
+            return digest.hexdigest()
+
+    def snapshot(self):
+        """Artefacts chargés et mémoire occupée"""
+        with self.lock:
+            artifacts = [{
+                'path': os.path.relpath(entry.path),
+                'sha256': entry.digest[:16],
+                'file_size': entry.size,
+                'memory_bytes': entry.memory,
+                'load_time_ms': round(entry.load_time * 1000, 2),
+                'loaded_at': entry.loaded_at,
+                'hits': entry.hits
+            } for entry in self.entries.values()]
+            unique = {id(obj): estimate_memory(obj) for obj in self.by_hash.values()}
+            return {
+                'artifacts': artifacts,
+                'unique_objects': len(unique),
+                'total_memory_bytes': sum(unique.values()),
+                'reloads': self.reloads,
+                'version': self.version()[:16]
+            }
+
+
+# Registre unique partagé par les routes et le détecteur
+registry = ArtifactRegistry()
@@ -0,0 +1,182 @@
+"""Cache des résultats d'analyse indexé par le contenu des fichiers uploadés.
+
+La clé combine l'empreinte SHA-256 du fichier (calculée pendant son
+enregistrement), la route, les options qui changent le résultat et la
+version des artefacts / modèles utilisés : un modèle modifié donne de
+nouvelles clés, et les entrées de l'ancienne version sont supprimées dès
+qu'elle est remplacée.
+
+Deux niveaux : mémoire (objets Python, LRU bornée en octets) puis disque
+(JSON, LRU bornée en octets par date d'accès). Un fichier déjà vu revient
+donc en le temps de son hachage.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+from metrics import metrics
+
+# À incrémenter quand le format des résultats change
+RESULT_FORMAT = 1
+
+
+def _to_json(obj):
+    """Types NumPy / pandas vers types natifs"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Type non sérialisable: {type(obj).__name__}")
+
+
+def save_upload(file, filepath, block_size=1 << 20):
+    """Enregistre un fichier uploadé en calculant son empreinte au passage"""
+    digest = hashlib.sha256()
+    with metrics.timer('upload_save'), open(filepath, 'wb') as f:
+        for block in iter(lambda: file.stream.read(block_size), b''):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Cache LRU à deux niveaux (mémoire puis disque) des résultats JSON"""
+
+    def __init__(self, cache_dir, max_memory_bytes=256 << 20, max_disk_bytes=2 << 30):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()   # clé -> (résultat, taille, version)
+        self.memory_bytes = 0
+        self.lock = Lock()
+        self.versions = {}            # route -> version courante des artefacts
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                         'stores': 0, 'evictions': 0, 'invalidations': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(upload_digest, route, version='', **options):
+        payload = json.dumps([RESULT_FORMAT, upload_digest, route, version, options], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key, version):
+        # Préfixe de version : l'invalidation d'une version ne lit aucun fichier
+        return os.path.join(self.cache_dir, f"{self._tag(version)}-{key}.json")
+
+    @staticmethod
+    def _tag(version):
+        return version[:16] if version else 'none'
+
+    def get(self, key, version=''):
+        """Résultat mis en cache, ou None"""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[0]
+        path = self._path(key, version)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)   # date d'accès pour la LRU disque
+        except FileNotFoundError:
+            with self.lock:
+                self.counters['misses'] += 1
+            return None
+        result = json.loads(data)
+        with self.lock:
+            self.counters['disk_hits'] += 1
+            self._remember(key, result, len(data), version)
+        return result
+
+    def put(self, key, result, version=''):
+        """Enregistre un résultat ; renvoie sa forme JSON (celle servie lors des succès)"""
+        data = json.dumps(result, default=_to_json).encode()
+        result = json.loads(data)
+        path = self._path(key, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.counters['stores'] += 1
+            self._remember(key, result, len(data), version)
+        self._evict_disk()
+        return result
+
+    def _remember(self, key, result, size, version):
+        if size > self.max_memory_bytes:
+            return
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= previous[1]
+        self.memory[key] = (result, size, version)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, (_, old_size, _) = self.memory.popitem(last=False)
+            self.memory_bytes -= old_size
+            self.counters['evictions'] += 1
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self.lock:
+                self.counters['evictions'] += 1
+
+    def set_version(self, route, version):
+        """Version courante des artefacts d'une route ; purge les entrées de l'ancienne"""
+        with self.lock:
+            previous = self.versions.get(route)
+            self.versions[route] = version
+        if previous is None or previous == version:
+            return
+        self.invalidate(previous)
+
+    def invalidate(self, version=None):
+        """Supprime les entrées d'une version d'artefacts (toutes si None)"""
+        with self.lock:
+            for key in [k for k, (_, _, v) in self.memory.items() if version is None or v == version]:
+                self.memory_bytes -= self.memory.pop(key)[1]
+            self.counters['invalidations'] += 1
+        prefix = f"{self._tag(version)}-" if version is not None else ''
+        for _, _, name in self._disk_entries():
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        disk = self._disk_entries()
+        with self.lock:
+            lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            hits = lookups - self.counters['misses']
+            return dict(
+                self.counters,
+                hit_ratio=round(hits / lookups, 4) if lookups else 0.0,
+                memory_entries=len(self.memory),
+                memory_bytes=self.memory_bytes,
+                disk_entries=len(disk),
+                disk_bytes=sum(size for _, size, _ in disk)
+            )
@@ -0,0 +1,17 @@
+"""Point d'entrée du serveur : `python server.py` (ou `python app.py`).
+
+Les pools de processus 'spawn' (jobs, graphiques) réexécutent le script
+principal sous le nom `__mp_main__` dans chaque processus. Ce module ne fait
+rien hors `__main__` : les processus du pool n'importent ni eventlet ni
+l'application.
+"""
+
+
+def main():
+    import app
+
+    app.main()
+
+
+if __name__ == '__main__':
+    main()
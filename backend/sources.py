@@ -0,0 +1,699 @@
+"""Sources de trafic pour la surveillance temps réel.
+
+Une source produit des enregistrements de flux (dict colonne CICIDS ->
+valeur) : générateur synthétique, socket UDP ou TCP locale, tube nommé ou
+fichier suivi en continu (`tail -f`). Les sources réseau et fichiers lisent
+du JSON délimité par lignes (un objet, ou une liste d'objets, par ligne).
+
+Avec `?packets=1`, les lignes reçues sont des événements paquets (champs de
+flows.PACKET_FIELDS) : PacketSource les agrège dans une FlowTable et n'émet
+que les flux évincés (inactivité, durée maximale, FIN / RST, table pleine).
+
+Entre la source et le scoring, une file bornée (FlowQueue) découple les
+débits ; quand elle est pleine, la politique de débordement s'applique :
+    block        la source attend (contre-pression jusqu'à l'émetteur TCP)
+    drop_oldest  les plus anciens enregistrements sont remplacés
+    sample       au-delà de la moitié de la file, les nouveaux ne sont
+                 admis qu'avec une probabilité décroissant jusqu'à 0 (file pleine)
+
+La boucle de détection vide la file par lots (LiveFeed.get_batch) : un lot
+part dès `batch_size` enregistrements, ou quand le plus ancien attend depuis
+`max_latency` secondes. Le remplissage des lots et le retard de bout en bout
+(mise en file -> fin du traitement) sont mesurés.
+
+Émetteur local de test (flux, ou paquets d'une capture) :
+    python sources.py flux.parquet tcp://127.0.0.1:9501 [--rate 5000]
+    python sources.py capture.pcap tcp://127.0.0.1:9501 [--rate 50000]
+"""
+import argparse
+import json
+import os
+import random
+import select
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'sample')
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_MAX_LATENCY = 0.05  # secondes
+MAX_DATAGRAM = 65_507
+PCAP_EXTENSIONS = {'pcap', 'pcapng', 'cap'}
+# Champs obligatoires d'un événement paquet ; les autres valent 0 s'ils manquent
+PACKET_REQUIRED = ('ts', 'src', 'dst', 'proto')
+PACKET_DTYPES = {'ts': np.float64, 'src': object, 'dst': object}  # entiers pour les autres champs
+
+
+def parse_records(line):
+    """Enregistrements d'une ligne JSON (objet ou liste d'objets)"""
+    data = json.loads(line)
+    if isinstance(data, dict):
+        return [data]
+    if isinstance(data, list):
+        return [record for record in data if isinstance(record, dict)]
+    raise ValueError("Ligne JSON sans enregistrement")
+
+
+class FlowQueue:
+    """File bornée d'enregistrements horodatés à leur mise en file"""
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE, policy='block', seed=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {policy}")
+        if maxsize < 1:
+            raise ValueError("maxsize doit être >= 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.random = random.Random(seed)
+        self.high_water = maxsize // 2
+        self.counters = {'received': 0, 'accepted': 0, 'dropped_oldest': 0,
+                         'sampled_out': 0, 'blocked_time': 0.0, 'consumed': 0}
+        self.max_depth = 0
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+    def put_many(self, records, timeout=None):
+        """Ajoute des enregistrements selon la politique ; renvoie le nombre admis
+
+        En mode 'block', attend au plus `timeout` secondes (None : sans limite)
+        qu'une place se libère ; les enregistrements restants sont alors refusés.
+        """
+        now = time.monotonic()
+        accepted = 0
+        with self.condition:
+            self.counters['received'] += len(records)
+            for record in records:
+                if self.closed:
+                    break
+                if len(self.items) >= self.maxsize and not self._make_room(now, timeout):
+                    break
+                if self.policy == 'sample' and not self._admit():
+                    self.counters['sampled_out'] += 1
+                    continue
+                self.items.append((now, record))
+                accepted += 1
+            self.counters['accepted'] += accepted
+            self.max_depth = max(self.max_depth, len(self.items))
+            if accepted:
+                self.condition.notify_all()
+        return accepted
+
+    def _make_room(self, now, timeout):
+        if self.policy == 'drop_oldest':
+            self.items.popleft()
+            self.counters['dropped_oldest'] += 1
+            return True
+        if self.policy == 'sample':
+            # File pleine : _admit refuse de toute façon
+            return True
+        deadline = None if timeout is None else now + timeout
+        started = time.monotonic()
+        while len(self.items) >= self.maxsize and not self.closed:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self.condition.wait(remaining if remaining is not None else 0.5)
+        self.counters['blocked_time'] += time.monotonic() - started
+        return len(self.items) < self.maxsize and not self.closed
+
+    def _admit(self):
+        depth = len(self.items)
+        if depth < self.high_water:
+            return True
+        if depth >= self.maxsize:
+            return False
+        # Rejet aléatoire précoce : probabilité d'admission linéaire entre mi-file et file pleine
+        return self.random.random() < (self.maxsize - depth) / (self.maxsize - self.high_water)
+
+    def get_batch(self, max_items, timeout=None, max_latency=0.0):
+        """Jusqu'à `max_items` enregistrements ; renvoie (enregistrements, instants de mise en file)
+
+        Attend au plus `timeout` secondes un premier enregistrement, puis que le
+        lot se remplisse tant que le plus ancien attend depuis moins de `max_latency`.
+        """
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.items and max_latency > 0:
+                deadline = self.items[0][0] + max_latency
+                while len(self.items) < max_items and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            n = min(max_items, len(self.items))
+            batch = [self.items.popleft() for _ in range(n)]
+            self.counters['consumed'] += n
+            if n:
+                self.condition.notify_all()
+        return [record for _, record in batch], [t for t, _ in batch]
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            received = self.counters['received']
+            # Refusés : attente 'block' expirée ou file fermée
+            rejected = received - self.counters['accepted'] - self.counters['sampled_out']
+            dropped = rejected + self.counters['dropped_oldest'] + self.counters['sampled_out']
+            return dict(
+                self.counters,
+                blocked_time=round(self.counters['blocked_time'], 3),
+                rejected=rejected,
+                dropped=dropped,
+                drop_ratio=round(dropped / received, 4) if received else 0.0,
+                policy=self.policy,
+                maxsize=self.maxsize,
+                depth=len(self.items),
+                max_depth=self.max_depth
+            )
+
+
+class Source:
+    """Source d'enregistrements ; `run` appelle emit(liste) jusqu'à l'arrêt"""
+
+    name = 'source'
+
+    def __init__(self):
+        self.records = 0
+        self.parse_errors = 0
+
+    def run(self, emit, stopped):
+        raise NotImplementedError
+
+    def _emit_lines(self, emit, lines):
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.extend(parse_records(line))
+            except ValueError:
+                self.parse_errors += 1
+        if records:
+            self.records += len(records)
+            emit(records)
+
+    def stats(self):
+        return {'source': self.name, 'records': self.records, 'parse_errors': self.parse_errors}
+
+
+class _LineBuffer:
+    """Découpe un flux d'octets en lignes complètes"""
+
+    def __init__(self):
+        self.rest = b''
+
+    def feed(self, data):
+        data = self.rest + data
+        lines = data.split(b'\n')
+        self.rest = lines.pop()
+        return lines
+
+    def flush(self):
+        rest, self.rest = self.rest, b''
+        return [rest] if rest else []
+
+
+class SyntheticSource(Source):
+    """Enregistrements générés (PacketDetector.generate_realistic_packet) à débit fixe"""
+
+    name = 'synthetic'
+
+    def __init__(self, generate, rate=1 / 3):
+        super().__init__()
+        self.generate = generate
+        self.rate = rate
+
+    def run(self, emit, stopped):
+        # Lots de 10 ms au plus : le débit est tenu sans un réveil par enregistrement
+        tick = max(0.01, 1 / self.rate)
+        started, produced = time.monotonic(), 0
+        while not stopped.is_set():
+            due = int((time.monotonic() - started) * self.rate) + 1 - produced
+            if due > 0:
+                emit([self.generate() for _ in range(due)])
+                produced += due
+                self.records += due
+            stopped.wait(tick)
+
+
+class UdpSource(Source):
+    """Datagrammes UDP contenant une ou plusieurs lignes JSON"""
+
+    name = 'udp'
+
+    def __init__(self, host='127.0.0.1', port=9500):
+        super().__init__()
+        self.address = (host, port)
+
+    def run(self, emit, stopped):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+        sock.bind(self.address)
+        sock.settimeout(0.5)
+        try:
+            while not stopped.is_set():
+                try:
+                    data, _ = sock.recvfrom(MAX_DATAGRAM)
+                except socket.timeout:
+                    continue
+                self._emit_lines(emit, data.split(b'\n'))
+        finally:
+            sock.close()
+
+
+class TcpSource(Source):
+    """Serveur TCP local : chaque émetteur connecté envoie des lignes JSON"""
+
+    name = 'tcp'
+
+    def __init__(self, host='127.0.0.1', port=9501):
+        super().__init__()
+        self.address = (host, port)
+        self.connections = 0
+
+    def run(self, emit, stopped):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(self.address)
+        server.listen()
+        server.settimeout(0.5)
+        try:
+            while not stopped.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                self.connections += 1
+                threading.Thread(target=self._serve, args=(conn, emit, stopped), daemon=True).start()
+        finally:
+            server.close()
+
+    def _serve(self, conn, emit, stopped):
+        # emit bloquant (politique 'block') : la lecture s'arrête et TCP ralentit l'émetteur
+        buffer = _LineBuffer()
+        conn.settimeout(0.5)
+        try:
+            while not stopped.is_set():
+                try:
+                    data = conn.recv(1 << 20)
+                except socket.timeout:
+                    continue
+                if not data:
+                    break
+                self._emit_lines(emit, buffer.feed(data))
+            self._emit_lines(emit, buffer.flush())
+        finally:
+            conn.close()
+
+    def stats(self):
+        return dict(super().stats(), connections=self.connections)
+
+
+class PipeSource(Source):
+    """Tube nommé (créé au besoin) ; rouvert à chaque fin d'émetteur"""
+
+    name = 'pipe'
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def run(self, emit, stopped):
+        if not os.path.exists(self.path):
+            os.mkfifo(self.path)
+        while not stopped.is_set():
+            # Ouverture non bloquante : l'attente d'un émetteur passe par select
+            fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            buffer = _LineBuffer()
+            try:
+                while not stopped.is_set():
+                    readable, _, _ = select.select([fd], [], [], 0.5)
+                    if not readable:
+                        continue
+                    data = os.read(fd, 1 << 20)
+                    if not data:
+                        # Émetteur parti : on rouvre pour attendre le suivant
+                        break
+                    self._emit_lines(emit, buffer.feed(data))
+                self._emit_lines(emit, buffer.flush())
+            finally:
+                os.close(fd)
+            stopped.wait(0.1)
+
+
+class TailSource(Source):
+    """Fichier de lignes JSON suivi en continu, rotation et troncature comprises"""
+
+    name = 'tail'
+
+    def __init__(self, path, from_start=False, poll_interval=0.2):
+        super().__init__()
+        self.path = path
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+
+    def run(self, emit, stopped):
+        f, inode = None, None
+        buffer = _LineBuffer()
+        try:
+            while not stopped.is_set():
+                if f is None:
+                    try:
+                        f = open(self.path, 'rb')
+                    except FileNotFoundError:
+                        stopped.wait(self.poll_interval)
+                        continue
+                    inode = os.fstat(f.fileno()).st_ino
+                    if not self.from_start:
+                        f.seek(0, os.SEEK_END)
+                    self.from_start = True   # un fichier recréé est lu depuis le début
+                data = f.read(1 << 20)
+                if data:
+                    self._emit_lines(emit, buffer.feed(data))
+                    continue
+                try:
+                    st = os.stat(self.path)
+                except FileNotFoundError:
+                    st = None
+                if st is None or st.st_ino != inode:
+                    # Rotation : fin de l'ancien fichier puis réouverture
+                    self._emit_lines(emit, buffer.flush())
+                    f.close()
+                    f = None
+                elif st.st_size < f.tell():
+                    f.seek(0)   # troncature
+                stopped.wait(self.poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+
+class PacketSource(Source):
+    """Événements paquets d'une autre source, agrégés en flux par une FlowTable
+
+    Les flux évincés sont émis par lots aux colonnes CICIDS, identification
+    comprise (FLOW_METADATA). Entre deux paquets, l'inactivité est évaluée
+    toutes les `expire_interval` secondes sur l'horloge des paquets avancée du
+    temps écoulé depuis le dernier reçu : une capture rejouée expire comme du
+    trafic réel. Les flux encore actifs sont émis à l'arrêt.
+    """
+
+    name = 'packets'
+
+    def __init__(self, inner, expire_interval=1.0, **table_options):
+        super().__init__()
+        from flows import FlowTable
+
+        self.inner = inner
+        self.table = FlowTable(**table_options)
+        self.expire_interval = expire_interval
+        self.lock = threading.Lock()
+        self.last_packet_at = None
+        self.packets = 0
+        self.invalid_packets = 0
+        self.error = None
+
+    def run(self, emit, stopped):
+        worker = threading.Thread(target=self._run_inner, args=(emit, stopped), daemon=True)
+        worker.start()
+        while worker.is_alive() and not stopped.wait(self.expire_interval):
+            with self.lock:
+                if self.last_packet_at is None:
+                    continue
+                now = self.table.clock + (time.monotonic() - self.last_packet_at) * 1e6
+                flows = self.table.expire(now)
+            self._emit_flows(emit, flows)
+        worker.join(timeout=2)
+        with self.lock:
+            flows = self.table.flush()
+        self._emit_flows(emit, flows)
+        if self.error is not None:
+            raise self.error
+
+    def _run_inner(self, emit, stopped):
+        try:
+            self.inner.run(lambda packets: self._emit_flows(emit, self.add_packets(packets)), stopped)
+        except Exception as e:
+            self.error = e
+
+    def add_packets(self, packets):
+        """Met à jour la table avec des événements paquets ; renvoie les flux évincés"""
+        from flows import PACKET_FIELDS
+
+        valid = []
+        for packet in packets:
+            try:
+                valid.append(tuple(packet[field] if field in PACKET_REQUIRED else packet.get(field, 0)
+                                   for field in PACKET_FIELDS))
+            except KeyError:
+                self.invalid_packets += 1
+        if not valid:
+            return None
+        columns = dict(zip(PACKET_FIELDS, zip(*valid)))
+        try:
+            columns = {field: np.asarray(values, dtype=PACKET_DTYPES.get(field, np.int64))
+                       for field, values in columns.items()}
+        except (TypeError, ValueError):
+            self.invalid_packets += len(valid)
+            return None
+        with self.lock:
+            flows = self.table.add_packets(columns)
+            self.packets += len(valid)
+            self.last_packet_at = time.monotonic()
+        return flows
+
+    def _emit_flows(self, emit, flows):
+        if flows is None or not len(flows):
+            return
+        # Identification sérialisable en JSON (résumés Socket.IO)
+        flows['Timestamp'] = flows['Timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+        records = flows.to_dict(orient='records')
+        with self.lock:
+            self.records += len(records)
+        emit(records)
+
+    def stats(self):
+        with self.lock:
+            table = self.table.stats()
+        return dict(super().stats(), packets=self.packets, invalid_packets=self.invalid_packets,
+                    flow_table=table, inner=self.inner.stats())
+
+
+def create_source(spec, generate=None):
+    """Source décrite par une URI :
+    synthetic://?rate=1000, udp://127.0.0.1:9500, tcp://127.0.0.1:9501,
+    pipe:///tmp/ids_flux, tail:///var/log/ids/flux.ndjson?from_start=1
+
+    Les sources de lignes acceptent `packets=1` (événements paquets agrégés en
+    flux) et alors `idle_timeout`, `active_timeout` (secondes) et `max_flows`.
+    """
+    parts = urlsplit(spec if '://' in spec else f"{spec}://")
+    options = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    source = _line_source(parts, options, generate)
+    if source is None:
+        raise ValueError(f"Source inconnue: {spec}")
+    if options.get('packets') not in ('1', 'true'):
+        return source
+    if isinstance(source, SyntheticSource):
+        raise ValueError("La source synthétique produit des flux, pas des paquets")
+    table_options = {}
+    for name, cast in (('idle_timeout', float), ('active_timeout', float), ('max_flows', int)):
+        if name in options:
+            table_options[name] = cast(options[name])
+    return PacketSource(source, **table_options)
+
+
+def _line_source(parts, options, generate):
+    if parts.scheme == 'synthetic':
+        if generate is None:
+            raise ValueError("La source synthétique nécessite un générateur")
+        return SyntheticSource(generate, rate=float(options.get('rate', 1 / 3)))
+    if parts.scheme == 'udp':
+        return UdpSource(parts.hostname or '127.0.0.1', parts.port or 9500)
+    if parts.scheme == 'tcp':
+        return TcpSource(parts.hostname or '127.0.0.1', parts.port or 9501)
+    if parts.scheme == 'pipe':
+        return PipeSource(parts.path)
+    if parts.scheme == 'tail':
+        return TailSource(parts.path, from_start=options.get('from_start') in ('1', 'true'))
+    return None
+
+
+class LiveFeed:
+    """Source exécutée dans son thread, alimentant une FlowQueue vidée par micro-lots"""
+
+    def __init__(self, source, maxsize=DEFAULT_QUEUE_SIZE, policy='block',
+                 batch_size=DEFAULT_BATCH_SIZE, max_latency=DEFAULT_MAX_LATENCY):
+        if batch_size < 1:
+            raise ValueError("batch_size doit être >= 1")
+        self.source = source
+        self.queue = FlowQueue(maxsize, policy)
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.fill = {'batches': 0, 'records': 0, 'flush_on_size': 0, 'flush_on_deadline': 0}
+        self.stopped = threading.Event()
+        self.thread = None
+        self.error = None
+        self.batches = 0
+        self.processed = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_last = 0.0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.source.run(self.queue.put_many, self.stopped)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Erreur source {self.source.name}: {self.error}")
+
+    def stop(self):
+        self.stopped.set()
+        self.queue.close()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def get_batch(self, timeout=0.5):
+        """Prochain micro-lot : plein, ou échéance de latence atteinte ; vide après `timeout` sans flux"""
+        records, enqueued_at = self.queue.get_batch(self.batch_size, timeout, self.max_latency)
+        if records:
+            self.fill['batches'] += 1
+            self.fill['records'] += len(records)
+            self.fill['flush_on_size' if len(records) == self.batch_size else 'flush_on_deadline'] += 1
+        return records, enqueued_at
+
+    def batch_stats(self):
+        """Remplissage des micro-lots"""
+        batches = self.fill['batches']
+        mean_batch = self.fill['records'] / batches if batches else 0.0
+        return dict(
+            self.fill,
+            batch_size=self.batch_size,
+            max_latency_ms=self.max_latency * 1000,
+            queue_size=self.queue.maxsize,
+            mean_batch_size=round(mean_batch, 2),
+            fill_ratio=round(mean_batch / self.batch_size, 4)
+        )
+
+    def done(self, enqueued_at):
+        """Fin du traitement d'un lot : retard de bout en bout de ses enregistrements"""
+        if not enqueued_at:
+            return
+        now = time.monotonic()
+        self.batches += 1
+        self.processed += len(enqueued_at)
+        self.lag_total += sum(now - t for t in enqueued_at)
+        self.lag_max = max(self.lag_max, now - enqueued_at[0])
+        self.lag_last = now - enqueued_at[0]
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'source': self.source.stats(),
+            'queue': self.queue.stats(),
+            'batching': self.batch_stats(),
+            'running': self.thread is not None and self.thread.is_alive(),
+            'error': self.error,
+            'batches': self.batches,
+            'processed': self.processed,
+            'flows_per_s': round(self.processed / elapsed, 1) if elapsed else 0.0,
+            'lag_mean_ms': round(self.lag_total / self.processed * 1000, 3) if self.processed else 0.0,
+            'lag_max_ms': round(self.lag_max * 1000, 3),
+            'lag_last_ms': round(self.lag_last * 1000, 3)
+        }
+
+
+def _send(spec, lines):
+    parts = urlsplit(spec)
+    if parts.scheme == 'tcp':
+        with socket.create_connection((parts.hostname, parts.port)) as sock:
+            for block in lines:
+                sock.sendall(block)
+    elif parts.scheme == 'udp':
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for block in lines:
+                sock.sendto(block, (parts.hostname, parts.port))
+    elif parts.scheme in ('pipe', 'tail'):
+        with open(parts.path, 'ab') as f:
+            for block in lines:
+                f.write(block)
+                f.flush()
+    else:
+        raise ValueError(f"Destination inconnue: {spec}")
+
+
+def packet_records(filepath):
+    """Événements paquets d'une capture (lots de dicts aux champs flows.PACKET_FIELDS)"""
+    from flows import PACKET_FIELDS
+    from pcap_ingest import format_address, iter_packets
+
+    addresses = {}
+    for packets in iter_packets(filepath):
+        columns = {field: packets[field].tolist() for field in PACKET_FIELDS}
+        for field in ('src', 'dst'):
+            columns[field] = [addresses.get(a) or addresses.setdefault(a, format_address(a)) for a in columns[field]]
+        yield [dict(zip(PACKET_FIELDS, values)) for values in zip(*columns.values())]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Émet les flux d'un fichier vers une source de surveillance")
+    parser.add_argument('file', help="fichier CSV / Parquet / Arrow de flux CICIDS, ou capture pcap / pcapng "
+                                     "(événements paquets, pour une source ?packets=1)")
+    parser.add_argument('target', help="tcp://hôte:port, udp://hôte:port, pipe:///chemin ou tail:///chemin")
+    parser.add_argument('--rate', type=float, default=0, help="enregistrements par seconde (0 : sans limite)")
+    parser.add_argument('--batch', type=int, default=100, help="enregistrements par envoi")
+    args = parser.parse_args(argv)
+
+    file_ext = args.file.rsplit('.', 1)[-1].lower()
+    # Un datagramme UDP doit rester sous 64 Ko
+    batch = min(args.batch, 10) if args.target.startswith('udp') else args.batch
+
+    def chunks():
+        if file_ext in PCAP_EXTENSIONS:
+            yield from packet_records(args.file)
+            return
+        from streaming import iter_chunks
+
+        for chunk in iter_chunks(args.file, file_ext, chunk_size=10_000):
+            yield chunk.drop(columns=['Label'], errors='ignore').to_dict(orient='records')
+
+    def blocks():
+        started, sent = time.monotonic(), 0
+        for records in chunks():
+            for i in range(0, len(records), batch):
+                part = records[i:i + batch]
+                yield ''.join(json.dumps(r) + '\n' for r in part).encode()
+                sent += len(part)
+                if args.rate:
+                    delay = sent / args.rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+    started = time.monotonic()
+    _send(args.target, blocks())
+    print(f"Envoi terminé en {time.monotonic() - started:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Démarrage rapide : imports différés et mesure du temps de démarrage.
+
+Les dépendances lourdes (pandas, TensorFlow, matplotlib, ...) sont importées
+au premier usage via `lazy_import` / `lazy_function`. Chaque import différé
+et chaque chargement d'artefacts est chronométré dans `profile`, dont le
+rapport est exposé par la route /startup.
+"""
+import importlib
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+PROCESS_START = time.time()
+
+
+class StartupProfile:
+    """Chronologie des imports et chargements d'artefacts"""
+
+    def __init__(self):
+        self.events = []
+        self.marks = {}
+        self.lock = Lock()
+
+    @contextmanager
+    def measure(self, kind, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.events.append({
+                    'kind': kind,
+                    'name': name,
+                    'seconds': round(elapsed, 4),
+                    'at': round(time.time() - PROCESS_START, 4)
+                })
+
+    def mark(self, name):
+        """Horodatage d'une étape (ex. 'app_ready', 'detector_ready')"""
+        with self.lock:
+            self.marks.setdefault(name, round(time.time() - PROCESS_START, 4))
+
+    def report(self):
+        with self.lock:
+            events = list(self.events)
+            marks = dict(self.marks)
+        totals = {}
+        for event in events:
+            totals[event['kind']] = round(totals.get(event['kind'], 0.0) + event['seconds'], 4)
+        return {
+            'marks': marks,
+            'totals': totals,
+            'events': sorted(events, key=lambda e: e['seconds'], reverse=True)
+        }
+
+
+profile = StartupProfile()
+
+
+class LazyModule:
+    """Module importé au premier accès à l'un de ses attributs"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with profile.measure('import', self._name):
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def lazy_function(module_name, function_name):
+    """Fonction dont le module n'est importé qu'au premier appel"""
+    module = LazyModule(module_name)
+
+    def call(*args, **kwargs):
+        return getattr(module, function_name)(*args, **kwargs)
+
+    call.__name__ = function_name
+    return call
+
+
+def preload(*module_names):
+    """Importe une liste de modules (préchauffage en arrière-plan)"""
+    for name in module_names:
+        LazyModule(name)._load()
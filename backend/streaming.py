@@ -0,0 +1,459 @@
+"""Prédiction par morceaux des gros fichiers CSV / Parquet / Arrow.
+
+Le CSV est lu par blocs de `chunk_size` lignes, le Parquet par lots de groupes
+de lignes et l'Arrow IPC / Feather en mappage mémoire, en ne lisant que les
+colonnes utiles (voir columnar.py) ; chaque morceau est prétraité, scoré puis
+oublié. Seules des statistiques cumulées (comptes par classe, taux de
+malveillance, histogrammes de confiance) sont conservées, de sorte que la
+mémoire maximale dépend de la taille d'un morceau et non de celle du fichier.
+
+`stream_rows` renvoie en plus la prédiction de chaque ligne, encodée au fil
+du scoring en NDJSON ou en flux Arrow IPC : rien n'est accumulé côté serveur.
+"""
+import io
+import json
+import zlib
+import numpy as np
+import pandas as pd
+from plots import prediction_charts
+
+DEFAULT_CHUNK_SIZE = 100_000
+HISTOGRAM_BINS = 10
+# Lignes scorées puis encodées par lot dans les réponses ligne à ligne
+ROW_BATCH_SIZE = 16_384
+ROW_FORMATS = ('ndjson', 'arrow')
+# gzip : Content-Encoding HTTP ; zstd / lz4 : compression des tampons Arrow IPC
+ROW_COMPRESSIONS = {'ndjson': ('gzip',), 'arrow': ('gzip', 'zstd', 'lz4')}
+GZIP_LEVEL = 1
+BINARY_CLASSES = ('Benign', 'Malicious')
+
+
+def iter_chunks(filepath, file_ext, chunk_size=DEFAULT_CHUNK_SIZE, columns=None):
+    """Itère sur un fichier par DataFrames d'au plus `chunk_size` lignes"""
+    if file_ext == 'csv':
+        for chunk in pd.read_csv(filepath, chunksize=chunk_size):
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+    elif file_ext == 'parquet':
+        import pyarrow.parquet as pq # type: ignore
+
+        parquet_file = pq.ParquetFile(filepath)
+        for i in range(parquet_file.num_row_groups):
+            # Un groupe de lignes peut dépasser chunk_size : on le redécoupe
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=[i], columns=columns):
+                chunk = batch.to_pandas()
+                chunk.columns = chunk.columns.str.strip()
+                yield chunk
+    else:
+        raise ValueError("Type de fichier non supporté")
+
+
+class BinaryStreamStats:
+    """Statistiques cumulées des cinq modèles binaires"""
+
+    def __init__(self, model_names, bins=HISTOGRAM_BINS):
+        self.model_names = list(model_names)
+        self.edges = np.linspace(0.0, 1.0, bins + 1)
+        self.total = 0
+        self.malicious = np.zeros(len(self.model_names), dtype=np.int64)
+        self.majority_malicious = 0
+        self.histograms = np.zeros((len(self.model_names), bins), dtype=np.int64)
+
+    def update(self, result):
+        labels = result.labels()
+        self.total += len(result)
+        self.malicious += labels.sum(axis=0)
+        self.majority_malicious += int(result.majority_vote().sum())
+        for j in range(len(self.model_names)):
+            self.histograms[j] += np.histogram(result.scores[:, j], bins=self.edges)[0]
+
+    def to_response(self):
+        """Réponse au format de `process_file` (prédictions par modèle et stats)"""
+        predictions = []
+        for j, model_name in enumerate(self.model_names):
+            malicious_pct = round(self.malicious[j] / self.total * 100, 2) if self.total else 0.0
+            benign_pct = round(100 - malicious_pct, 2) if self.total else 0.0
+            predictions.append({
+                'Model': model_name,
+                'Final Prediction': 'Malicious' if malicious_pct > 50 else 'Benign',
+                'Confidence (%)': max(benign_pct, malicious_pct),
+                'Benign (%)': benign_pct,
+                'Malicious (%)': malicious_pct
+            })
+
+        return {
+            'predictions': predictions,
+            'stats': {
+                'total': self.total,
+                'benign': self.total - self.majority_malicious,
+                'malicious': self.majority_malicious,
+                'malicious_ratio': round(self.majority_malicious / self.total, 4) if self.total else 0.0
+            },
+            'histograms': {
+                'bin_edges': self.edges.round(2).tolist(),
+                'by_model': {name: self.histograms[j].tolist() for j, name in enumerate(self.model_names)}
+            }
+        }
+
+
+class MulticlassStreamStats:
+    """Statistiques cumulées des cinq modèles multiclasses"""
+
+    def __init__(self, model_names, class_names, bins=HISTOGRAM_BINS):
+        self.model_names = list(model_names)
+        self.class_names = list(class_names)
+        self.edges = np.linspace(0.0, 1.0, bins + 1)
+        self.total = 0
+        n_classes = len(self.class_names)
+        self.counts = np.zeros((len(self.model_names), n_classes), dtype=np.int64)
+        self.majority_counts = np.zeros(n_classes, dtype=np.int64)
+        self.histograms = np.zeros((len(self.model_names), bins), dtype=np.int64)
+
+    def update(self, result):
+        n_classes = len(self.class_names)
+        self.total += len(result)
+        self.majority_counts += np.bincount(result.majority_vote(), minlength=n_classes)
+        confidence = result.probabilities.max(axis=2)
+        for j in range(len(self.model_names)):
+            self.counts[j] += np.bincount(result.scores[:, j], minlength=n_classes)
+            self.histograms[j] += np.histogram(confidence[:, j], bins=self.edges)[0]
+
+    def to_response(self):
+        """Réponse au format de `process_file_m` (comptes par modèle et stats)"""
+        predictions = []
+        for j, model_name in enumerate(self.model_names):
+            row = {'Model': model_name}
+            row.update({name: int(c) for name, c in zip(self.class_names, self.counts[j])})
+            row['Total'] = self.total
+            predictions.append(row)
+
+        distribution = {name: int(c) for name, c in zip(self.class_names, self.majority_counts)}
+        benign = distribution.get('Benign', 0)
+        top_attack = max(distribution, key=distribution.get) if self.total else 'Benign'
+        return {
+            'predictions': predictions,
+            'stats': {
+                'total': self.total,
+                'benign': benign,
+                'malicious': self.total - benign,
+                'top_attack': top_attack,
+                'attack_distribution': distribution
+            },
+            'histograms': {
+                'bin_edges': self.edges.round(2).tolist(),
+                'by_model': {name: self.histograms[j].tolist() for j, name in enumerate(self.model_names)}
+            }
+        }
+
+
+class TwoStageStreamStats:
+    """Statistiques cumulées du scoring en deux étages et lignes signalées (au plus `max_rows`)"""
+
+    def __init__(self, binary_names, multiclass_names, class_names, max_rows=10_000, bins=HISTOGRAM_BINS):
+        self.binary = BinaryStreamStats(binary_names, bins)
+        self.multiclass = MulticlassStreamStats(multiclass_names, class_names, bins)
+        self.class_names = list(class_names)
+        self.max_rows = max_rows
+        self.flagged_rows = []
+        self.flagged_total = 0
+
+    @property
+    def total(self):
+        return self.binary.total
+
+    def update(self, result):
+        offset = self.binary.total
+        self.binary.update(result.binary)
+        if result.multiclass is None:
+            return
+        self.multiclass.update(result.multiclass)
+        self.flagged_total += len(result.flagged)
+        room = self.max_rows - len(self.flagged_rows)
+        if room > 0:
+            rows = result.flagged[:room]
+            attacks = result.attack_types()[:room]
+            confidence = result.attack_confidence()[:room]
+            malicious = result.binary.mean_probability()[rows]
+            self.flagged_rows += [
+                {'row': int(offset + i), 'attack': self.class_names[a],
+                 'confidence': round(float(c), 4), 'malicious_probability': round(float(p), 4)}
+                for i, a, c, p in zip(rows, attacks, confidence, malicious)
+            ]
+
+    def to_response(self):
+        binary = self.binary.to_response()
+        multiclass = self.multiclass.to_response()
+        return {
+            'predictions': binary['predictions'],
+            'stats': dict(binary['stats'], multiclass_rows=self.multiclass.total,
+                          attack_distribution=multiclass['stats']['attack_distribution']),
+            'histograms': binary['histograms'],
+            'multiclass': dict(multiclass, classNames=self.class_names),
+            'flagged': self.flagged_rows,
+            'flagged_truncated': self.flagged_total > len(self.flagged_rows)
+        }
+
+
+def stream_predict(filepath, file_ext, detector, task='binary', chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                   max_rows=10_000, history=None):
+    """Scoring par morceaux d'un fichier ; `progress(lignes_traitées)` après chaque morceau
+
+    task : 'binary', 'multiclass' ou 'two-stage' (binaire puis multiclasse sur
+    les lignes malveillantes, dont au plus `max_rows` sont détaillées).
+    history : HistoryStore où journaliser les verdicts (source 'upload').
+    """
+    from columnar import iter_feature_batches
+    from features import row_digests
+
+    stats = _stream_stats(detector, task, max_rows)
+
+    # Seules les colonnes utiles aux modèles sont lues
+    columns = detector.required_columns(task)
+    class_names = detector.class_names if task != 'binary' else None
+    for X in iter_feature_batches(filepath, file_ext, columns, chunk_size):
+        result = detector.score_matrix(X, task)
+        stats.update(result)
+        if history is not None:
+            history.append(result, row_digests(X), source='upload', class_names=class_names)
+        if progress:
+            progress(stats.total)
+    if history is not None:
+        history.flush()
+
+    return _with_charts(stats.to_response(), task)
+
+
+def _stream_stats(detector, task, max_rows=10_000):
+    if task == 'binary':
+        return BinaryStreamStats(detector.ensemble.model_names)
+    if task == 'multiclass':
+        detector.initialize_multiclass()
+        return MulticlassStreamStats(detector.ensemble_m.model_names, detector.class_names)
+    if task == 'two-stage':
+        detector.initialize_multiclass()
+        return TwoStageStreamStats(detector.ensemble.model_names, detector.ensemble_m.model_names,
+                                   detector.class_names, max_rows=max_rows)
+    raise ValueError(f"Tâche inconnue: {task}")
+
+
+def _with_charts(response, task):
+    if task == 'two-stage':
+        response['charts'] = (prediction_charts(response['predictions'], 'binary') +
+                              prediction_charts(response['multiclass']['predictions'], 'multiclass'))
+    else:
+        response['charts'] = prediction_charts(response['predictions'], task)
+    return response
+
+
+def row_layout(task, model_names):
+    """Colonnes des réponses ligne à ligne : [(nom, genre)], genre 'row', 'class' ou 'probability'
+
+    binaire : classe majoritaire, probabilité malveillante moyenne puis par modèle ;
+    multiclasse : classe majoritaire, sa probabilité moyenne puis classe par modèle.
+    """
+    if task == 'binary':
+        return ([('row', 'row'), ('prediction', 'class'), ('malicious_probability', 'probability')] +
+                [(name, 'probability') for name in model_names])
+    if task == 'multiclass':
+        return ([('row', 'row'), ('prediction', 'class'), ('confidence', 'probability')] +
+                [(name, 'class') for name in model_names])
+    raise ValueError(f"Tâche non disponible ligne à ligne: {task}")
+
+
+def row_values(result, task, start):
+    """Valeurs des colonnes de row_layout pour un lot scoré dont la première ligne est `start`"""
+    rows = np.arange(start, start + len(result), dtype=np.int64)
+    predicted = result.majority_vote().astype(np.int16)
+    if task == 'binary':
+        return [rows, predicted, result.mean_probability()] + list(result.scores.T)
+    n, m = result.scores.shape
+    confidence = result.probabilities[np.arange(n)[:, None], np.arange(m), predicted[:, None]].mean(axis=1)
+    return [rows, predicted, confidence] + list(result.scores.astype(np.int16).T)
+
+
+class NdjsonEncoder:
+    """Une ligne JSON par prédiction, encadrée d'une ligne d'en-tête et d'une ligne de synthèse"""
+
+    mimetype = 'application/x-ndjson'
+
+    def __init__(self, header, layout, classes):
+        self.header = header
+        self.layout = layout
+        self.classes = list(classes)
+
+    def start(self):
+        return self._line(dict(self.header, type='header'))
+
+    def rows(self, values):
+        frame = pd.DataFrame({
+            name: pd.Categorical.from_codes(value, self.classes) if kind == 'class' else value
+            for (name, kind), value in zip(self.layout, values)
+        })
+        text = frame.to_json(orient='records', lines=True, double_precision=4)
+        return (text if text.endswith('\n') else text + '\n').encode()
+
+    def finish(self, summary):
+        return self._line(dict(summary, type='summary'))
+
+    @staticmethod
+    def _line(payload):
+        return (json.dumps(payload, ensure_ascii=False, default=_json_default) + '\n').encode()
+
+
+class ArrowEncoder:
+    """Flux Arrow IPC : un lot d'enregistrements par lot scoré, en-tête dans les méta-données du schéma
+
+    Le format ne permet pas de ligne de synthèse finale : la synthèse est
+    demandée à part (summary=1 ou réponse JSON, servie depuis le cache).
+    """
+
+    mimetype = 'application/vnd.apache.arrow.stream'
+
+    def __init__(self, header, layout, classes, compression=None):
+        import pyarrow as pa # type: ignore
+
+        self.pa = pa
+        self.layout = layout
+        self.classes = pa.array(list(classes), type=pa.string())
+        types = {'row': pa.int64(), 'class': pa.dictionary(pa.int16(), pa.string()), 'probability': pa.float32()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in layout],
+                                metadata={'header': json.dumps(header, default=_json_default)})
+        self.options = pa.ipc.IpcWriteOptions(compression=compression)
+        self.sink = io.BytesIO()
+        self.writer = None
+
+    def _drain(self):
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def start(self):
+        self.writer = self.pa.ipc.new_stream(self.sink, self.schema, options=self.options)
+        # Lot vide : le schéma part immédiatement, avant le premier scoring
+        self.writer.write_batch(self._batch([np.empty(0, dtype=np.int16)] * len(self.layout)))
+        return self._drain()
+
+    def _batch(self, values):
+        pa = self.pa
+        arrays = []
+        for (_, kind), value in zip(self.layout, values):
+            if kind == 'class':
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(value, type=pa.int16()), self.classes))
+            elif kind == 'row':
+                arrays.append(pa.array(value, type=pa.int64()))
+            else:
+                arrays.append(pa.array(value, type=pa.float32()))
+        return pa.record_batch(arrays, schema=self.schema)
+
+    def rows(self, values):
+        self.writer.write_batch(self._batch(values))
+        return self._drain()
+
+    def finish(self, summary):
+        self.writer.close()
+        return self._drain()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def _gzip(pieces):
+    """Compression gzip au fil de l'eau : chaque morceau est vidé pour partir aussitôt"""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for piece in pieces:
+        data = compressor.compress(piece) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def row_encoder(fmt, header, layout, classes, compression=None):
+    """Encodeur du format demandé ; ValueError si le format ou la compression est inconnu"""
+    if fmt not in ROW_FORMATS:
+        raise ValueError(f"Format inconnu: {fmt} (attendu: {', '.join(ROW_FORMATS)})")
+    if compression is not None and compression not in ROW_COMPRESSIONS[fmt]:
+        raise ValueError(f"Compression {compression} non disponible en {fmt}")
+    if fmt == 'ndjson':
+        return NdjsonEncoder(header, layout, classes)
+    return ArrowEncoder(header, layout, classes, compression if compression in ('zstd', 'lz4') else None)
+
+
+def stream_rows(filepath, file_ext, detector, task='binary', fmt='ndjson', compression=None, offset=0,
+                limit=None, summary_only=False, chunk_size=DEFAULT_CHUNK_SIZE, history=None, on_complete=None):
+    """Prédictions ligne à ligne encodées au fil du scoring : (type MIME, générateur d'octets)
+
+    Seules les lignes [offset, offset + limit) sont scorées ; la synthèse
+    finale (NDJSON) porte sur elles et indique `next_offset` s'il en reste.
+    summary_only n'envoie que l'en-tête et la synthèse. Quand tout le fichier
+    a été scoré, `on_complete` reçoit la réponse de stream_predict
+    correspondante (mise en cache par l'appelant). Les erreurs de paramètres
+    et les colonnes manquantes sont levées avant le premier octet. Seul un
+    flux complet est journalisé dans `history` : relire une page ne duplique
+    pas les détections.
+    """
+    from columnar import check_columns, iter_feature_batches
+    from features import row_digests
+
+    if task == 'binary':
+        model_names, classes = detector.ensemble.model_names, BINARY_CLASSES
+    elif task == 'multiclass':
+        detector.initialize_multiclass()
+        model_names, classes = detector.ensemble_m.model_names, detector.class_names
+    else:
+        raise ValueError(f"Tâche non disponible ligne à ligne: {task}")
+    if offset < 0 or (limit is not None and limit < 1):
+        raise ValueError("offset doit être positif et limit strictement positif")
+    columns = detector.required_columns(task)
+    check_columns(filepath, file_ext, columns)
+    if offset or limit is not None:
+        history = None
+    layout = row_layout(task, model_names)
+    header = {'task': task, 'models': list(model_names), 'classes': list(classes),
+              'columns': [name for name, _ in layout], 'offset': offset, 'limit': limit}
+    encoder = row_encoder(fmt, header, layout, classes, compression)
+    stats = _stream_stats(detector, task)
+    class_names = list(classes) if task != 'binary' else None
+
+    def generate():
+        yield encoder.start()
+        end = None if limit is None else offset + limit
+        position = 0
+        next_offset = None
+        for X in iter_feature_batches(filepath, file_ext, columns, chunk_size):
+            start = position
+            position += len(X)
+            if position <= offset:
+                # Avant la page : lu mais ni scoré ni encodé
+                continue
+            if end is not None and start >= end:
+                next_offset = end
+                break
+            X = X[max(offset - start, 0):len(X) if end is None else min(end - start, len(X))]
+            first = max(offset, start)
+            for i in range(0, len(X), ROW_BATCH_SIZE):
+                batch = X[i:i + ROW_BATCH_SIZE]
+                result = detector.score_matrix(batch, task)
+                stats.update(result)
+                if history is not None:
+                    history.append(result, row_digests(batch), source='upload', class_names=class_names)
+                if not summary_only:
+                    yield encoder.rows(row_values(result, task, first + i))
+            if end is not None and position > end:
+                next_offset = end
+                break
+        if history is not None:
+            history.flush()
+
+        response = stats.to_response()
+        if on_complete is not None and offset == 0 and next_offset is None:
+            on_complete(_with_charts(dict(response), task))
+        yield encoder.finish(dict(response, offset=offset, rows=stats.total, next_offset=next_offset))
+
+    pieces = generate()
+    return encoder.mimetype, _gzip(pieces) if compression == 'gzip' else pieces
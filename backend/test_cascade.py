@@ -0,0 +1,98 @@
+"""CascadeScorer : sorties par bande d'incertitude, statistiques, et taux binaires FAR / AMR."""
+import numpy as np
+import pandas as pd
+import pytest
+from cascade import CascadeScorer, binary_labels, binary_rates
+
+
+class FixedModel:
+    """Probabilité fixée par ligne (première colonne de X : indice de la ligne) ; garde les lignes reçues"""
+
+    def __init__(self, probabilities):
+        self.probabilities = np.asarray(probabilities, dtype=np.float32)
+        self.seen = []
+
+    def predict(self, X, verbose=0):
+        rows = X[:, 0].astype(int)
+        self.seen.append(rows.tolist())
+        return self.probabilities[rows].reshape(-1, 1)
+
+
+def rows(n):
+    return np.arange(n, dtype=np.float32).reshape(-1, 1)
+
+
+@pytest.fixture
+def models():
+    return {
+        'fast': FixedModel([0.05, 0.95, 0.6, 0.45, 0.5]),
+        'medium': FixedModel([0.5, 0.5, 0.95, 0.55, 0.4]),
+        'slow': FixedModel([0.5, 0.5, 0.5, 0.9, 0.2])
+    }
+
+
+def test_rows_exit_at_the_first_confident_stage(models):
+    cascade = CascadeScorer(models, order=['fast', 'medium', 'slow'], bands=0.3)
+    result = cascade.predict(rows(5))
+    # |p - 0.5| < 0.3 : incertain, passe à l'étage suivant
+    np.testing.assert_array_equal(result.exit_stage, [0, 0, 1, 2, 2])
+    np.testing.assert_allclose(result.probabilities, [0.05, 0.95, 0.95, 0.9, 0.2])
+    np.testing.assert_array_equal(result.labels(), [0, 1, 1, 1, 0])
+    assert result.stage_counts() == {'fast': 2, 'medium': 1, 'slow': 2}
+    # Chaque étage ne reçoit que les lignes encore incertaines
+    assert models['medium'].seen == [[2, 3, 4]] and models['slow'].seen == [[3, 4]]
+    assert result.format_row(2) == [{'Modèle': 'medium', 'Statut': '🔴 Malicieux',
+                                     'Confiance': '95.0%', 'Valeur brute': '0.9500'}]
+
+
+def test_bands_per_stage_and_order(models):
+    cascade = CascadeScorer(models, order=['slow', 'fast'], bands=[0.25])
+    result = cascade.predict(rows(5))
+    np.testing.assert_array_equal(result.exit_stage, [1, 1, 1, 0, 0])
+    np.testing.assert_allclose(result.probabilities, [0.05, 0.95, 0.6, 0.9, 0.2])
+    assert models['medium'].seen == []
+
+
+def test_zero_band_stops_at_the_first_stage(models):
+    result = CascadeScorer(models, bands=0.0).predict(rows(5))
+    assert result.stage_counts() == {'fast': 5, 'medium': 0, 'slow': 0}
+    assert models['medium'].seen == []
+
+
+def test_stats_accumulate(models):
+    cascade = CascadeScorer(models, bands=0.3)
+    cascade.predict(rows(5))
+    cascade.predict(rows(2))
+    stats = cascade.stats()
+    assert stats['rows'] == 7 and stats['order'] == ['fast', 'medium', 'slow']
+    assert stats['exits'] == {'fast': 4, 'medium': 1, 'slow': 2}
+    assert stats['exit_ratio'] == {'fast': round(4 / 7, 4), 'medium': round(1 / 7, 4), 'slow': round(2 / 7, 4)}
+
+
+def test_invalid_configuration(models):
+    with pytest.raises(ValueError):
+        CascadeScorer(models, order=['fast', 'unknown'])
+    with pytest.raises(ValueError):
+        CascadeScorer(models, bands=[0.1])
+
+
+def test_binary_rates_definitions():
+    y_true = np.array([0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1])
+    y_pred = np.array([0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 0, 0])
+    tn, fp, fn, tp = 3, 2, 2, 5
+    rates = binary_rates(y_true, y_pred)
+    assert rates['far'] == fp / (tn + fp)
+    assert rates['amr'] == fn / (fn + tp)
+    assert rates['detection_rate'] == tp / (tp + fn) == 1 - rates['amr']
+    assert rates['accuracy'] == (tp + tn) / 12
+
+
+def test_binary_rates_without_a_class():
+    assert binary_rates(np.array([1, 1]), np.array([1, 0]))['far'] == 0.0
+    assert binary_rates(np.array([0, 0]), np.array([1, 0]))['amr'] == 0.0
+    assert binary_rates(np.array([], dtype=int), np.array([], dtype=int))['accuracy'] == 0.0
+
+
+def test_binary_labels():
+    np.testing.assert_array_equal(binary_labels(pd.Series(['Benign', ' DDoS', 'Benign ', 'PortScan'])), [0, 1, 0, 1])
+    np.testing.assert_array_equal(binary_labels(pd.Series([0, 1, 1])), [0, 1, 1])
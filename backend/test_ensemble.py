@@ -0,0 +1,161 @@
+"""EnsembleExecutor : première couche fusionnée, votes et probabilités moyennes ; scoring en deux étages."""
+import numpy as np
+import pytest
+from detection import PacketDetector
+from ensemble import EnsembleExecutor, EnsembleResult
+from features import FeaturePipeline
+from numpy_mlp import NumpyMLP
+
+
+def mlp(rng, n_in=6, hidden=(12, 5), outputs=1, activation='sigmoid'):
+    sizes = (n_in,) + hidden
+    layers = [(rng.normal(size=(a, b)), rng.normal(size=b), 'tanh' if i == 0 else 'selu')
+              for i, (a, b) in enumerate(zip(sizes, sizes[1:]))]
+    layers.append((rng.normal(size=(sizes[-1], outputs)), rng.normal(size=outputs), activation))
+    return NumpyMLP(layers)
+
+
+def int8_first_layer(model):
+    """Bundle int8 dont la première couche est aussi quantifiée (échelle par canal)"""
+    W, b, activation = model.layers[0]
+    scale = np.abs(W).max(axis=0) / 127
+    quantized = model.quantize('int8')
+    layers = [(np.rint(W / scale).astype(np.int8), b, activation)] + quantized.layers[1:]
+    return NumpyMLP(layers, scales=[scale] + quantized.scales[1:])
+
+
+class KerasLike:
+    """Modèle opaque : seul `predict(X, verbose=0)` est connu de l'ensemble"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, X, verbose=0):
+        return self.model.predict(X)
+
+
+@pytest.fixture
+def X():
+    return np.random.default_rng(0).normal(size=(300, 6)).astype(np.float32)
+
+
+@pytest.mark.parametrize('task, outputs, activation', [('binary', 1, 'sigmoid'), ('multiclass', 4, 'softmax')])
+def test_fused_first_layer_matches_separate_forwards(X, task, outputs, activation):
+    rng = np.random.default_rng(1)
+    # Profondeurs et largeurs différentes : seule la dimension d'entrée est commune
+    models = {f'Model {i}': mlp(rng, hidden=hidden, outputs=outputs, activation=activation)
+              for i, hidden in enumerate([(12, 5), (30,), (8, 8, 8)], 1)}
+    executor = EnsembleExecutor(models, task=task)
+    assert executor._fused is not None
+    for out, model in zip(executor.forward(X), models.values()):
+        np.testing.assert_allclose(out, model.predict(X), rtol=1e-5, atol=1e-6)
+
+
+def test_fused_int8_first_layers_keep_their_scales(X):
+    rng = np.random.default_rng(2)
+    models = {f'Model {i}': int8_first_layer(mlp(rng)) for i in range(3)}
+    executor = EnsembleExecutor(models)
+    assert executor._fused[3] is not None
+    for out, model in zip(executor.forward(X), models.values()):
+        np.testing.assert_allclose(out, model.predict(X), rtol=1e-5, atol=1e-6)
+
+
+def test_first_layers_of_different_types_are_not_fused(X):
+    rng = np.random.default_rng(3)
+    models = {'a': mlp(rng), 'b': int8_first_layer(mlp(rng)), 'c': mlp(rng, n_in=7)}
+    assert EnsembleExecutor({k: models[k] for k in 'ab'})._fused is None
+    assert EnsembleExecutor({k: models[k] for k in 'ac'})._fused is None
+    result = EnsembleExecutor({k: models[k] for k in 'ab'}).predict(X)
+    np.testing.assert_allclose(result.scores[:, 1], models['b'].predict(X)[:, 0], rtol=1e-6)
+
+
+def test_parallel_predict_matches_sequential(X):
+    rng = np.random.default_rng(4)
+    models = {'a': mlp(rng), 'b': mlp(rng, n_in=6, hidden=(3,))}
+    sequential = EnsembleExecutor(models).predict(X).scores
+    # Modèles non NumPy : appels predict séparés, ici en parallèle
+    parallel = EnsembleExecutor({name: KerasLike(model) for name, model in models.items()}, max_workers=2)
+    assert parallel._fused is None and parallel.pool is not None
+    np.testing.assert_allclose(parallel.predict(X).scores, sequential, rtol=1e-5, atol=1e-6)
+
+
+def test_binary_vote_ties_are_benign():
+    scores = np.array([[0.9, 0.8, 0.1, 0.2],    # 2 contre 2
+                       [0.9, 0.8, 0.7, 0.2],
+                       [0.5, 0.5, 0.9, 0.1]])   # 0.5 n'est pas au-dessus du seuil
+    result = EnsembleResult(['a', 'b', 'c', 'd'], scores)
+    np.testing.assert_array_equal(result.labels()[2], [0, 0, 1, 0])
+    np.testing.assert_array_equal(result.majority_vote(), [0, 1, 0])
+    np.testing.assert_allclose(result.mean_probability(), [0.5, 0.65, 0.5])
+
+
+def test_multiclass_vote_ties_go_to_the_lowest_class():
+    probabilities = np.array([
+        [[0.1, 0.7, 0.2], [0.1, 0.2, 0.7], [0.6, 0.2, 0.2], [0.2, 0.6, 0.2]],  # 1, 2, 0, 1
+        [[0.1, 0.2, 0.7], [0.2, 0.7, 0.1], [0.1, 0.2, 0.7], [0.2, 0.7, 0.1]],  # 2, 1, 2, 1
+    ])
+    result = EnsembleResult(['a', 'b', 'c', 'd'], probabilities.argmax(axis=2), probabilities=probabilities)
+    np.testing.assert_array_equal(result.majority_vote(), [1, 1])
+    np.testing.assert_allclose(result.mean_probability(), probabilities.mean(axis=1))
+    assert result.format_row(1, class_names=['DoS', 'PortScan', 'Bot'])[0] == {
+        'Modèle': 'a', 'Classe': 'Bot', 'Confiance': '70.0%', 'Valeur brute': '0.7000'}
+
+
+def test_unknown_task():
+    with pytest.raises(ValueError):
+        EnsembleExecutor({}, task='regression')
+
+
+class TableModel:
+    """Sorties fixées par ligne (première colonne de X : indice de la ligne) ; garde les entrées reçues"""
+
+    def __init__(self, outputs):
+        self.outputs = np.asarray(outputs, dtype=np.float32)
+        self.seen = []
+
+    def predict(self, X, verbose=0):
+        self.seen.append(np.array(X))
+        return self.outputs[X[:, 0].astype(int)].reshape(len(X), -1)
+
+
+def two_stage_detector(binary_scores, class_probabilities):
+    """Binaire sur 'Destination Port' (indice de ligne), multiclasse sur ('Destination Port', 'Bwd Packets/s')"""
+    detector = PacketDetector()
+    detector.pipeline = FeaturePipeline(['Flow Duration'], [1.0], ['Destination Port'])
+    binary_scores = np.asarray(binary_scores)
+    detector.ensemble = EnsembleExecutor({f'Model {j + 1}': TableModel(binary_scores[:, j])
+                                          for j in range(binary_scores.shape[1])})
+    detector.features_m = ['Destination Port', 'Bwd Packets/s']
+    detector.ensemble_m = EnsembleExecutor({'Model 1': TableModel(class_probabilities),
+                                            'Model 2': TableModel(class_probabilities)}, task='multiclass')
+    return detector
+
+
+def raw_rows(n):
+    # Colonnes de required_columns('two-stage') : Flow Duration, Destination Port, Bwd Packets/s
+    return np.column_stack([np.ones(n), np.arange(n), 100 + np.arange(n)]).astype(np.float32)
+
+
+def test_two_stage_scores_only_flagged_rows_with_multiclass():
+    binary = [[0.9, 0.8, 0.1], [0.1, 0.2, 0.9], [0.6, 0.7, 0.4], [0.2, 0.2, 0.2]]
+    classes = [[0.7, 0.2, 0.1], [1, 0, 0], [0.1, 0.3, 0.6], [1, 0, 0]]
+    detector = two_stage_detector(binary, classes)
+    assert detector.required_columns('two-stage') == ['Flow Duration', 'Destination Port', 'Bwd Packets/s']
+
+    result = detector.score_two_stage(raw_rows(4))
+    np.testing.assert_array_equal(result.flagged, [0, 2])
+    np.testing.assert_array_equal(result.binary.majority_vote(), [1, 0, 1, 0])
+    # Les modèles multiclasses ne voient que les lignes signalées, dans l'ordre de features_m
+    seen = detector.ensemble_m.models['Model 1'].seen
+    assert len(seen) == 1
+    np.testing.assert_array_equal(seen[0], [[0, 100], [2, 102]])
+    np.testing.assert_array_equal(result.attack_types(), [0, 2])
+    np.testing.assert_allclose(result.attack_confidence(), [0.7, 0.6])
+
+
+def test_two_stage_without_flagged_rows_skips_multiclass():
+    detector = two_stage_detector([[0.1, 0.2, 0.9], [0.2, 0.2, 0.2]], [[1, 0, 0], [1, 0, 0]])
+    result = detector.score_two_stage(raw_rows(2))
+    assert result.flagged.size == 0 and result.multiclass is None
+    assert detector.ensemble_m.models['Model 1'].seen == []
+    assert result.attack_types().shape == (0,) and result.attack_confidence().shape == (0,)
@@ -0,0 +1,85 @@
+"""FeaturePipeline face au notebook : Normalizer scikit-learn sur toutes les features, puis colonnes construites."""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import Normalizer
+from features import COMBINED_SCORE, FeaturePipeline
+
+# Features du normalizer (feature_tuples_b) : tous les opérandes des interactions en font partie, comme au notebook
+FEATURES = ['Flow Duration', 'Bwd Packets/s', 'Packet Length Std', 'Bwd Packet Length Std',
+            'Total Fwd Packets', 'Total Backward Packets', 'Init_Win_bytes_forward']
+WEIGHTS = [0.3, 0.2, 0.15, 0.1, 0.1, 0.1, 0.05]
+SELECTED = [COMBINED_SCORE, 'Flow Duration', 'Init_Win_bytes_forward', 'Bwd_Fwd_Product',
+            'Packet_Length_Std_Diff', 'Total_Packets_Diff']
+
+
+def notebook_matrix(df, norm):
+    """Sections 1.5.1.1 à 1.5.1.3 du notebook, appliquées à un DataFrame brut"""
+    X_selected = df[FEATURES].fillna(0)
+    # create_new_features_1 : seule la matrice normalisée est conservée
+    normalized = pd.DataFrame(Normalizer(norm=norm).fit_transform(X_selected), columns=FEATURES)
+    normalized['Combined_Importance_Score'] = normalized[FEATURES].dot(WEIGHTS)
+    # create_new_features_2 (commentée dans le notebook) et create_new_features_3
+    normalized['Packet_Length_Std_Diff'] = normalized['Bwd Packet Length Std'] - normalized['Packet Length Std']
+    normalized['Total_Packets_Diff'] = normalized['Total Fwd Packets'] - normalized['Total Backward Packets']
+    normalized['Bwd_Fwd_Product'] = normalized['Bwd Packets/s'] * normalized['Flow Duration']
+    # Seconde sélection : selected_features_final_b
+    return normalized.loc[:, SELECTED].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(2017)
+    n = 500
+    df = pd.DataFrame({
+        'Flow Duration': rng.exponential(1e5, n),
+        'Bwd Packets/s': rng.exponential(50, n),
+        'Packet Length Std': rng.normal(200, 80, n),
+        'Bwd Packet Length Std': rng.normal(100, 40, n),
+        'Total Fwd Packets': rng.integers(1, 500, n).astype(float),
+        'Total Backward Packets': rng.integers(0, 500, n).astype(float),
+        'Init_Win_bytes_forward': rng.integers(-1, 65535, n).astype(float),
+        'Destination Port': rng.integers(0, 65535, n).astype(float),
+        'Unused': rng.normal(size=n)
+    })
+    # Lignes nulles (laissées telles quelles par le Normalizer) et valeurs manquantes
+    df.loc[[0, 7, 499], FEATURES] = 0
+    df.loc[3, 'Packet Length Std'] = np.nan
+    df.loc[11, 'Total Backward Packets'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('norm', ['l2', 'l1', 'max'])
+def test_transform_frame_matches_the_notebook(frame, norm):
+    pipeline = FeaturePipeline(FEATURES, WEIGHTS, SELECTED, norm=norm)
+    expected = notebook_matrix(frame, norm)
+    result = pipeline.transform_frame(frame)
+    assert result.shape == expected.shape
+    np.testing.assert_allclose(result, expected, rtol=1e-4, atol=1e-7)
+
+
+def test_columns_outside_the_normalizer_are_copied_raw(frame):
+    pipeline = FeaturePipeline(FEATURES, WEIGHTS, SELECTED + ['Destination Port'])
+    result = pipeline.transform_frame(frame)
+    np.testing.assert_allclose(result[:, :-1], notebook_matrix(frame, 'l2'), rtol=1e-4, atol=1e-7)
+    np.testing.assert_array_equal(result[:, -1], frame['Destination Port'].to_numpy(dtype=np.float32))
+
+
+@pytest.mark.parametrize('norm', ['l2', 'l1', 'max'])
+def test_zero_rows_stay_zero(frame, norm):
+    pipeline = FeaturePipeline(FEATURES, WEIGHTS, SELECTED + ['Destination Port'], norm=norm)
+    result = pipeline.transform_frame(frame.loc[[0, 7, 499]])
+    assert np.all(result[:, :-1] == 0)
+    np.testing.assert_array_equal(result[:, -1], frame.loc[[0, 7, 499], 'Destination Port'].to_numpy(dtype=np.float32))
+
+
+def test_records_and_frame_agree(frame):
+    pipeline = FeaturePipeline(FEATURES, WEIGHTS, SELECTED + ['Destination Port'])
+    expected = pipeline.transform_frame(frame).copy()
+    records = frame.drop(columns=['Unused']).to_dict('records')
+    np.testing.assert_array_equal(pipeline.transform_records(records), expected)
+
+
+def test_unknown_norm():
+    with pytest.raises(ValueError):
+        FeaturePipeline(FEATURES, WEIGHTS, SELECTED, norm='l3')
@@ -0,0 +1,310 @@
+"""HistoryStore : écriture, partitions horaires, requêtes, comptages, compaction et accès concurrents."""
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import numpy as np
+import pytest
+from ensemble import EnsembleResult
+from history import HistoryStore, partition_name
+
+T0 = 1_700_000_000 // 3600 * 3600  # début d'une partition horaire
+MODELS = ['RandomForest', 'XGBoost']
+
+
+def batch(scores):
+    """Lot binaire à deux modèles ; une ligne est malveillante si les deux scores dépassent 0.5"""
+    return EnsembleResult(MODELS, np.asarray(scores, dtype=np.float32).reshape(-1, 2))
+
+
+def segment_files(directory):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(directory)
+                  for name in names if name.startswith('seg-'))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path), segment_rows=1000, flush_interval=3600, compact_interval=1e9)
+
+
+def test_append_buffers_until_flush(store, tmp_path):
+    store.append(batch([[0.9, 0.8], [0.1, 0.2]]), digests=[1, 2], timestamp=T0 + 10)
+    assert segment_files(tmp_path) == []
+    # Les tampons du processus sont visibles avant écriture
+    assert store.count('binary')['total'] == 2
+    assert store.stats()['pending_rows'] == 2
+
+    store.flush()
+    files = segment_files(tmp_path)
+    assert len(files) == 1
+    assert os.path.basename(os.path.dirname(files[0])) == partition_name(T0)
+    stats = store.stats()
+    assert (stats['rows'], stats['pending_rows'], stats['segments']) == (2, 0, 1)
+    assert store.count('binary')['by_class'] == {'Benign': 1, 'Malicious': 1}
+
+
+def test_full_buffer_is_written(store, tmp_path):
+    store.append(batch(np.full((999, 2), 0.1)), timestamp=T0)
+    assert segment_files(tmp_path) == []
+    store.append(batch([[0.1, 0.1]]), timestamp=T0)
+    assert len(segment_files(tmp_path)) == 1
+    assert store.stats()['rows'] == 1000
+
+
+def test_hourly_partition_boundary(store, tmp_path):
+    store.append(batch([[0.9, 0.9]]), timestamp=T0 + 3599.5)
+    store.append(batch([[0.1, 0.1]]), timestamp=T0 + 3600)
+    store.flush()
+    partitions = sorted(os.listdir(tmp_path))
+    assert partitions == [partition_name(T0), partition_name(T0 + 3600)]
+
+    assert store.count('binary', start=T0, end=T0 + 3600)['by_class'] == {'Benign': 0, 'Malicious': 1}
+    assert store.count('binary', start=T0 + 3600)['by_class'] == {'Benign': 1, 'Malicious': 0}
+    # Bornes : [start, end)
+    assert store.count('binary', start=T0 + 3599.5, end=T0 + 3600)['total'] == 1
+    assert store.count('binary', start=T0 + 3600, end=T0 + 3600)['total'] == 0
+
+
+def test_count_from_index_and_buckets(store):
+    store.append(batch([[0.9, 0.9], [0.1, 0.1]]), timestamp=T0 + 10)
+    store.append(batch([[0.9, 0.9]]), timestamp=T0 + 70)
+    store.flush()
+
+    covered = store.count('binary', start=T0, end=T0 + 3600)
+    assert covered['total'] == 3 and covered['malicious'] == 2
+    assert covered['scanned_segments'] == 0
+
+    partial = store.count('binary', start=T0 + 60, end=T0 + 3600)
+    assert partial['by_class'] == {'Benign': 0, 'Malicious': 1}
+    assert partial['scanned_segments'] == 1
+
+    buckets = store.count('binary', bucket=60)['buckets']
+    assert buckets == [{'start': T0, 'counts': {'Benign': 1, 'Malicious': 1}},
+                       {'start': T0 + 60, 'counts': {'Malicious': 1}}]
+
+
+def test_count_requires_task(store):
+    store.append(batch([[0.9, 0.9]]), timestamp=T0)
+    store.append(batch([[0.9, 0.9]]), timestamp=T0, source='upload')
+    with pytest.raises(ValueError):
+        store.count(None)
+    assert store.count('binary')['total'] == 2
+    assert store.count('binary', source='upload')['total'] == 1
+    assert store.count('multiclass')['total'] == 0
+
+
+def test_query_order_pagination_and_filters(store):
+    for i in range(5):
+        store.append(batch([[0.2 * i, 0.2 * i]]), digests=[i], timestamp=T0 + i)
+        if i == 2:
+            store.flush()  # deux segments écrits, le reste en tampon
+
+    page = store.query(limit=2)
+    assert [row['timestamp'] for row in page['rows']] == [T0 + 4, T0 + 3]
+    assert page['has_more']
+    row = page['rows'][0]
+    assert row['digest'] == f'{4:016x}'
+    assert row['predicted'] == 'Malicious' and row['source'] == 'live' and row['task'] == 'binary'
+    assert row['probabilities'] == {'RandomForest': 0.8, 'XGBoost': 0.8}
+
+    last = store.query(limit=2, offset=4)
+    assert [row['timestamp'] for row in last['rows']] == [T0]
+    assert not last['has_more']
+
+    assert [r['timestamp'] for r in store.query(predicted='Malicious')['rows']] == [T0 + 4, T0 + 3]
+    assert [r['timestamp'] for r in store.query(min_score=0.4)['rows']] == [T0 + 4, T0 + 3, T0 + 2]
+    assert [r['timestamp'] for r in store.query(start=T0 + 1, end=T0 + 3)['rows']] == [T0 + 2, T0 + 1]
+    assert store.query(predicted='Unknown')['rows'] == []
+
+
+def test_top(store):
+    rng = np.random.default_rng(0)
+    scores = rng.random((200, 2))
+    store.append(batch(scores[:100]), timestamp=T0)
+    store.append(batch(scores[100:]), timestamp=T0 + 3600)
+    store.flush()
+    expected = np.sort(scores.astype(np.float32).mean(axis=1))[::-1][:5]
+    top = store.top(5)
+    np.testing.assert_allclose([row['score'] for row in top['rows']], expected, atol=1e-4)
+    assert [row['timestamp'] for row in store.top(3, start=T0 + 3600)['rows']] == [T0 + 3600] * 3
+
+
+def test_other_process_segments_are_indexed(store, tmp_path):
+    store.append(batch([[0.9, 0.9]] * 3), timestamp=T0)
+    store.flush()
+    reader = HistoryStore(str(tmp_path))
+    assert reader.count('binary')['total'] == 3
+    assert len(reader.query()['rows']) == 3
+
+
+def test_compaction_merges_closed_partitions(store, tmp_path):
+    for i in range(4):
+        store.append(batch([[0.9, 0.9], [0.1, 0.1]]), timestamp=T0 + 100 * (3 - i))
+        store.flush()
+    store.append(batch([[0.1, 0.1]]), timestamp=T0 + 3600)
+    store.flush()
+    before = store.count('binary')
+    newest = store.query(limit=3)['rows']
+
+    store.flush_interval = 5
+    report = store.compact(now=T0 + 3 * 3600)
+    assert report['merged_segments'] == 4 and report['written_segments'] == 1
+    assert report['rewritten_rows'] == 8 and report['deleted_partitions'] == 0
+    # La partition de T0 ne contient plus qu'un segment de niveau 1 ; celle d'après, seule, est laissée
+    assert len(os.listdir(tmp_path / partition_name(T0))) == 1
+    stats = store.stats()
+    assert (stats['segments'], stats['level_0_segments'], stats['rows']) == (2, 1, 9)
+    assert stats['write_amplification'] == round(17 / 9, 3)
+
+    assert store.count('binary') == {**before, 'segments': 2}
+    assert store.query(limit=3)['rows'] == newest
+    merged = HistoryStore(str(tmp_path)).query(start=T0, end=T0 + 3600, limit=8)['rows']
+    assert [row['timestamp'] for row in merged] == sorted([T0 + 100 * i for i in range(4)] * 2, reverse=True)
+
+    # Une seconde passe ne réécrit rien
+    assert store.compact(now=T0 + 3 * 3600)['rewritten_rows'] == 0
+
+
+def test_open_partition_is_not_merged(store):
+    for _ in range(3):
+        store.append(batch([[0.9, 0.9]]), timestamp=T0 + 10)
+        store.flush()
+    store.flush_interval = 5
+    assert store.compact(now=T0 + 3600)['merged_segments'] == 0
+    assert store.stats()['level_0_segments'] == 3
+
+
+def test_retention_deletes_old_partitions(store, tmp_path):
+    store.retention = 86400
+    store.append(batch([[0.9, 0.9]]), timestamp=T0)
+    store.append(batch([[0.1, 0.1]]), timestamp=T0 + 86400)
+    store.flush()
+    report = store.compact(now=T0 + 86400 + 3600)
+    assert report['deleted_partitions'] == 1
+    assert os.listdir(tmp_path) == [partition_name(T0 + 86400)]
+    assert store.count('binary')['by_class'] == {'Benign': 1, 'Malicious': 0}
+
+
+def test_concurrent_compaction_is_skipped(store, tmp_path):
+    open(tmp_path / '.compact.lock', 'w').close()
+    assert store.compact() is None
+
+
+def test_concurrent_append_and_query(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=2000, flush_interval=0.01, compact_interval=0.05)
+    errors = []
+
+    def writer():
+        try:
+            for _ in range(100):
+                store.append(batch(np.random.rand(500, 2)))
+        except Exception as error:  # pragma: no cover - remonté par l'assertion
+            errors.append(error)
+
+    def reader():
+        try:
+            for _ in range(100):
+                store.query(limit=5)
+                store.count('binary')
+                store.top(3)
+        except Exception as error:  # pragma: no cover
+            errors.append(error)
+
+    threads = [threading.Thread(target=writer) for _ in range(2)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+    store.flush()
+    assert store.count('binary')['total'] == 100_000
+
+
+SERVER_LIKE = textwrap.dedent('''
+    import eventlet
+    eventlet.monkey_patch()
+    import sys
+    from eventlet import tpool
+    import numpy as np
+    from ensemble import EnsembleResult
+    from history import HistoryStore
+
+    store = HistoryStore(sys.argv[1], segment_rows=2000, flush_interval=0.01, compact_interval=0.05)
+
+    def live():
+        for _ in range(100):
+            tpool.execute(store.append, EnsembleResult(['a', 'b'], np.random.rand(500, 2).astype(np.float32)))
+
+    def reader():
+        for _ in range(100):
+            store.query(limit=5)
+            store.count('binary')
+            eventlet.sleep(0)
+
+    pool = [eventlet.spawn(live)] + [eventlet.spawn(reader) for _ in range(4)]
+    for green in pool:
+        green.wait()
+    store.flush()
+    print(store.count('binary')['total'])
+''')
+
+
+def test_append_from_tpool_while_hub_queries(tmp_path):
+    """Comme le serveur : append dans les threads tpool, requêtes depuis le hub eventlet"""
+    pytest.importorskip('eventlet')
+    try:
+        done = subprocess.run([sys.executable, '-W', 'ignore', '-c', SERVER_LIKE, str(tmp_path)],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=120)
+    except subprocess.TimeoutExpired:
+        pytest.fail("interblocage entre le hub eventlet et les threads tpool")
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.split()[-1] == '50000'
+
+
+@pytest.mark.parametrize('read', [
+    lambda store: store.query(limit=10)['rows'],
+    lambda store: store.count('binary', bucket=60)['buckets'],
+    lambda store: store.top(3)['rows']
+], ids=['query', 'count', 'top'])
+def test_reads_survive_a_compaction_between_selection_and_read(tmp_path, read):
+    expected = None
+    for directory in ('reference', 'raced'):
+        store = HistoryStore(str(tmp_path / directory), segment_rows=1000, flush_interval=5, compact_interval=1e9)
+        for i in range(3):
+            store.append(batch([[0.9 - 0.01 * i, 0.9], [0.1 * i, 0.1]]), digests=[2 * i, 2 * i + 1], timestamp=T0 + 100 * i)
+            store.flush()
+        if expected is None:
+            expected = read(store)
+            continue
+        selected, compacted = store._selected, []
+
+        def compact_after_selection(*args, **kwargs):
+            # Les segments renvoyés sont ceux de niveau 0 que la compaction supprime
+            segments = selected(*args, **kwargs)
+            if not compacted:
+                compacted.append(store.compact(now=T0 + 3 * 3600))
+            return segments
+
+        store._selected = compact_after_selection
+        assert read(store) == expected
+        assert compacted[0]['merged_segments'] == 3
+
+
+def test_flushed_rows_stay_visible_during_the_write(store, monkeypatch):
+    store.append(batch([[0.9, 0.9], [0.1, 0.1]]), timestamp=T0)
+    write, seen = store._write, []
+
+    def observed_write(*args, **kwargs):
+        # Tampon retiré de self.buffers, segment pas encore indexé
+        seen.append((store.count('binary')['total'], store.stats()['pending_rows']))
+        return write(*args, **kwargs)
+
+    monkeypatch.setattr(store, '_write', observed_write)
+    store.flush()
+    assert seen == [(2, 2)]
+    assert store.count('binary')['total'] == 2
+    stats = store.stats()
+    assert (stats['pending_rows'], stats['written_rows'], stats['rows']) == (0, 2, 2)
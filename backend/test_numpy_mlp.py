@@ -0,0 +1,124 @@
+"""NumpyMLP : parité avec Keras, bundles .npz, quantification float16 / int8 et codes de sortie du CLI."""
+import numpy as np
+import pandas as pd
+import pytest
+import numpy_mlp
+from numpy_mlp import NumpyMLP, bundle_path_for, export_keras_model, main, verify_bundle
+
+# Échelles des features brutes CICIDS : durées en µs, débits, tailles, drapeaux
+FEATURE_SCALES = np.array([1e6, 1e4, 500, 50, 1], dtype=np.float32)
+
+
+def raw_model(rng, outputs=1, activation='sigmoid'):
+    """MLP dont la première couche compense l'échelle des features, comme après un entraînement sans normalisation"""
+    layers = [(rng.normal(size=(5, 32)) / FEATURE_SCALES[:, None], rng.normal(size=32) * 0.1, 'tanh')]
+    for units in (16, 8):
+        layers.append((rng.normal(size=(layers[-1][0].shape[1], units)) / 3, rng.normal(size=units) * 0.1, 'selu'))
+    layers.append((rng.normal(size=(8, outputs)), np.zeros(outputs), activation))
+    return NumpyMLP(layers, name='raw')
+
+
+def raw_inputs(rng, n=20_000):
+    return (rng.exponential(size=(n, 5)) * FEATURE_SCALES).astype(np.float32)
+
+
+def keras_model(path, outputs=1, activation='sigmoid'):
+    keras = pytest.importorskip('keras')
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([keras.Input(shape=(5,)), keras.layers.Dense(16, activation='tanh'),
+                              keras.layers.Dense(8, activation='selu'), keras.layers.Dropout(0.2),
+                              keras.layers.Dense(outputs, activation=activation)])
+    model.save(path)
+    return model
+
+
+@pytest.mark.parametrize('outputs, activation', [(1, 'sigmoid'), (4, 'softmax')])
+def test_matches_keras(tmp_path, outputs, activation):
+    path = str(tmp_path / 'model_1_b.keras')
+    model = keras_model(path, outputs, activation)
+    X = np.random.default_rng(0).normal(size=(512, 5)).astype(np.float32)
+    bundle = export_keras_model(path)
+    assert bundle == bundle_path_for(path)
+    actual = NumpyMLP.load(bundle).predict(X)
+    np.testing.assert_allclose(actual, model.predict(X, verbose=0), atol=1e-5)
+    max_diff, passed = verify_bundle(path, X)
+    assert passed and max_diff < 1e-5
+
+
+@pytest.mark.parametrize('precision', ['float32', 'float16', 'int8'])
+def test_save_load_round_trip(tmp_path, precision):
+    rng = np.random.default_rng(1)
+    model = raw_model(rng)
+    model = model if precision == 'float32' else model.quantize(precision)
+    path = str(tmp_path / f'model.{precision}.npz')
+    model.save(path)
+    loaded = NumpyMLP.load(path)
+    assert loaded.precision == precision
+    assert [W.dtype for W, _, _ in loaded.layers] == [W.dtype for W, _, _ in model.layers]
+    assert loaded.weight_bytes() == model.weight_bytes()
+    X = raw_inputs(rng, 256)
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+
+
+@pytest.mark.parametrize('precision, max_diff', [('float16', 1e-3), ('int8', 0.03)])
+def test_quantized_outputs_stay_close_on_raw_features(precision, max_diff):
+    rng = np.random.default_rng(2)
+    model, X = raw_model(rng), raw_inputs(rng)
+    quantized = model.quantize(precision)
+    assert quantized.precision == precision and quantized.layers[0][0].dtype == np.float32
+    assert quantized.weight_bytes() < model.weight_bytes()
+    out, out_q = model.predict(X)[:, 0], quantized.predict(X)[:, 0]
+    assert np.abs(out - out_q).max() < max_diff
+    # Seules les lignes proches du seuil peuvent changer de décision
+    changed = (out > 0.5) != (out_q > 0.5)
+    assert not changed[np.abs(out - 0.5) > max_diff].any()
+    assert changed.mean() < 0.01
+
+
+def test_quantized_multiclass_decisions_agree():
+    rng = np.random.default_rng(3)
+    model, X = raw_model(rng, outputs=7, activation='softmax'), raw_inputs(rng)
+    out, out_q = model.predict(X), model.quantize('int8').predict(X)
+    assert np.abs(out - out_q).max() < 0.08
+    top2 = np.sort(out, axis=1)[:, -2:]
+    changed = out.argmax(axis=1) != out_q.argmax(axis=1)
+    assert not changed[top2[:, 1] - top2[:, 0] > 0.16].any()
+    assert changed.mean() < 0.01
+
+
+def test_quantize_rejects_quantized_models():
+    model = raw_model(np.random.default_rng(4))
+    with pytest.raises(ValueError):
+        model.quantize('int8').quantize('float16')
+    with pytest.raises(ValueError):
+        model.quantize('int4')
+
+
+def test_verify_exit_code(tmp_path):
+    path = str(tmp_path / 'model_1_b.keras')
+    keras_model(path)
+    export_keras_model(path)
+    data = str(tmp_path / 'features.csv')
+    pd.DataFrame(np.random.default_rng(5).normal(size=(64, 5))).to_csv(data, index=False)
+    assert main(['verify', data, path]) == 0
+    # Le bundle ne correspond plus au modèle Keras
+    model = NumpyMLP.load(bundle_path_for(path))
+    model.layers[-1][1][:] += 0.5
+    model.save(bundle_path_for(path))
+    assert main(['verify', data, path]) == 1
+
+
+@pytest.mark.parametrize('delta, code', [(-0.001, 0), (-0.02, 1)])
+def test_validate_exit_code(tmp_path, monkeypatch, delta, code):
+    """Échec dès qu'un modèle perd plus que --max-accuracy-drop (0.005 par défaut)"""
+    def report(df, precision, task, backend, label_column):
+        assert (precision, task, label_column) == ('int8', 'binary', 'Label') and 'Label' in df
+        row = {'accuracy': 0.99, 'accuracy_quantized': 0.99 + delta, 'accuracy_delta': delta,
+               'agreement': 0.99, 'original_bytes': 400, 'quantized_bytes': 100}
+        return [dict(row, model='Model 1'), dict(row, model='Vote majoritaire', accuracy_delta=0.0)]
+
+    monkeypatch.setattr(numpy_mlp, 'validate_quantized', report)
+    data = str(tmp_path / 'labelled.csv')
+    pd.DataFrame({' Flow Duration': [1.0], ' Label': ['BENIGN']}).to_csv(data, index=False)
+    assert main(['validate', data, '--output', str(tmp_path / 'report.json')]) == code
+    assert (tmp_path / 'report.json').exists()
@@ -0,0 +1,179 @@
+"""ResultCache : LRU mémoire puis disque, invalidation par version d'artefacts, clés des routes combinées."""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import pytest
+from result_cache import ResultCache
+
+VERSION = 'a' * 64
+
+
+def result(i, size=100):
+    return {'id': i, 'payload': 'x' * size}
+
+
+def entry_size(i, size=100):
+    return len(json.dumps(result(i, size)).encode())
+
+
+def disk_entries(cache):
+    return sorted(name for name in os.listdir(cache.cache_dir) if name.endswith('.json'))
+
+
+def test_memory_eviction_falls_back_to_disk(tmp_path):
+    cache = ResultCache(str(tmp_path), max_memory_bytes=2 * entry_size(0), max_disk_bytes=1 << 20)
+    keys = [cache.key(f'digest-{i}', 'predict', VERSION) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, result(i), VERSION)
+    # La plus ancienne quitte la mémoire mais reste sur disque
+    assert list(cache.memory) == keys[1:] and cache.memory_bytes == 2 * entry_size(0)
+    assert cache.get(keys[0], VERSION) == result(0)
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['memory_hits'], stats['evictions']) == (1, 0, 2)
+    # Relue depuis le disque, elle redevient la plus récente en mémoire
+    assert list(cache.memory) == [keys[2], keys[0]]
+    assert cache.get(keys[0], VERSION) == result(0) and cache.stats()['memory_hits'] == 1
+
+
+def test_disk_eviction_removes_the_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_memory_bytes=0, max_disk_bytes=3 * entry_size(0))
+    keys = [cache.key(f'digest-{i}', 'predict', VERSION) for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, result(i), VERSION)
+        os.utime(cache._path(key, VERSION), (1000 + i, 1000 + i))
+    # Un accès rafraîchit la date : la première entrée n'est plus la plus ancienne
+    assert cache.get(keys[0], VERSION) == result(0)
+    cache.put(keys[3], result(3), VERSION)
+    assert cache.get(keys[1], VERSION) is None
+    assert [cache.get(key, VERSION) for key in (keys[0], keys[2], keys[3])] == [result(0), result(2), result(3)]
+    stats = cache.stats()
+    assert stats['disk_entries'] == 3 and stats['disk_bytes'] <= cache.max_disk_bytes
+    assert stats['memory_entries'] == 0 and stats['evictions'] == 1
+
+
+def test_entries_larger_than_memory_stay_on_disk(tmp_path):
+    cache = ResultCache(str(tmp_path), max_memory_bytes=entry_size(0), max_disk_bytes=1 << 20)
+    small, large = cache.key('small', 'predict'), cache.key('large', 'predict')
+    cache.put(small, result(0))
+    cache.put(large, result(1, size=1000))
+    assert list(cache.memory) == [small] and cache.stats()['evictions'] == 0
+    assert cache.get(large) == result(1, size=1000)
+    assert cache.stats()['disk_hits'] == 1 and list(cache.memory) == [small]
+
+
+def test_put_returns_the_json_form(tmp_path):
+    np = pytest.importorskip('numpy')
+    cache = ResultCache(str(tmp_path))
+    stored = cache.put(cache.key('digest', 'predict'), {'stats': np.int64(3), 'scores': np.array([0.5, 1.0])})
+    assert stored == {'stats': 3, 'scores': [0.5, 1.0]}
+    assert type(stored['stats']) is int
+
+
+def test_set_version_purges_the_previous_version(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    old, new = 'b' * 64, 'c' * 64
+    cache.set_version('predict', old)
+    stale = cache.key('digest', 'predict', old)
+    cache.put(stale, result(0), old)
+    # Autre route, autre version : non concernée
+    cache.set_version('predict-multiclass', VERSION)
+    kept = cache.key('digest', 'predict-multiclass', VERSION)
+    cache.put(kept, result(1), VERSION)
+
+    cache.set_version('predict', old)
+    assert cache.get(stale, old) == result(0)
+    cache.set_version('predict', new)
+    assert stale not in cache.memory and disk_entries(cache) == [f"{VERSION[:16]}-{kept}.json"]
+    assert cache.get(stale, old) is None and cache.get(kept, VERSION) == result(1)
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_invalidate_everything(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    for i, version in enumerate(['', VERSION]):
+        cache.put(cache.key(f'digest-{i}', 'predict', version), result(i), version)
+    cache.invalidate()
+    stats = cache.stats()
+    assert (stats['memory_entries'], stats['memory_bytes'], stats['disk_entries']) == (0, 0, 0)
+
+
+def test_hit_ratio(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.stats()['hit_ratio'] == 0.0
+    key = cache.key('digest', 'predict')
+    assert cache.get(key) is None
+    cache.put(key, result(0))
+    cache.get(key)
+    cache.get(key)
+    assert cache.stats()['hit_ratio'] == round(2 / 3, 4)
+
+
+def test_keys_depend_on_every_option():
+    base = ResultCache.key('digest', 'predict-combined', 'm1', binary_version='b1', max_rows=10)
+    assert base == ResultCache.key('digest', 'predict-combined', 'm1', max_rows=10, binary_version='b1')
+    assert len({base,
+                ResultCache.key('other', 'predict-combined', 'm1', binary_version='b1', max_rows=10),
+                ResultCache.key('digest', 'predict-pcap-multiclass', 'm1', binary_version='b1', max_rows=10),
+                ResultCache.key('digest', 'predict-combined', 'm2', binary_version='b1', max_rows=10),
+                ResultCache.key('digest', 'predict-combined', 'm1', binary_version='b2', max_rows=10),
+                ResultCache.key('digest', 'predict-combined', 'm1', binary_version='b1', max_rows=20)}) == 6
+
+
+# Routes de l'application dans un processus séparé : app.py applique eventlet.monkey_patch()
+ROUTES = textwrap.dedent('''
+    import io, json, os, sys
+    sys.path.insert(0, sys.argv[1])
+    os.chdir(sys.argv[2])
+    import app
+
+    class Detector:
+        versions = {'binary': 'b' * 64, 'multiclass': 'm' * 64}
+        def artifact_version(self, task):
+            return self.versions[task]
+
+    detector = Detector()
+    computed = []
+
+    def compute(*args, **kwargs):
+        computed.append(1)
+        stats = {'total': 1, 'malicious': 0}
+        return {'charts': [], 'predictions': [], 'stats': stats, 'histograms': None, 'multiclass': None,
+                'flagged': [], 'flagged_truncated': False, 'binary': {'predictions': [], 'stats': stats},
+                'ingest': {}}
+
+    app.get_detector = lambda: detector
+    app.stream_predict = compute
+    app.ingest_pcap = compute
+    client = app.app.test_client()
+
+    def post(url, filename):
+        response = client.post(url, data={'file': (io.BytesIO(b'same upload'), filename)},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return len(computed)
+
+    counts = {}
+    for url, filename in [('/predict-combined', 'flows.csv'), ('/predict-pcap?multiclass=1', 'capture.pcap')]:
+        computed.clear()
+        detector.versions = {'binary': 'b' * 64, 'multiclass': 'm' * 64}
+        seen = [post(url, filename), post(url, filename)]
+        detector.versions['binary'] = 'c' * 64
+        seen += [post(url, filename), post(url, filename)]
+        detector.versions['multiclass'] = 'n' * 64
+        seen.append(post(url, filename))
+        counts[url] = seen
+    print(json.dumps(counts))
+''')
+
+
+def test_combined_routes_key_on_both_artifact_versions(tmp_path):
+    pytest.importorskip('flask_socketio')
+    done = subprocess.run([sys.executable, '-W', 'ignore', '-c', ROUTES,
+                           os.path.dirname(os.path.abspath(__file__)), str(tmp_path)],
+                          capture_output=True, text=True, timeout=120)
+    assert done.returncode == 0, done.stderr
+    counts = json.loads(done.stdout.splitlines()[-1])
+    # Succès au second envoi ; un modèle binaire ou multiclasse modifié relance le calcul
+    assert counts == {'/predict-combined': [1, 1, 2, 2, 3], '/predict-pcap?multiclass=1': [1, 1, 2, 2, 3]}
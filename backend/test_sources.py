@@ -0,0 +1,311 @@
+"""Sources temps réel : micro-lots de LiveFeed, FlowQueue (politiques de débordement), URI des sources, paquets agrégés en flux."""
+import threading
+import time
+import numpy as np
+import pytest
+from features import FeaturePipeline
+from flows import ACK, FIN, FLOW_FEATURES, FLOW_METADATA, RST, SYN
+from sources import (FlowQueue, LiveFeed, PacketSource, PipeSource, Source, SyntheticSource, TailSource,
+                     TcpSource, UdpSource, create_source)
+
+
+class IdleSource(Source):
+    """Source sans émission : les tests remplissent la file directement"""
+
+    name = 'idle'
+
+    def run(self, emit, stopped):
+        stopped.wait()
+
+
+class ListSource(Source):
+    """Émet des lots fixés puis attend l'arrêt"""
+
+    name = 'list'
+
+    def __init__(self, batches):
+        super().__init__()
+        self.batches = batches
+
+    def run(self, emit, stopped):
+        for batch in self.batches:
+            self.records += len(batch)
+            emit(batch)
+        stopped.wait()
+
+
+def records(n, start=0):
+    return [{'id': i} for i in range(start, start + n)]
+
+
+def test_full_batch_leaves_without_waiting():
+    feed = LiveFeed(IdleSource(), batch_size=4, max_latency=10)
+    feed.queue.put_many(records(10))
+    started = time.monotonic()
+    batch, enqueued_at = feed.get_batch(timeout=0)
+    assert time.monotonic() - started < 1
+    assert [r['id'] for r in batch] == [0, 1, 2, 3] and len(enqueued_at) == 4
+    assert feed.batch_stats()['flush_on_size'] == 1
+
+
+def test_partial_batch_waits_for_the_deadline():
+    feed = LiveFeed(IdleSource(), batch_size=100, max_latency=0.2)
+    feed.queue.put_many(records(3))
+    started = time.monotonic()
+    batch, _ = feed.get_batch(timeout=0)
+    assert 0.15 <= time.monotonic() - started < 2
+    assert len(batch) == 3
+    stats = feed.batch_stats()
+    assert (stats['flush_on_size'], stats['flush_on_deadline']) == (0, 1)
+    assert stats['fill_ratio'] == 0.03
+
+
+def test_batch_fills_before_the_deadline():
+    feed = LiveFeed(IdleSource(), batch_size=6, max_latency=5)
+    feed.queue.put_many(records(2))
+    threading.Timer(0.05, feed.queue.put_many, args=(records(4, start=2),)).start()
+    started = time.monotonic()
+    batch, _ = feed.get_batch(timeout=0)
+    assert time.monotonic() - started < 2
+    assert [r['id'] for r in batch] == list(range(6))
+
+
+def test_deadline_counts_from_the_oldest_record():
+    feed = LiveFeed(IdleSource(), batch_size=100, max_latency=0.2)
+    feed.queue.put_many(records(1))
+    time.sleep(0.25)
+    started = time.monotonic()
+    assert len(feed.get_batch(timeout=0)[0]) == 1
+    assert time.monotonic() - started < 0.1
+
+
+def test_batching_stats_in_live_stats():
+    feed = LiveFeed(IdleSource(), maxsize=50, batch_size=8, max_latency=0.01)
+    feed.queue.put_many(records(20))
+    sizes = [len(feed.get_batch(timeout=0)[0]) for _ in range(3)]
+    assert sizes == [8, 8, 4]
+    stats = feed.stats()['batching']
+    assert stats['batches'] == 3 and stats['records'] == 20
+    assert stats['mean_batch_size'] == 6.67
+    assert (stats['batch_size'], stats['queue_size'], stats['max_latency_ms']) == (8, 50, 10)
+    assert feed.stats()['queue']['depth'] == 0
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        LiveFeed(IdleSource(), batch_size=0)
+
+
+def test_empty_queue_times_out():
+    queue = FlowQueue(10)
+    started = time.monotonic()
+    assert queue.get_batch(5, timeout=0.1, max_latency=1) == ([], [])
+    assert 0.05 <= time.monotonic() - started < 1
+
+
+def ids(queue):
+    return [record['id'] for _, record in queue.items]
+
+
+def test_block_policy_waits_then_refuses():
+    queue = FlowQueue(3, policy='block')
+    started = time.monotonic()
+    assert queue.put_many(records(5), timeout=0.1) == 3
+    assert 0.05 <= time.monotonic() - started < 1
+    stats = queue.stats()
+    assert (stats['depth'], stats['accepted'], stats['rejected'], stats['dropped']) == (3, 3, 2, 2)
+    assert stats['blocked_time'] >= 0.05 and stats['drop_ratio'] == 0.4
+
+
+def test_block_policy_resumes_when_consumed():
+    queue = FlowQueue(2, policy='block')
+    queue.put_many(records(2))
+    threading.Timer(0.05, queue.get_batch, args=(1,)).start()
+    assert queue.put_many(records(1, start=2), timeout=5) == 1
+    assert ids(queue) == [1, 2]
+    assert queue.stats()['dropped'] == 0
+
+
+def test_block_policy_gives_up_when_closed():
+    queue = FlowQueue(1, policy='block')
+    queue.put_many(records(1))
+    threading.Timer(0.05, queue.close).start()
+    assert queue.put_many(records(2, start=1)) == 0
+    assert queue.stats()['rejected'] == 2
+
+
+def test_drop_oldest_policy_keeps_the_newest():
+    queue = FlowQueue(3, policy='drop_oldest')
+    assert queue.put_many(records(5)) == 5
+    assert ids(queue) == [2, 3, 4]
+    stats = queue.stats()
+    assert (stats['dropped_oldest'], stats['rejected'], stats['dropped'], stats['max_depth']) == (2, 0, 2, 3)
+
+
+def test_sample_policy_admits_below_half_and_refuses_when_full():
+    # maxsize 2 : admission certaine sous la mi-file (1), puis probabilité (2 - 1) / (2 - 1)
+    queue = FlowQueue(2, policy='sample')
+    assert queue.put_many(records(5)) == 2
+    assert ids(queue) == [0, 1]
+    stats = queue.stats()
+    assert (stats['sampled_out'], stats['rejected'], stats['dropped']) == (3, 0, 3)
+
+
+def test_sample_policy_is_reproducible_with_a_seed():
+    queues = [FlowQueue(100, policy='sample', seed=7) for _ in range(2)]
+    for queue in queues:
+        queue.put_many(records(300))
+    first, second = (ids(queue) for queue in queues)
+    assert first == second
+    assert first[:50] == list(range(50)) and 50 < len(first) <= 100
+    stats = queues[0].stats()
+    assert stats['accepted'] + stats['sampled_out'] == 300 == stats['received']
+
+
+def test_get_batch_returns_what_is_queued_without_latency():
+    queue = FlowQueue(10)
+    queue.put_many(records(3))
+    batch, enqueued_at = queue.get_batch(5, timeout=5)
+    assert [r['id'] for r in batch] == [0, 1, 2] and len(enqueued_at) == 3
+    assert queue.stats()['consumed'] == 3
+
+
+def test_get_batch_on_a_closed_queue_does_not_wait():
+    queue = FlowQueue(10)
+    queue.close()
+    started = time.monotonic()
+    assert queue.get_batch(5, timeout=5, max_latency=5) == ([], [])
+    assert time.monotonic() - started < 1
+    assert queue.put_many(records(2)) == 0
+
+
+def test_invalid_queue_configuration():
+    with pytest.raises(ValueError):
+        FlowQueue(10, policy='lifo')
+    with pytest.raises(ValueError):
+        FlowQueue(0)
+
+
+def test_create_source_parses_uris():
+    synthetic = create_source('synthetic://?rate=250', generate=dict)
+    assert isinstance(synthetic, SyntheticSource) and synthetic.rate == 250
+    assert create_source('synthetic', generate=dict).rate == pytest.approx(1 / 3)
+    udp = create_source('udp://0.0.0.0:9600')
+    assert isinstance(udp, UdpSource) and udp.address == ('0.0.0.0', 9600)
+    assert create_source('udp://').address == ('127.0.0.1', 9500)
+    tcp = create_source('tcp://127.0.0.1:9777')
+    assert isinstance(tcp, TcpSource) and tcp.address == ('127.0.0.1', 9777)
+    assert create_source('tcp').address == ('127.0.0.1', 9501)
+    pipe = create_source('pipe:///tmp/ids_flux')
+    assert isinstance(pipe, PipeSource) and pipe.path == '/tmp/ids_flux'
+    tail = create_source('tail:///var/log/ids/flux.ndjson?from_start=1')
+    assert isinstance(tail, TailSource) and tail.path == '/var/log/ids/flux.ndjson' and tail.from_start
+    assert not create_source('tail:///var/log/ids/flux.ndjson').from_start
+
+
+def test_create_source_rejects_unknown_specs():
+    with pytest.raises(ValueError):
+        create_source('kafka://broker:9092')
+    with pytest.raises(ValueError):
+        create_source('synthetic://')
+
+
+def packet(ts, src, dst, sport, dport, flags=ACK, length=100, proto=6):
+    return {'ts': ts, 'src': src, 'dst': dst, 'sport': sport, 'dport': dport, 'proto': proto,
+            'length': length, 'header_length': 20, 'flags': flags, 'window': 8192}
+
+
+def handshake(ts, client, server, port):
+    """Connexion TCP close par FIN dans les deux sens : évincée dès le dernier paquet"""
+    return [packet(ts, client, server, port, 443, SYN, 0),
+            packet(ts + 0.01, server, client, 443, port, SYN | ACK, 0),
+            packet(ts + 0.02, client, server, port, 443, ACK, 300),
+            packet(ts + 0.03, server, client, 443, port, ACK, 1200),
+            packet(ts + 0.04, client, server, port, 443, FIN | ACK, 0),
+            packet(ts + 0.05, server, client, 443, port, FIN | ACK, 0)]
+
+
+def drain(feed, expected, timeout=5):
+    flows, deadline = [], time.monotonic() + timeout
+    while len(flows) < expected and time.monotonic() < deadline:
+        flows += feed.get_batch(timeout=0.1)[0]
+    return flows
+
+
+def test_closed_connections_are_emitted_as_flows():
+    events = handshake(1000.0, '10.0.0.1', '10.0.0.2', 40000) + handshake(1000.5, '10.0.0.3', '10.0.0.2', 40001)
+    source = PacketSource(ListSource([events[:4], events[4:]]), expire_interval=0.05)
+    feed = LiveFeed(source, batch_size=16, max_latency=0.01).start()
+    try:
+        flows = drain(feed, 2)
+    finally:
+        feed.stop()
+    assert len(flows) == 2
+    flow = next(f for f in flows if f['Source IP'] == '10.0.0.1')
+    assert set(FLOW_METADATA + FLOW_FEATURES) <= set(flow)
+    assert (flow['Source Port'], flow['Destination IP'], flow['Destination Port']) == (40000, '10.0.0.2', 443)
+    assert flow['Total Fwd Packets'] == 3 and flow['Total Backward Packets'] == 3
+    assert flow['Fwd Packets Length Total'] == 300 and flow['Bwd Packets Length Total'] == 1200
+    assert flow['Flow Duration'] == pytest.approx(50_000)
+    assert flow['Timestamp'] == '1970-01-01T00:16:40.000000'
+    stats = source.stats()
+    assert (stats['packets'], stats['records'], stats['flow_table']['active_flows']) == (12, 2, 0)
+
+
+def test_idle_flows_expire_without_new_packets():
+    source = PacketSource(ListSource([[packet(50.0, '10.0.0.1', '10.0.0.9', 5353, 53, 0, 40, proto=17)]]),
+                          expire_interval=0.05, idle_timeout=0.3)
+    feed = LiveFeed(source, batch_size=16, max_latency=0.01).start()
+    try:
+        time.sleep(0.1)
+        assert feed.get_batch(timeout=0)[0] == []
+        flows = drain(feed, 1)
+    finally:
+        feed.stop()
+    assert [f['Destination Port'] for f in flows] == [53]
+    assert flows[0]['Protocol'] == 17
+
+
+def test_active_flows_are_flushed_on_stop():
+    source = PacketSource(ListSource([[packet(10.0, '::1', '::2', 1000, 80)]]), expire_interval=0.05)
+    feed = LiveFeed(source, batch_size=16, max_latency=0.01).start()
+    time.sleep(0.1)
+    # Arrêt de la source seule : la file reste ouverte pour recevoir les flux vidés
+    feed.stopped.set()
+    feed.thread.join(2)
+    flows = feed.get_batch(timeout=0)[0]
+    assert [(f['Source IP'], f['Destination IP']) for f in flows] == [('::1', '::2')]
+
+
+def test_invalid_packets_are_counted():
+    source = PacketSource(ListSource([]))
+    assert source.add_packets([{'ts': 1.0, 'src': 'a'}]) is None
+    assert source.add_packets([dict(packet(1.0, 'a', 'b', 1, 2), sport='x')]) is None
+    source.add_packets([packet(1.0, 'a', 'b', 1, 2, RST)])
+    assert len(source.table.expire()) == 1
+    assert source.stats()['invalid_packets'] == 2
+
+
+def test_flows_feed_the_scoring_pipeline():
+    """Les flux émis ont les colonnes brutes attendues par PacketDetector.score_records"""
+    source = PacketSource(ListSource([]))
+    source.add_packets(handshake(1000.0, '10.0.0.1', '10.0.0.2', 40000))
+    flows = source.table.expire()
+    emitted = []
+    source._emit_flows(emitted.extend, flows)
+    features = ['Flow Duration', 'Bwd Packets/s', 'Packet Length Std', 'Total Fwd Packets']
+    selected = ['Combined_Importance_Score', 'Init Fwd Win Bytes', 'Bwd_Fwd_Product']
+    pipeline = FeaturePipeline(features, [0.4, 0.3, 0.2, 0.1], selected)
+    X = pipeline.matrix_from_records(emitted)
+    assert X.shape == (1, len(pipeline.columns)) and np.isfinite(X).all()
+    assert X[0, pipeline.columns.index('Total Fwd Packets')] == 3
+    assert X[0, pipeline.columns.index('Init Fwd Win Bytes')] == 8192
+
+
+def test_create_source_packets_option():
+    source = create_source('tcp://127.0.0.1:9777?packets=1&idle_timeout=30&max_flows=1024')
+    assert isinstance(source, PacketSource)
+    assert source.inner.address == ('127.0.0.1', 9777)
+    assert source.table.idle_timeout == 30e6 and source.table.max_flows == 1024
+    with pytest.raises(ValueError):
+        create_source('synthetic://?packets=1', generate=dict)
@@ -0,0 +1,196 @@
+"""Scoring par morceaux : mêmes statistiques en CSV, Parquet et Arrow, lecture colonnaire, flux ligne à ligne."""
+import gzip
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+from columnar import check_columns, iter_feature_batches
+from detection import PacketDetector
+from ensemble import EnsembleExecutor
+from features import COMBINED_SCORE, FeaturePipeline
+from numpy_mlp import NumpyMLP
+from streaming import stream_predict, stream_rows
+
+pa = pytest.importorskip('pyarrow')
+
+FEATURES = ['Flow Duration', 'Bwd Packets/s', 'Packet Length Std']
+SELECTED = [COMBINED_SCORE, 'Flow Duration', 'Total Fwd Packets']
+FEATURES_M = ['Total Fwd Packets', 'Packet Length Std']
+CLASSES = ['Bot', 'DDoS', 'PortScan']
+N_ROWS = 1000
+FORMATS = ['csv', 'parquet', 'feather', 'ipc']
+
+
+def mlp(rng, n_in, outputs, activation):
+    return NumpyMLP([(rng.normal(size=(n_in, 8)), np.zeros(8), 'tanh'),
+                     (rng.normal(size=(8, outputs)) * 2, np.zeros(outputs), activation)])
+
+
+@pytest.fixture(scope='module')
+def detector():
+    rng = np.random.default_rng(0)
+    detector = PacketDetector()
+    detector.pipeline = FeaturePipeline(FEATURES, [0.5, 0.3, 0.2], SELECTED)
+    detector.ensemble = EnsembleExecutor({f'Model {i}': mlp(rng, len(SELECTED), 1, 'sigmoid') for i in range(1, 4)})
+    detector.features_m = FEATURES_M
+    detector.ensemble_m = EnsembleExecutor({f'Model {i}': mlp(rng, len(FEATURES_M), len(CLASSES), 'softmax')
+                                            for i in range(1, 4)}, task='multiclass')
+    detector.label_encoder = LabelEncoder().fit(CLASSES)
+    return detector
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        # Noms CICIDS avec espaces : résolus après strip
+        ' Flow Duration': rng.normal(size=N_ROWS),
+        'Bwd Packets/s': rng.normal(size=N_ROWS),
+        ' Packet Length Std': rng.normal(size=N_ROWS),
+        'Total Fwd Packets': rng.normal(size=N_ROWS),
+        'Unused': rng.normal(size=N_ROWS)
+    })
+    df.loc[5, 'Bwd Packets/s'] = np.nan
+    return df
+
+
+def write_files(frame, directory):
+    """Le même DataFrame dans chaque format d'upload"""
+    import pyarrow.feather as feather # type: ignore
+    import pyarrow.parquet as pq # type: ignore
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    paths = {ext: str(directory / f'flows.{ext}') for ext in FORMATS}
+    frame.to_csv(paths['csv'], index=False)
+    # Groupes de lignes plus petits que les morceaux : redécoupés à la lecture
+    pq.write_table(table, paths['parquet'], row_group_size=300)
+    feather.write_feather(table, paths['feather'], chunksize=400)
+    with pa.ipc.new_stream(paths['ipc'], table.schema) as writer:
+        writer.write_table(table, max_chunksize=250)
+    return paths
+
+
+@pytest.fixture(scope='module')
+def files(frame, tmp_path_factory):
+    return write_files(frame, tmp_path_factory.mktemp('uploads'))
+
+
+def full_matrix(frame, detector, task):
+    frame = frame.rename(columns=str.strip)
+    return frame[detector.required_columns(task)].fillna(0).to_numpy(dtype=np.float32)
+
+
+@pytest.mark.parametrize('ext', FORMATS)
+def test_batches_read_only_the_requested_columns(files, frame, detector, ext):
+    columns = detector.required_columns('two-stage')
+    batches = list(iter_feature_batches(files[ext], ext, columns, 128))
+    assert max(len(X) for X in batches) <= 128
+    np.testing.assert_array_equal(np.concatenate(batches), full_matrix(frame, detector, 'two-stage'))
+
+
+@pytest.mark.parametrize('ext', FORMATS)
+def test_missing_columns_are_rejected_from_the_schema(files, ext):
+    with pytest.raises(ValueError, match='Destination Port'):
+        check_columns(files[ext], ext, ['Flow Duration', 'Destination Port'])
+    check_columns(files[ext], ext, ['Flow Duration', 'Total Fwd Packets'])
+
+
+@pytest.mark.parametrize('task', ['binary', 'multiclass', 'two-stage'])
+def test_stream_predict_stats_match_across_formats(files, frame, detector, task):
+    reference = stream_predict(files['csv'], 'csv', detector, task=task, chunk_size=N_ROWS)
+    assert reference['stats']['total'] == N_ROWS
+    for ext in FORMATS:
+        seen = []
+        response = stream_predict(files[ext], ext, detector, task=task, chunk_size=128, progress=seen.append)
+        assert response == reference
+        assert seen[-1] == N_ROWS and seen == sorted(seen)
+
+
+def test_stream_predict_matches_scoring_the_whole_file(files, frame, detector):
+    result = detector.score_matrix(full_matrix(frame, detector, 'binary'))
+    stats = stream_predict(files['parquet'], 'parquet', detector, chunk_size=100)['stats']
+    assert stats['malicious'] == int(result.majority_vote().sum())
+    assert 0 < stats['malicious'] < N_ROWS
+
+
+def test_stream_predict_rejects_unknown_tasks(files, detector):
+    with pytest.raises(ValueError):
+        stream_predict(files['csv'], 'csv', detector, task='cascade')
+
+
+def ndjson(pieces):
+    return [json.loads(line) for line in b''.join(pieces).decode().splitlines()]
+
+
+def test_ndjson_pages_are_framed_by_header_and_summary(files, frame, detector):
+    result = detector.score_matrix(full_matrix(frame, detector, 'binary'))
+    mimetype, pieces = stream_rows(files['csv'], 'csv', detector, offset=250, limit=300, chunk_size=128)
+    assert mimetype == 'application/x-ndjson'
+    lines = ndjson(pieces)
+    header, rows, summary = lines[0], lines[1:-1], lines[-1]
+    assert header['type'] == 'header' and (header['offset'], header['limit']) == (250, 300)
+    assert header['columns'] == ['row', 'prediction', 'malicious_probability', 'Model 1', 'Model 2', 'Model 3']
+    assert [row['row'] for row in rows] == list(range(250, 550))
+    assert [row['prediction'] for row in rows] == [
+        ('Benign', 'Malicious')[v] for v in result.majority_vote()[250:550]]
+    np.testing.assert_allclose([row['Model 2'] for row in rows], result.scores[250:550, 1], atol=1e-4)
+    assert summary['type'] == 'summary'
+    assert (summary['rows'], summary['offset'], summary['next_offset']) == (300, 250, 550)
+    assert summary['stats']['malicious'] == int(result.majority_vote()[250:550].sum())
+
+    last = ndjson(stream_rows(files['csv'], 'csv', detector, offset=900, limit=300, chunk_size=128)[1])
+    assert len(last) == 102 and last[-1]['next_offset'] is None
+
+
+def test_summary_only_and_on_complete(files, detector):
+    completed = []
+    lines = ndjson(stream_rows(files['parquet'], 'parquet', detector, summary_only=True,
+                               on_complete=completed.append)[1])
+    assert [line['type'] for line in lines] == ['header', 'summary']
+    # Flux complet : la réponse de stream_predict est remise pour le cache
+    assert completed == [stream_predict(files['parquet'], 'parquet', detector)]
+    ndjson(stream_rows(files['parquet'], 'parquet', detector, limit=10, on_complete=completed.append)[1])
+    assert len(completed) == 1
+
+
+@pytest.mark.parametrize('ext', FORMATS)
+def test_missing_columns_fail_before_the_first_byte(frame, detector, tmp_path, ext):
+    path = write_files(frame.drop(columns=['Total Fwd Packets']), tmp_path)[ext]
+    with pytest.raises(ValueError, match='Total Fwd Packets'):
+        stream_rows(path, ext, detector)
+
+
+def test_invalid_row_parameters(files, detector):
+    for kwargs in ({'offset': -1}, {'limit': 0}, {'fmt': 'xml'}, {'compression': 'zstd'},
+                   {'task': 'two-stage'}):
+        with pytest.raises(ValueError):
+            stream_rows(files['csv'], 'csv', detector, **kwargs)
+
+
+@pytest.mark.parametrize('compression', [None, 'zstd'])
+def test_arrow_stream_reads_back(files, frame, detector, compression):
+    if compression and not pa.Codec.is_available(compression):
+        pytest.skip(f"{compression} indisponible dans pyarrow")
+    result = detector.score_matrix(full_matrix(frame, detector, 'multiclass'), 'multiclass')
+    mimetype, pieces = stream_rows(files['feather'], 'feather', detector, task='multiclass', fmt='arrow',
+                                   compression=compression, chunk_size=128)
+    assert mimetype == 'application/vnd.apache.arrow.stream'
+    reader = pa.ipc.open_stream(b''.join(pieces))
+    header = json.loads(reader.schema.metadata[b'header'])
+    assert header['classes'] == CLASSES and header['task'] == 'multiclass'
+    table = reader.read_all()
+    assert table.num_rows == N_ROWS
+    assert table.column_names == ['row', 'prediction', 'confidence', 'Model 1', 'Model 2', 'Model 3']
+    assert table.column('row').to_pylist() == list(range(N_ROWS))
+    predicted = [CLASSES[i] for i in result.majority_vote()]
+    assert table.column('prediction').to_pylist() == predicted
+    assert table.column('Model 3').to_pylist() == [CLASSES[i] for i in result.scores[:, 2]]
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'arrow'])
+def test_gzip_round_trip(files, detector, fmt):
+    plain = b''.join(stream_rows(files['csv'], 'csv', detector, fmt=fmt, chunk_size=128)[1])
+    pieces = list(stream_rows(files['csv'], 'csv', detector, fmt=fmt, compression='gzip', chunk_size=128)[1])
+    assert len(pieces) > 2
+    assert gzip.decompress(b''.join(pieces)) == plain
@@ -0,0 +1,695 @@
+"""Pipeline d'entraînement reproductible, hors mémoire, tiré de preprocessing&training.ipynb.
+
+Chaque étape écrit ses sorties (tableaux .npy relus en mappage mémoire,
+méta-données JSON) dans CACHE_DIR/<étape>-<empreinte>/, l'empreinte couvrant
+sa configuration et celle des étapes dont elle dépend ; une étape déjà
+calculée est simplement relue :
+
+    dataset     lecture des Parquet CICIDS2017 par lots, colonnes en float32,
+                lignes incomplètes ou non finies écartées, sous-classes
+                fusionnées, doublons supprimés par hachage 64 bits des lignes
+                (aucun pd.concat des huit fichiers)
+    split       découpages stratifiés 75 / 10 / 15, binaire et multiclasse
+                (attaques seules), conservés sous forme d'indices
+    select      importances XGBoost au-dessus du seuil (select_features_by_threshold) ;
+                en binaire, seconde sélection après ajout du score combiné et
+                des interactions
+    matrices    matrices d'entraînement / validation / test ; en binaire via
+                features.FeaturePipeline, soit exactement le calcul du service
+    resample    SMOTE multiclasse sur l'entraînement (--smote ; calculé mais
+                inutilisé dans le notebook)
+
+Les cinq modèles binaires et les cinq multiclasses sont ensuite entraînés en
+parallèle, chacun dans un processus, par lots lus dans les matrices mappées ;
+un modèle dont la configuration n'a pas changé est repris du cache. Les
+fichiers écrits sont ceux que charge le backend :
+
+    feature_tuples_b.pkl  normalizer_b.pkl  selected_features_final_b.pkl
+    feature_tuples_m.pkl  label_encoder.pkl model_*_b.keras  model_*_m.keras
+
+    python train.py /data/cicids2017 --output-dir . --jobs 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import numpy as np
+import pandas as pd
+from features import COMBINED_SCORE, FeaturePipeline
+
+CACHE_DIR = os.path.join('reports', 'train', 'cache')
+REPORT_PATH = os.path.join('reports', 'train', 'latest.json')
+SEED = 314159
+CHUNK_ROWS = 262_144
+
+LABEL_COLUMN = 'Label'
+BENIGN = 'Benign'
+# Fusion des sous-classes du notebook ; DoS* et Web Attack* par préfixe
+# (le tiret des attaques web est mal encodé dans certains exports)
+LABEL_MERGE = {'DDoS': 'DoS', 'FTP-Patator': 'BruteForce', 'SSH-Patator': 'BruteForce'}
+LABEL_PREFIXES = ('DoS', 'Web Attack')
+
+SPLIT = (0.75, 0.10, 0.15)
+SELECTION_THRESHOLD = 0.01
+# create_new_features_3 ; create_new_features_2 est commentée dans le notebook
+ENGINEERED = ('Bwd_Fwd_Product',)
+# À incrémenter quand le calcul de features.FeaturePipeline change : sélection finale et matrices recalculées
+PIPELINE_FORMAT = 2
+XGB_PARAMS = dict(n_estimators=50, max_depth=3, learning_rate=0.1, subsample=0.8,
+                  colsample_bytree=0.8, reg_alpha=0.1, early_stopping_rounds=10)
+
+# Couches cachées (la première en tanh, les suivantes en selu)
+ARCHITECTURES_B = ((8, 4, 2), (16, 8, 4, 2), (32, 16, 8, 4, 2), (128, 32, 16, 8, 4, 2),
+                   (256, 128, 64, 32, 16, 8, 4, 2))
+ARCHITECTURES_M = ((16, 16), (16, 16, 16), (16, 16, 16, 16), (16, 16, 16, 16, 16),
+                   (32, 32, 32, 32, 32))
+EPOCHS = 250
+BATCH_SIZE = 1024
+EARLY_STOPPING = dict(monitor='val_accuracy', patience=8, restore_best_weights=True)
+REDUCE_LR = dict(monitor='val_accuracy', patience=4, min_lr=1e-07, factor=0.1)
+
+
+# --- Cache des étapes ---------------------------------------------------------
+
+class StageOutput:
+    """Sorties d'une étape : tableaux .npy mappés et méta-données"""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def array(self, name):
+        return np.load(self.file(f'{name}.npy'), mmap_mode='r')
+
+
+class StageCache:
+    """Étapes calculées une fois par configuration, sous `directory`"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    @staticmethod
+    def key(stage, config):
+        payload = json.dumps([stage, config], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def get(self, stage, config, compute):
+        """Relit l'étape si elle existe, sinon compute(répertoire) -> méta-données"""
+        key = self.key(stage, config)
+        path = os.path.join(self.directory, f'{stage}-{key}')
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            print(f"{stage}: cache {key}", file=sys.stderr)
+            return StageOutput(path, key)
+
+        print(f"{stage}: calcul {key}...", file=sys.stderr)
+        start = time.perf_counter()
+        tmp = f'{path}.tmp{os.getpid()}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        meta = compute(tmp) or {}
+        meta.update({'stage': stage, 'config': config, 'seconds': round(time.perf_counter() - start, 2)})
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Calculée entre-temps par un autre processus
+            shutil.rmtree(tmp, ignore_errors=True)
+        return StageOutput(path, key)
+
+
+def _open_array(directory, name, shape, dtype=np.float32):
+    return np.lib.format.open_memmap(os.path.join(directory, f'{name}.npy'), mode='w+',
+                                     dtype=dtype, shape=shape)
+
+
+def _save(directory, name, array):
+    np.save(os.path.join(directory, f'{name}.npy'), array)
+
+
+def gather(X, rows, columns=None, out=None, chunk_rows=CHUNK_ROWS, transform=None):
+    """X[rows][:, columns] par morceaux, éventuellement transformés, dans `out` (ou en mémoire)"""
+    rows = np.asarray(rows)
+    width = len(columns) if columns is not None else X.shape[1]
+    for start in range(0, len(rows), chunk_rows):
+        block = X[rows[start:start + chunk_rows]]
+        if columns is not None:
+            block = block[:, columns]
+        if transform is not None:
+            block = transform(block)
+        if out is None:
+            out = np.empty((len(rows), block.shape[1]), dtype=np.float32)
+        out[start:start + len(block)] = block
+    if out is None:
+        out = np.empty((0, width), dtype=np.float32)
+    return out
+
+
+# --- Jeu de données -----------------------------------------------------------
+
+def source_files(paths):
+    """Fichiers Parquet désignés (répertoires parcourus, ordre stable)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.parquet'))
+        else:
+            files.append(path)
+    if not files:
+        raise ValueError("Aucun fichier Parquet trouvé")
+    return files
+
+
+def merge_label(name):
+    name = str(name).strip()
+    if name in LABEL_MERGE:
+        return LABEL_MERGE[name]
+    for prefix in LABEL_PREFIXES:
+        if name.startswith(prefix):
+            return prefix
+    return name
+
+
+def build_dataset(directory, files, chunk_rows=CHUNK_ROWS):
+    """Lecture par lots, nettoyage et dédoublonnage ; écrit X.npy (float32) et y.npy (codes)"""
+    import pyarrow as pa # type: ignore
+    import pyarrow.parquet as pq # type: ignore
+
+    parquet_files = [pq.ParquetFile(path, memory_map=True) for path in files]
+    schema = parquet_files[0].schema_arrow
+    label_name = next((f.name for f in schema if f.name.strip() == LABEL_COLUMN), None)
+    if label_name is None:
+        raise ValueError(f"Colonne {LABEL_COLUMN} absente de {files[0]}")
+    columns = [f.name.strip() for f in schema
+               if f.name != label_name and (pa.types.is_integer(f.type) or pa.types.is_floating(f.type))]
+
+    total = sum(f.metadata.num_rows for f in parquet_files)
+    raw = _open_array(directory, 'X_raw', (total, len(columns)))
+    codes = np.empty(total, dtype=np.int16)
+    hashes = np.empty(total, dtype=np.uint64)
+    labels, n_rows, dropped = [], 0, 0
+
+    for path, parquet_file in zip(files, parquet_files):
+        by_stripped = {name.strip(): name for name in parquet_file.schema_arrow.names}
+        missing = [c for c in columns + [LABEL_COLUMN] if c not in by_stripped]
+        if missing:
+            raise ValueError(f"{path} : colonnes manquantes {', '.join(missing)}")
+        names = [by_stripped[c] for c in columns]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=names + [by_stripped[LABEL_COLUMN]]):
+            X = np.empty((batch.num_rows, len(names)), dtype=np.float32)
+            for j in range(len(names)):
+                X[:, j] = batch.column(j).to_numpy(zero_copy_only=False)
+
+            # Étiquettes : fusion appliquée au dictionnaire, pas ligne à ligne
+            encoded = batch.column(len(names)).dictionary_encode()
+            lookup = np.empty(len(encoded.dictionary), dtype=np.int16)
+            for i, name in enumerate(encoded.dictionary.to_pylist()):
+                name = merge_label(name)
+                if name not in labels:
+                    labels.append(name)
+                lookup[i] = labels.index(name)
+            indices = encoded.indices
+            keep = np.isfinite(X).all(axis=1) & indices.is_valid().to_numpy(zero_copy_only=False)
+            y = lookup[indices.fill_null(0).to_numpy()][keep]
+            X = X[keep]
+            dropped += batch.num_rows - len(X)
+
+            # Empreinte de ligne, étiquette comprise (drop_duplicates du notebook)
+            frame = pd.DataFrame(X, copy=False)
+            frame['_label'] = y
+            hashes[n_rows:n_rows + len(X)] = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+            raw[n_rows:n_rows + len(X)] = X
+            codes[n_rows:n_rows + len(X)] = y
+            n_rows += len(X)
+
+    # Première occurrence de chaque ligne, dans l'ordre de lecture
+    _, first = np.unique(hashes[:n_rows], return_index=True)
+    first.sort()
+    out = _open_array(directory, 'X', (len(first), len(columns)))
+    gather(raw, first, out=out, chunk_rows=chunk_rows)
+    out.flush()
+    _save(directory, 'y', codes[first])
+    del raw, out
+    os.remove(os.path.join(directory, 'X_raw.npy'))
+    return {'columns': columns, 'labels': labels, 'rows_read': total, 'rows_dropped': dropped,
+            'duplicates': n_rows - len(first), 'rows': len(first)}
+
+
+# --- Découpages ---------------------------------------------------------------
+
+def split_rows(y, seed=SEED, fractions=SPLIT):
+    """extractAllSets du notebook, sur des indices : (train, val, test)"""
+    from sklearn.model_selection import train_test_split
+
+    p_train, p_val, p_test = fractions
+    rows = np.arange(len(y))
+    train, temp = train_test_split(rows, stratify=y, test_size=1.0 - p_train, random_state=seed, shuffle=True)
+    val, test = train_test_split(temp, stratify=y[temp], test_size=p_test / (p_val + p_test),
+                                 random_state=seed, shuffle=True)
+    return train, val, test
+
+
+def build_splits(directory, dataset, seed=SEED, fractions=SPLIT):
+    """Indices (lignes de X) et cibles de chaque découpage, binaire et multiclasse"""
+    codes = np.asarray(dataset.array('y'))
+    labels = dataset.meta['labels']
+    benign = labels.index(BENIGN) if BENIGN in labels else -1
+
+    y_b = (codes != benign).astype(np.int8)
+    for part, rows in zip(('train', 'val', 'test'), split_rows(y_b, seed, fractions)):
+        _save(directory, f'{part}_rows_b', rows)
+        _save(directory, f'{part}_y_b', y_b[rows])
+
+    # Multiclasse : attaques seules, encodées dans l'ordre de LabelEncoder (tri des noms)
+    attacks = np.flatnonzero(codes != benign)
+    classes = sorted(labels[c] for c in np.unique(codes[attacks]))
+    lookup = np.full(len(labels), -1, dtype=np.int16)
+    for i, name in enumerate(classes):
+        lookup[labels.index(name)] = i
+    y_m = lookup[codes[attacks]]
+    for part, rows in zip(('train', 'val', 'test'), split_rows(y_m, seed, fractions)):
+        _save(directory, f'{part}_rows_m', attacks[rows])
+        _save(directory, f'{part}_y_m', y_m[rows])
+
+    counts = np.bincount(codes, minlength=len(labels))
+    return {'classes_m': classes, 'counts': dict(zip(labels, counts.tolist()))}
+
+
+# --- Sélection de features ----------------------------------------------------
+
+def xgb_params(task, n_classes=None, seed=SEED):
+    if task == 'binary':
+        return dict(XGB_PARAMS, objective='binary:logistic', eval_metric='logloss', random_state=seed)
+    return dict(XGB_PARAMS, objective='multi:softmax', num_class=n_classes, eval_metric='mlogloss',
+                random_state=seed)
+
+
+def feature_importances(X_train, y_train, X_val, y_val, params):
+    """get_feature_importances du notebook"""
+    from xgboost import XGBClassifier # type: ignore
+
+    classifier = XGBClassifier(**params)
+    classifier.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+    return classifier.feature_importances_
+
+
+def select_by_threshold(names, importances, threshold=SELECTION_THRESHOLD):
+    """Tuples (nom, importance) au-dessus du seuil, par importance décroissante"""
+    selected = [(name, float(importance)) for name, importance in zip(names, importances)
+                if importance > threshold]
+    return sorted(selected, key=lambda t: t[1], reverse=True)
+
+
+def _selection_rows(rows, limit):
+    # Les indices d'entraînement sont déjà mélangés : un préfixe est un échantillon aléatoire
+    return rows if not limit else rows[:limit]
+
+
+def build_selection(directory, dataset, splits, task, threshold, limit, seed=SEED):
+    """Première sélection sur les colonnes brutes"""
+    X = dataset.array('X')
+    suffix = 'b' if task == 'binary' else 'm'
+    train = _selection_rows(splits.array(f'train_rows_{suffix}'), limit)
+    y_train = splits.array(f'train_y_{suffix}')[:len(train)]
+    val, y_val = splits.array(f'val_rows_{suffix}'), splits.array(f'val_y_{suffix}')
+    params = xgb_params(task, len(splits.meta['classes_m']), seed)
+    importances = feature_importances(gather(X, train), y_train, gather(X, val), y_val, params)
+    return {'feature_tuples': select_by_threshold(dataset.meta['columns'], importances, threshold)}
+
+
+def candidate_pipeline(feature_tuples, engineered=ENGINEERED):
+    """Features sélectionnées normalisées + score combiné + interactions, calculés comme au service"""
+    features, weights = zip(*feature_tuples)
+    candidates = list(features) + [COMBINED_SCORE] + [name for name in engineered if name not in features]
+    return FeaturePipeline(features, weights, candidates)
+
+
+def _pipeline_columns(pipeline, columns):
+    index = {name: i for i, name in enumerate(columns)}
+    missing = [name for name in pipeline.columns if name not in index]
+    if missing:
+        raise ValueError(f"Colonnes manquantes pour les features construites: {', '.join(missing)}")
+    return [index[name] for name in pipeline.columns]
+
+
+def build_final_selection(directory, dataset, splits, selection, threshold, limit, engineered, seed=SEED):
+    """Seconde sélection binaire (section 1.5.2 du notebook)"""
+    X = dataset.array('X')
+    pipeline = candidate_pipeline(selection.meta['feature_tuples'], engineered)
+    columns = _pipeline_columns(pipeline, dataset.meta['columns'])
+    train = _selection_rows(splits.array('train_rows_b'), limit)
+    X_train = gather(X, train, columns, transform=pipeline.transform)
+    X_val = gather(X, splits.array('val_rows_b'), columns, transform=pipeline.transform)
+    importances = feature_importances(X_train, splits.array('train_y_b')[:len(train)],
+                                      X_val, splits.array('val_y_b'), xgb_params('binary', seed=seed))
+    final = select_by_threshold(pipeline.selected_features, importances, threshold)
+    return {'feature_tuples': final, 'selected_features': [name for name, _ in final]}
+
+
+def build_matrices(directory, dataset, splits, task, selection, final=None, chunk_rows=CHUNK_ROWS):
+    """Matrices float32 des trois découpages, dans l'ordre des features attendu par les modèles"""
+    X = dataset.array('X')
+    suffix = 'b' if task == 'binary' else 'm'
+    if task == 'binary':
+        features, weights = zip(*selection.meta['feature_tuples'])
+        pipeline = FeaturePipeline(features, weights, final.meta['selected_features'])
+        columns, transform, width = (_pipeline_columns(pipeline, dataset.meta['columns']),
+                                     pipeline.transform, len(pipeline.selected_features))
+    else:
+        index = {name: i for i, name in enumerate(dataset.meta['columns'])}
+        columns = [index[name] for name, _ in selection.meta['feature_tuples']]
+        transform, width = None, len(columns)
+
+    shapes = {}
+    for part in ('train', 'val', 'test'):
+        rows = splits.array(f'{part}_rows_{suffix}')
+        out = _open_array(directory, f'X_{part}', (len(rows), width))
+        gather(X, rows, columns, out=out, chunk_rows=chunk_rows, transform=transform)
+        out.flush()
+        _save(directory, f'y_{part}', splits.array(f'{part}_y_{suffix}'))
+        shapes[part] = [len(rows), width]
+    return {'shapes': shapes}
+
+
+def build_resampled(directory, matrices, seed=SEED):
+    """SMOTE 'not majority' sur l'entraînement multiclasse, lignes remélangées"""
+    from imblearn.over_sampling import SMOTE # type: ignore
+
+    X, y = SMOTE(sampling_strategy='not majority', random_state=seed).fit_resample(
+        np.asarray(matrices.array('X_train')), np.asarray(matrices.array('y_train')))
+    # Les exemples synthétiques sont ajoutés à la fin, groupés par classe
+    order = np.random.default_rng(seed).permutation(len(y))
+    _save(directory, 'X_train', X[order].astype(np.float32, copy=False))
+    _save(directory, 'y_train', y[order])
+    return {'rows': int(len(y)), 'counts': np.bincount(y).tolist()}
+
+
+# --- Entraînement -------------------------------------------------------------
+
+def memmap_batches(keras, X, y, batch_size, seed=None):
+    """Lots contigus lus dans des matrices mappées ; ordre des lots mélangé à chaque époque si seed"""
+
+    class MemmapBatches(keras.utils.PyDataset):
+        def __init__(self):
+            super().__init__()
+            self.order = np.arange(len(self))
+            self.rng = np.random.default_rng(seed) if seed is not None else None
+            self.on_epoch_end()
+
+        def __len__(self):
+            return (len(y) + batch_size - 1) // batch_size
+
+        def __getitem__(self, i):
+            start = int(self.order[i]) * batch_size
+            return np.asarray(X[start:start + batch_size]), np.asarray(y[start:start + batch_size])
+
+        def on_epoch_end(self):
+            if self.rng is not None:
+                self.rng.shuffle(self.order)
+
+    return MemmapBatches()
+
+
+def build_model(keras, task, n_inputs, units, n_classes=None):
+    """Architectures du notebook : tanh puis selu, initialisations Glorot / He"""
+    from keras import layers # type: ignore
+
+    model = keras.Sequential([keras.Input(shape=(n_inputs,))])
+    for i, n in enumerate(units):
+        if i == 0:
+            model.add(layers.Dense(n, activation='tanh', kernel_initializer=keras.initializers.GlorotUniform()))
+        else:
+            model.add(layers.Dense(n, activation='selu', kernel_initializer=keras.initializers.HeUniform()))
+    if task == 'binary':
+        model.add(layers.Dense(1, activation='sigmoid', kernel_initializer=keras.initializers.GlorotUniform()))
+        model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    else:
+        model.add(layers.Dense(n_classes, activation='softmax', kernel_initializer=keras.initializers.GlorotUniform()))
+        model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def _init_worker(threads):
+    import tensorflow as tf # type: ignore
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def train_model(job):
+    """Entraîne un modèle dans un processus du pool ; renvoie ses mesures sur le test"""
+    from tensorflow import keras # type: ignore
+    from cascade import binary_rates
+
+    start = time.perf_counter()
+    keras.utils.set_random_seed(job['seed'])
+    arrays = {name: np.load(path, mmap_mode='r') for name, path in job['arrays'].items()}
+    model = build_model(keras, job['task'], arrays['X_train'].shape[1], job['units'], job.get('n_classes'))
+    history = model.fit(
+        memmap_batches(keras, arrays['X_train'], arrays['y_train'], job['batch_size'], seed=job['seed']),
+        validation_data=memmap_batches(keras, arrays['X_val'], arrays['y_val'], job['batch_size']),
+        epochs=job['epochs'],
+        callbacks=[keras.callbacks.EarlyStopping(**EARLY_STOPPING),
+                   keras.callbacks.ReduceLROnPlateau(**REDUCE_LR)],
+        verbose=0
+    )
+    os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+    model.save(job['path'])
+
+    output = model.predict(memmap_batches(keras, arrays['X_test'], arrays['y_test'], job['batch_size']), verbose=0)
+    y_test = np.asarray(arrays['y_test'])
+    if job['task'] == 'binary':
+        scores = binary_rates(y_test, (output[:, 0] > 0.5).astype(np.int8))
+    else:
+        scores = {'accuracy': float(np.mean(output.argmax(axis=1) == y_test)) if len(y_test) else 0.0}
+    result = {'model': job['name'], 'task': job['task'], 'params': int(model.count_params()),
+              'epochs': len(history.history['loss']), 'seconds': round(time.perf_counter() - start, 2), **scores}
+    with open(job['path'] + '.json', 'w') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def training_jobs(cache, task, matrices, train_set, n_classes, options):
+    """Un travail par architecture ; les modèles déjà entraînés sont repris du cache"""
+    suffix = 'b' if task == 'binary' else 'm'
+    architectures = ARCHITECTURES_B if task == 'binary' else ARCHITECTURES_M
+    jobs, cached = [], []
+    for i, units in enumerate(architectures, start=1):
+        name = f'model_{i}_{suffix}'
+        config = {'matrices': matrices.key, 'train': train_set.key, 'units': units, 'epochs': options['epochs'],
+                  'batch_size': options['batch_size'], 'early_stopping': EARLY_STOPPING,
+                  'reduce_lr': REDUCE_LR, 'seed': options['seed']}
+        path = os.path.join(cache.directory, f'{name}-{cache.key(name, config)}', f'{name}.keras')
+        if os.path.exists(path + '.json'):
+            cached.append(path)
+            continue
+        jobs.append({
+            'name': name, 'task': task, 'units': units, 'n_classes': n_classes, 'path': path,
+            'epochs': options['epochs'], 'batch_size': options['batch_size'], 'seed': options['seed'],
+            'arrays': {'X_train': train_set.file('X_train.npy'), 'y_train': train_set.file('y_train.npy'),
+                       'X_val': matrices.file('X_val.npy'), 'y_val': matrices.file('y_val.npy'),
+                       'X_test': matrices.file('X_test.npy'), 'y_test': matrices.file('y_test.npy')}
+        })
+    return jobs, cached
+
+
+def train_all(jobs, n_workers):
+    """Entraîne les modèles en parallèle (spawn : TensorFlow n'est pas sûr après un fork)"""
+    if not jobs:
+        return []
+    n_workers = max(1, min(n_workers, len(jobs)))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_context('spawn'),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        # Les plus gros modèles d'abord, pour ne pas finir sur eux
+        jobs = sorted(jobs, key=lambda job: -sum(job['units']))
+        for job, result in zip(jobs, pool.map(train_model, jobs)):
+            print(f"{job['name']}: {result['epochs']} époques, {result['seconds']} s", file=sys.stderr)
+            results.append(result)
+    return results
+
+
+# --- Artefacts ----------------------------------------------------------------
+
+def _write_atomic(path, write):
+    """Écrit via un fichier temporaire : le registre du serveur ne voit jamais de fichier partiel"""
+    root, extension = os.path.splitext(path)
+    # Extension conservée : np.savez l'ajouterait sinon
+    tmp = f'{root}.tmp{os.getpid()}{extension}'
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _dump_pickle(obj):
+    def write(path):
+        with open(path, 'wb') as f:
+            pickle.dump(obj, f)
+    return write
+
+
+def write_binary_artifacts(output_dir, dataset, selection, final):
+    from sklearn.preprocessing import Normalizer
+
+    feature_tuples = [tuple(t) for t in selection.meta['feature_tuples']]
+    features = [name for name, _ in feature_tuples]
+    # Normalizer est sans état : ajusté sur un échantillon pour fixer les noms de colonnes
+    index = {name: i for i, name in enumerate(dataset.meta['columns'])}
+    sample = np.asarray(dataset.array('X')[:16, [index[name] for name in features]])
+    normalizer = Normalizer().fit(pd.DataFrame(sample, columns=features))
+
+    _write_atomic(os.path.join(output_dir, 'feature_tuples_b.pkl'), _dump_pickle(feature_tuples))
+    _write_atomic(os.path.join(output_dir, 'normalizer_b.pkl'), _dump_pickle(normalizer))
+    _write_atomic(os.path.join(output_dir, 'selected_features_final_b.pkl'),
+                  _dump_pickle(list(final.meta['selected_features'])))
+
+
+def write_multiclass_artifacts(output_dir, splits, selection):
+    import joblib
+    from sklearn.preprocessing import LabelEncoder
+
+    encoder = LabelEncoder().fit(splits.meta['classes_m'])
+    _write_atomic(os.path.join(output_dir, 'feature_tuples_m.pkl'),
+                  _dump_pickle([tuple(t) for t in selection.meta['feature_tuples']]))
+    _write_atomic(os.path.join(output_dir, 'label_encoder.pkl'), lambda path: joblib.dump(encoder, path))
+
+
+def install_model(path, output_dir, export_numpy=False):
+    """Copie un modèle entraîné vers les artefacts du backend (et son bundle .npz si demandé)"""
+    target = os.path.join(output_dir, os.path.basename(path))
+    _write_atomic(target, lambda tmp: shutil.copyfile(path, tmp))
+    if export_numpy:
+        from numpy_mlp import bundle_path_for, export_keras_model
+
+        bundle = bundle_path_for(target)
+        _write_atomic(bundle, lambda tmp: export_keras_model(target, tmp))
+    with open(path + '.json') as f:
+        return json.load(f)
+
+
+# --- Orchestration ------------------------------------------------------------
+
+def prepare(cache, files, options):
+    """Étapes de préparation ; renvoie {tâche: (sélection, sélection finale, matrices, entraînement)}"""
+    fingerprint = [(os.path.abspath(p), os.path.getsize(p), os.stat(p).st_mtime_ns) for p in files]
+    dataset = cache.get('dataset', {'files': fingerprint, 'labels': [LABEL_MERGE, LABEL_PREFIXES]},
+                        lambda d: build_dataset(d, files, options['chunk_rows']))
+    splits = cache.get('split', {'dataset': dataset.key, 'fractions': SPLIT, 'seed': options['seed']},
+                       lambda d: build_splits(d, dataset, options['seed']))
+
+    prepared = {}
+    for task in options['tasks']:
+        selection_config = {'split': splits.key, 'task': task, 'threshold': options['threshold'],
+                            'rows': options['selection_rows'], 'xgb': XGB_PARAMS}
+        selection = cache.get(f'select_{task}', selection_config, lambda d: build_selection(
+            d, dataset, splits, task, options['threshold'], options['selection_rows'], options['seed']))
+        final = None
+        if task == 'binary':
+            final = cache.get('select_final_binary', dict(selection_config, first=selection.key,
+                                                          engineered=options['engineered'],
+                                                          pipeline=PIPELINE_FORMAT),
+                              lambda d: build_final_selection(d, dataset, splits, selection, options['threshold'],
+                                                              options['selection_rows'], options['engineered'],
+                                                              options['seed']))
+        matrices = cache.get(f'matrices_{task}', {'split': splits.key, 'selection': selection.key,
+                                                  'final': final.key if final else None},
+                             lambda d: build_matrices(d, dataset, splits, task, selection, final,
+                                                      options['chunk_rows']))
+        train_set = matrices
+        if task == 'multiclass' and options['smote']:
+            train_set = cache.get('resample_multiclass', {'matrices': matrices.key, 'seed': options['seed']},
+                                  lambda d: build_resampled(d, matrices, options['seed']))
+        prepared[task] = (selection, final, matrices, train_set)
+    return dataset, splits, prepared
+
+
+def run(files, output_dir, options, cache_dir=CACHE_DIR):
+    cache = StageCache(cache_dir)
+    dataset, splits, prepared = prepare(cache, files, options)
+    report = {'dataset': {k: dataset.meta[k] for k in ('rows_read', 'rows_dropped', 'duplicates', 'rows')},
+              'classes_m': splits.meta['classes_m'], 'options': options, 'models': []}
+    if options['prepare_only']:
+        return report
+
+    jobs, paths = [], []
+    for task, (selection, final, matrices, train_set) in prepared.items():
+        task_jobs, cached = training_jobs(cache, task, matrices, train_set, len(splits.meta['classes_m']), options)
+        jobs += task_jobs
+        paths += cached
+    train_all(jobs, options['jobs'])
+    paths += [job['path'] for job in jobs]
+
+    os.makedirs(output_dir, exist_ok=True)
+    if 'binary' in prepared:
+        selection, final, _, _ = prepared['binary']
+        write_binary_artifacts(output_dir, dataset, selection, final)
+    if 'multiclass' in prepared:
+        write_multiclass_artifacts(output_dir, splits, prepared['multiclass'][0])
+    for path in sorted(paths, key=os.path.basename):
+        report['models'].append(install_model(path, output_dir, options['export_numpy']))
+    return report
+
+
+def print_report(report):
+    dataset = report['dataset']
+    print(f"{dataset['rows_read']} lignes lues, {dataset['rows_dropped']} incomplètes, "
+          f"{dataset['duplicates']} doublons, {dataset['rows']} conservées")
+    for r in report['models']:
+        line = f"{r['model']:<12} {r['params']:>8} param. {r['epochs']:>4} époques  acc={r['accuracy']*100:.2f}%"
+        if 'far' in r:
+            line += f"  FAR={r['far']:.4f}  AMR={r['amr']:.4f}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prétraitement et entraînement des modèles du backend")
+    parser.add_argument('sources', nargs='+', help="fichiers Parquet CICIDS2017 ou répertoires")
+    parser.add_argument('--output-dir', default='.', help="répertoire des artefacts du backend")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--task', default='all', choices=['all', 'binary', 'multiclass'])
+    parser.add_argument('--jobs', type=int, default=min(10, os.cpu_count() or 1),
+                        help="processus d'entraînement simultanés")
+    parser.add_argument('--threshold', type=float, default=SELECTION_THRESHOLD,
+                        help="importance XGBoost minimale d'une feature")
+    parser.add_argument('--selection-rows', type=int, default=None,
+                        help="lignes d'entraînement utilisées par XGBoost (toutes par défaut)")
+    parser.add_argument('--engineered', nargs='*', default=list(ENGINEERED),
+                        help="interactions candidates à la seconde sélection binaire")
+    parser.add_argument('--smote', action='store_true', help="SMOTE sur l'entraînement multiclasse")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--export-numpy', action='store_true', help="écrit aussi les bundles .npz")
+    parser.add_argument('--prepare-only', action='store_true', help="s'arrête avant l'entraînement")
+    parser.add_argument('--report', default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    options = {
+        'tasks': ['binary', 'multiclass'] if args.task == 'all' else [args.task],
+        'jobs': args.jobs, 'threshold': args.threshold, 'selection_rows': args.selection_rows,
+        'engineered': list(args.engineered), 'smote': args.smote, 'epochs': args.epochs,
+        'batch_size': args.batch_size, 'chunk_rows': args.chunk_rows, 'seed': args.seed,
+        'export_numpy': args.export_numpy, 'prepare_only': args.prepare_only
+    }
+    report = run(source_files(args.sources), args.output_dir, options, args.cache_dir)
+    print_report(report)
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -71,7 +71,11 @@ export default function Predict() {
         columns: Number(response.data?.file_info?.columns) || 0,
         file_size_mb: Number(response.data?.file_info?.file_size_mb) || 0
       },
-      execution_time: Number(response.data?.execution_time) || 0
+      execution_time: Number(response.data?.execution_time) || 0,
+      // Images inline si fournies, sinon rendu à la demande des graphiques
+      plots: response.data?.plots?.length
+        ? response.data.plots.map(plot => `data:image/png;base64,${plot}`)
+        : (response.data?.charts || []).map(chart => `http://localhost:5000/plots/${chart.key}.png`)
     };
 
     setResults(safeResults);
@@ -189,7 +193,7 @@ export default function Predict() {
                 {results.plots.map((plot, index) => (
                   <div key={index} className={styles.plotContainer}>
                     <Image 
-                      src={`data:image/png;base64,${plot}`}
+                      src={plot}
                       alt={`Visualisation ${index + 1}`}
                       width={800}
                       height={600}
@@ -65,7 +65,12 @@ export default function Predict() {
   
       setResults({
         message: response.data.message || "Analyse terminée avec succès",
-        imageUrl: `data:image/png;base64,${response.data.image}`,
+        // Image inline si fournie, sinon rendu à la demande du graphique (mis en cache côté serveur)
+        imageUrl: response.data.image
+          ? `data:image/png;base64,${response.data.image}`
+          : response.data.charts?.length
+            ? `http://localhost:5000/plots/${response.data.charts[0].key}.png`
+            : null,
         predictions: response.data.predictions || [],
         stats: response.data.stats || {
           total: 0,
@@ -11,6 +11,8 @@ const SurveillancePage = () => {
 
     useEffect(() => {
         const newSocket = io("http://localhost:5000", {
+            // Websocket uniquement : compatible avec le service pré-forké (une connexion = un worker)
+            transports: ["websocket"],
             reconnection: true,
             reconnectionAttempts: 5,
             reconnectionDelay: 1000,
@@ -20,8 +22,9 @@ const SurveillancePage = () => {
             console.log("Connected to server");
         });
 
-        newSocket.on("update", (newData) => {
-            setData(newData);
+        // Résumé agrégé de chaque fenêtre (salon "summary", rejoint à la connexion)
+        newSocket.on("summary", (summary) => {
+            setData(summary);
         });
 
         newSocket.on("disconnect", () => {
@@ -62,7 +65,7 @@ const SurveillancePage = () => {
                     <div className="card-header">
                         <h2>
                             {data
-                                ? `📡 Dernière analyse à ${data.timestamp}`
+                                ? `📡 ${data.flows} flux analysés à ${new Date(data.t * 1000).toLocaleTimeString()} — ${data.verdicts[1]} malveillants`
                                 : "Surveillance réseau"}
                         </h2>
                         <button
@@ -80,19 +83,19 @@ const SurveillancePage = () => {
                                     <tr>
                                         <th>Modèle</th>
                                         <th>Statut</th>
-                                        <th>Confiance</th>
-                                        <th>Valeur brute</th>
+                                        <th>Alertes</th>
+                                        <th>Probabilité moyenne</th>
                                     </tr>
                                 </thead>
                                 <tbody>
-                                    {data.results.map((result, index) => (
-                                        <tr key={index}>
-                                            <td>{result.Modèle}</td>
-                                            <td className={result.Statut.includes("Malicieux") ? "danger" : "safe"}>
-                                                {result.Statut}
+                                    {data.models.map((model, index) => (
+                                        <tr key={model}>
+                                            <td>{model}</td>
+                                            <td className={data.malicious[index] > 0 ? "danger" : "safe"}>
+                                                {data.malicious[index] > 0 ? "🔴 Malicieux" : "🟢 Bénin"}
                                             </td>
-                                            <td>{result.Confiance}</td>
-                                            <td>{result["Valeur brute"]}</td>
+                                            <td>{data.malicious[index]} / {data.flows}</td>
+                                            <td>{(data.mean[index] * 100).toFixed(1)}%</td>
                                         </tr>
                                     ))}
                                 </tbody>
@@ -102,7 +105,7 @@ const SurveillancePage = () => {
 
                     <p className="status-msg">
                         {isRunning
-                            ? "🔄 Mise à jour toutes les 3 secondes..."
+                            ? "🔄 Mise à jour en continu..."
                             : "🔴 Surveillance arrêtée"}
                     </p>
                 </div>